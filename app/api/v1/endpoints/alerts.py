@@ -0,0 +1,128 @@
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from sqlalchemy.orm import Session
+import uuid
+from datetime import datetime
+
+from app.schemas.alert import AlertEventOut, AlertRuleCreate, AlertRuleOut, AlertRuleUpdate
+from app.core.alerts import alert_rule_index
+from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, ENTITY_KEY, READING_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
+from app.services.alert_service import AlertService
+from app.db.models import User as DBUser
+
+router = APIRouter()
+
+def add_alert_rule_links(rule: AlertRuleOut) -> dict:
+    links = {
+        "self": {"href": f"/api/v1/alert-rules/{rule.id}", "method": "GET"},
+        "update": {"href": f"/api/v1/alert-rules/{rule.id}", "method": "PUT"},
+        "delete": {"href": f"/api/v1/alert-rules/{rule.id}", "method": "DELETE"},
+        "events": {"href": f"/api/v1/alert-rules/{rule.id}/events", "method": "GET"},
+        "sensor": {"href": f"/api/v1/sensors/{rule.sensor_id}", "method": "GET"},
+    }
+    return rule.model_dump(by_alias=True, exclude_unset=True) | {"_links": links}
+
+@router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
+def create_alert_rule(rule_in: AlertRuleCreate, db: Session = Depends(get_db),
+                      current_user: DBUser = Depends(get_current_user)):
+    """
+    Cria uma regra de alerta por limite para um sensor. A regra é avaliada a cada leitura
+    gravada, durante a ingestão; cada mudança de estado (ok, high, low) gera um evento.
+    Sem lower e upper, valem o min_value e o max_value do sensor.
+    """
+    alert_service = AlertService(db)
+    rule = alert_service.create_rule(rule_in, current_user.id)
+    return add_alert_rule_links(AlertRuleOut.model_validate(rule))
+
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(2)
+def read_alert_rules(request: Request, response: Response,
+                     state: str | None = Query(None, description="Only rules in this state: ok, high or low"),
+                     skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                     db: Session = Depends(get_db),
+                     current_user: DBUser = Depends(get_current_user)):
+    """
+    Lista as regras de alerta dos sensores do usuário logado; state=high ou state=low
+    retorna os alarmes ativos.
+    """
+    alert_service = AlertService(db)
+    rules = alert_service.get_rules_by_user(current_user.id, state=state, skip=skip, limit=limit, cursor=cursor)
+    items = [add_alert_rule_links(AlertRuleOut.model_validate(r)) for r in rules]
+    return page_response(request, response, items, cursor, next_cursor(rules, limit, ENTITY_KEY))
+
+@router.get("/status", response_model=dict)
+@query_budget(1)
+def read_alert_status(current_user: DBUser = Depends(get_current_user)):
+    """
+    Estado do índice de regras em memória deste worker: regras carregadas, leituras
+    avaliadas e transições detectadas.
+    """
+    return alert_rule_index.stats()
+
+@router.get("/events", response_model=list[AlertEventOut] | dict)
+@query_budget(2)
+def read_alert_events(request: Request, response: Response,
+                      start_time: datetime | None = Query(None, description="Start of the range (inclusive)"),
+                      end_time: datetime | None = Query(None, description="End of the range (exclusive)"),
+                      skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                      db: Session = Depends(get_db),
+                      current_user: DBUser = Depends(get_current_user)):
+    """
+    Lista as transições de estado das regras do usuário logado, da mais recente para a
+    mais antiga.
+    """
+    alert_service = AlertService(db)
+    events = alert_service.get_events_by_user(current_user.id, start_time, end_time, skip=skip, limit=limit, cursor=cursor)
+    items = [AlertEventOut.model_validate(e) for e in events]
+    return page_response(request, response, items, cursor, next_cursor(events, limit, READING_KEY))
+
+@router.get("/{rule_id}", response_model=dict)
+@query_budget(2)
+def read_alert_rule(rule_id: uuid.UUID, db: Session = Depends(get_db),
+                    current_user: DBUser = Depends(get_current_user)):
+    """
+    Obtém uma regra de alerta por ID, com o estado atual.
+    """
+    alert_service = AlertService(db)
+    rule = alert_service.get_rule(rule_id, current_user.id)
+    return add_alert_rule_links(AlertRuleOut.model_validate(rule))
+
+@router.put("/{rule_id}", response_model=dict)
+@query_budget(4)
+def update_alert_rule(rule_id: uuid.UUID, rule_in: AlertRuleUpdate, db: Session = Depends(get_db),
+                      current_user: DBUser = Depends(get_current_user)):
+    """
+    Atualiza uma regra de alerta. Mudar os limites ou a histerese reinicia a regra no estado ok.
+    """
+    alert_service = AlertService(db)
+    rule = alert_service.update_rule(rule_id, rule_in, current_user.id)
+    return add_alert_rule_links(AlertRuleOut.model_validate(rule))
+
+@router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
+def delete_alert_rule(rule_id: uuid.UUID, db: Session = Depends(get_db),
+                      current_user: DBUser = Depends(get_current_user)):
+    """
+    Exclui uma regra de alerta e o seu histórico de eventos.
+    """
+    alert_service = AlertService(db)
+    alert_service.delete_rule(rule_id, current_user.id)
+    return {"message": "Alert rule deleted successfully"}
+
+@router.get("/{rule_id}/events", response_model=list[AlertEventOut] | dict)
+@query_budget(3)
+def read_alert_rule_events(request: Request, response: Response, rule_id: uuid.UUID,
+                           start_time: datetime | None = Query(None, description="Start of the range (inclusive)"),
+                           end_time: datetime | None = Query(None, description="End of the range (exclusive)"),
+                           skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                           db: Session = Depends(get_db),
+                           current_user: DBUser = Depends(get_current_user)):
+    """
+    Lista as transições de estado da regra, da mais recente para a mais antiga.
+    """
+    alert_service = AlertService(db)
+    events = alert_service.get_rule_events(rule_id, current_user.id, start_time, end_time, skip=skip, limit=limit, cursor=cursor)
+    items = [AlertEventOut.model_validate(e) for e in events]
+    return page_response(request, response, items, cursor, next_cursor(events, limit, READING_KEY))
@@ -6,11 +6,13 @@ from app.schemas.user import UserCreate, UserOut
 from app.schemas.token import Token
 from app.core.dependencies import get_db
 from app.core.security import create_access_token
+from app.core.query_budget import query_budget
 from app.services.user_service import UserService
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
     """
     Registra um novo usuário no sistema.
@@ -19,6 +21,7 @@ def register_user(user_in: UserCreate, db: Session = Depends(get_db)):
     return user_service.create_user(user_in)
 
 @router.post("/token", response_model=Token)
+@query_budget(1)
 def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Endpoint para login de usuário e obtenção de token JWT.
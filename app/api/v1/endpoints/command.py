@@ -1,11 +1,13 @@
 # app/api/v1/endpoints/commands.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from sqlalchemy.orm import Session
 import uuid
 import json # Para lidar com parâmetros JSON (se parameters for um JSON string)
 
 from app.schemas.command import CommandCreate, CommandOut, CommandUpdate
 from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, COMMAND_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
 from app.services.command_service import CommandService
 from app.db.models import User as DBUser
 
@@ -22,6 +24,7 @@ def add_command_links(command: CommandOut) -> dict:
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 def create_command(command_in: CommandCreate, db: Session = Depends(get_db),
                    current_user: DBUser = Depends(get_current_user)):
     """
@@ -32,8 +35,11 @@ def create_command(command_in: CommandCreate, db: Session = Depends(get_db),
     command = command_service.create_command(command_in, current_user.id)
     return add_command_links(CommandOut.model_validate(command))
 
-@router.get("/", response_model=list[dict])
-def read_commands(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(3)
+def read_commands(request: Request, response: Response,
+                  skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                  db: Session = Depends(get_db),
                   current_user: DBUser = Depends(get_current_user),
                   device_id: uuid.UUID | None = None):
     """
@@ -42,13 +48,15 @@ def read_commands(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
     """
     command_service = CommandService(db)
     if device_id:
-        commands = command_service.get_commands_for_device(device_id, current_user.id, skip=skip, limit=limit)
+        commands = command_service.get_commands_for_device(device_id, current_user.id, skip=skip, limit=limit, cursor=cursor)
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Please provide a 'device_id' to filter commands.")
     
-    return [add_command_links(CommandOut.model_validate(c)) for c in commands]
+    items = [add_command_links(CommandOut.model_validate(c)) for c in commands]
+    return page_response(request, response, items, cursor, next_cursor(commands, limit, COMMAND_KEY))
 
 @router.get("/{command_id}", response_model=dict)
+@query_budget(2)
 def read_command(command_id: uuid.UUID, db: Session = Depends(get_db),
                  current_user: DBUser = Depends(get_current_user)):
     """
@@ -56,14 +64,11 @@ def read_command(command_id: uuid.UUID, db: Session = Depends(get_db),
     O usuário deve ser o proprietário do projeto ao qual o comando pertence.
     """
     command_service = CommandService(db)
-    command = command_service.get_command(command_id)
-    # Verifica a autorização
-    device = command_service.device_repo.get_by_id(command.device_id)
-    if not device or device.project.user_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this command")
+    command = command_service.get_command_for_user(command_id, current_user.id)
     return add_command_links(CommandOut.model_validate(command))
 
 @router.delete("/{command_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
 def delete_command(command_id: uuid.UUID, db: Session = Depends(get_db),
                    current_user: DBUser = Depends(get_current_user)):
     """
@@ -76,6 +81,7 @@ def delete_command(command_id: uuid.UUID, db: Session = Depends(get_db),
 
 # --- Endpoint para Gateways/Dispositivos puxarem comandos pendentes ---
 @router.post("/gateway-pull-commands", response_model=list[dict])
+@query_budget(2)
 def gateway_pull_commands(device_serial_number: str = Query(..., description="Serial number of the gateway/device pulling commands"),
                           db: Session = Depends(get_db)):
     """
@@ -91,6 +97,7 @@ def gateway_pull_commands(device_serial_number: str = Query(..., description="Se
 
 # --- Endpoint para Gateways/Dispositivos atualizarem o status do comando ---
 @router.put("/gateway-update-command/{command_id}", response_model=dict)
+@query_budget(3)
 def gateway_update_command_status(command_id: uuid.UUID, command_update: CommandUpdate, db: Session = Depends(get_db)):
     """
     Endpoint para um gateway ou dispositivo IoT atualizar o status de um comando.
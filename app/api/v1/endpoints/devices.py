@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from sqlalchemy.orm import Session
 import uuid
+from datetime import datetime
 
 from app.schemas.device import DeviceCreate, DeviceOut, DeviceUpdate
 from app.schemas.sensor import SensorWithRecentData
-from app.schemas.sensor_data import SensorDailyAverage, SensorMonthlyAverage, SensorWeeklyAverage
+from app.schemas.sensor_data import AnomalyReport, SensorDailyAverage, SensorMonthlyAverage, SensorWeeklyAverage
 from app.schemas.tag import TagOut
 from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, ENTITY_KEY, SEARCH_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
+from app.services.anomaly_service import AnomalyService
 from app.services.device_service import DeviceService
 from app.db.models import User as DBUser
 from app.services.sensor_device import SensorService
@@ -27,6 +31,7 @@ def add_device_links(device: DeviceOut) -> dict:
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(7)
 def create_device(device_in: DeviceCreate,
                   tag_ids: list[uuid.UUID] = Query([]),
                   db: Session = Depends(get_db),
@@ -39,29 +44,37 @@ def create_device(device_in: DeviceCreate,
     device = device_service.create_device(device_in, current_user.id, tag_ids=tag_ids)
     return add_device_links(DeviceOut.model_validate(device))
 
-@router.get("/", response_model=list[dict])
-def read_devices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(3)
+def read_devices(request: Request, response: Response,
+                 skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                 db: Session = Depends(get_db),
                  current_user: DBUser = Depends(get_current_user),
                  project_id: uuid.UUID | None = None,
                  query: str | None = None):
     """
-    Lista todos os dispositivos (filtrando por projeto se especificado) ou pesquisa por texto.
+    Lista todos os dispositivos (filtrando por projeto se especificado) ou pesquisa por texto
+    (nome, descrição e número de série, por relevância, tolerando erros de digitação).
     Acesso restrito aos dispositivos de projetos do usuário logado.
     """
     device_service = DeviceService(db)
+    key = ENTITY_KEY
     if project_id:
-        devices = device_service.get_devices_by_project(project_id, current_user.id, skip=skip, limit=limit)
+        devices = device_service.get_devices_by_project(project_id, current_user.id, skip=skip, limit=limit, cursor=cursor)
     elif query:
-        devices = device_service.search_devices(query, skip=skip, limit=limit)
+        devices = device_service.search_devices(query, current_user.id, skip=skip, limit=limit, cursor=cursor)
+        key = SEARCH_KEY
     else:
         # Para listar todos os dispositivos do usuário, precisaria de uma query mais complexa ou outro endpoint
         # Por simplicidade, se não houver project_id ou query, retorna uma lista vazia ou força um erro
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Please provide a 'project_id' or 'query' parameter.")
     
-    return [add_device_links(DeviceOut.model_validate(d)) for d in devices]
+    items = [add_device_links(DeviceOut.model_validate(d)) for d in devices]
+    return page_response(request, response, items, cursor, next_cursor(devices, limit, key))
 
 
 @router.get("/{device_id}", response_model=dict)
+@query_budget(2)
 def read_device(device_id: uuid.UUID, db: Session = Depends(get_db),
                 current_user: DBUser = Depends(get_current_user)):
     """
@@ -69,12 +82,11 @@ def read_device(device_id: uuid.UUID, db: Session = Depends(get_db),
     O usuário deve ser o proprietário do projeto ao qual o dispositivo pertence.
     """
     device_service = DeviceService(db)
-    device = device_service.get_device(device_id)
-    if device.project.user_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this device")
+    device = device_service.get_device_for_user(device_id, current_user.id)
     return add_device_links(DeviceOut.model_validate(device))
 
 @router.put("/{device_id}", response_model=dict)
+@query_budget(4)
 def update_device(device_id: uuid.UUID, device_in: DeviceUpdate, db: Session = Depends(get_db),
                   current_user: DBUser = Depends(get_current_user)):
     """
@@ -86,6 +98,7 @@ def update_device(device_id: uuid.UUID, device_in: DeviceUpdate, db: Session = D
     return add_device_links(DeviceOut.model_validate(updated_device))
 
 @router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
 def delete_device(device_id: uuid.UUID, db: Session = Depends(get_db),
                   current_user: DBUser = Depends(get_current_user)):
     """
@@ -99,6 +112,7 @@ def delete_device(device_id: uuid.UUID, db: Session = Depends(get_db),
 
 # Endpoints para gerenciamento de Tags em Dispositivos
 @router.post("/{device_id}/tags", response_model=dict)
+@query_budget(7)
 def add_tags_to_device(device_id: uuid.UUID, tag_ids: list[uuid.UUID], db: Session = Depends(get_db),
                        current_user: DBUser = Depends(get_current_user)):
     """
@@ -109,6 +123,7 @@ def add_tags_to_device(device_id: uuid.UUID, tag_ids: list[uuid.UUID], db: Sessi
     return add_device_links(DeviceOut.model_validate(device))
 
 @router.delete("/{device_id}/tags", response_model=dict)
+@query_budget(6)
 def remove_tags_from_device(device_id: uuid.UUID, tag_ids: list[uuid.UUID], db: Session = Depends(get_db),
                             current_user: DBUser = Depends(get_current_user)):
     """
@@ -119,18 +134,17 @@ def remove_tags_from_device(device_id: uuid.UUID, tag_ids: list[uuid.UUID], db:
     return add_device_links(DeviceOut.model_validate(device))
 
 @router.get("/{device_id}/tags", response_model=list[TagOut])
+@query_budget(3)
 def get_device_tags(device_id: uuid.UUID, db: Session = Depends(get_db),
                     current_user: DBUser = Depends(get_current_user)):
     """
     Lista as tags associadas a um dispositivo.
     """
     device_service = DeviceService(db)
-    device = device_service.get_device(device_id)
-    if device.project.user_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this device's tags")
-    return device.tags
+    return device_service.get_device_tags(device_id, current_user.id)
 
 @router.get("/{device_id}/recent-sensor-data", response_model=list[SensorWithRecentData])
+@query_budget(3)
 def get_recent_sensor_data_for_device_endpoint(
     device_id: uuid.UUID,
     limit: int = Query(1, ge=1, description="Número de registros mais recentes por sensor."), # Parâmetro limit
@@ -140,21 +154,21 @@ def get_recent_sensor_data_for_device_endpoint(
     """
     Retorna os N dados mais recentes de todos os sensores associados a um determinado dispositivo.
     O usuário deve ser o proprietário do projeto ao qual o dispositivo pertence.
+    Todos os sensores são lidos em uma única consulta; com limit=1 a leitura mais recente
+    vem da tabela de marcas d'água mantida pela ingestão, sem varrer sensor_data.
     """
     sensor_service = SensorService(db)
-    recent_readings = sensor_service.get_recent_sensor_data_for_device(device_id, current_user.id, limit)
-    
-    if not recent_readings:
-        # Se não houver dados ou sensores, retorna 200 OK com lista vazia.
-        pass 
-        
-    return recent_readings
+    # Sem sensores, retorna 200 OK com lista vazia
+    return sensor_service.get_recent_sensor_data_for_device(device_id, current_user.id, limit)
 
 # --- NOVOS ENDPOINTS PARA MÉDIAS ---
 
 @router.get("/{device_id}/sensor-data/averages/daily", response_model=list[SensorDailyAverage])
+@query_budget(4)
 def get_device_sensor_daily_averages(
     device_id: uuid.UUID,
+    start_time: datetime | None = Query(None, description="Start timestamp for data filtering"),
+    end_time: datetime | None = Query(None, description="End timestamp for data filtering"),
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
 ):
@@ -162,11 +176,14 @@ def get_device_sensor_daily_averages(
     Retorna a média aritmética dos dados de cada sensor de um dispositivo, agrupada por dia.
     """
     sensor_service = SensorService(db)
-    return sensor_service.get_daily_averages_for_device(device_id, current_user.id)
+    return sensor_service.get_daily_averages_for_device(device_id, current_user.id, start_time, end_time)
 
 @router.get("/{device_id}/sensor-data/averages/weekly", response_model=list[SensorWeeklyAverage])
+@query_budget(4)
 def get_device_sensor_weekly_averages(
     device_id: uuid.UUID,
+    start_time: datetime | None = Query(None, description="Start timestamp for data filtering"),
+    end_time: datetime | None = Query(None, description="End timestamp for data filtering"),
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
 ):
@@ -174,11 +191,14 @@ def get_device_sensor_weekly_averages(
     Retorna a média aritmética dos dados de cada sensor de um dispositivo, agrupada por semana.
     """
     sensor_service = SensorService(db)
-    return sensor_service.get_weekly_averages_for_device(device_id, current_user.id)
+    return sensor_service.get_weekly_averages_for_device(device_id, current_user.id, start_time, end_time)
 
 @router.get("/{device_id}/sensor-data/averages/monthly", response_model=list[SensorMonthlyAverage])
+@query_budget(4)
 def get_device_sensor_monthly_averages(
     device_id: uuid.UUID,
+    start_time: datetime | None = Query(None, description="Start timestamp for data filtering"),
+    end_time: datetime | None = Query(None, description="End timestamp for data filtering"),
     db: Session = Depends(get_db),
     current_user: DBUser = Depends(get_current_user)
 ):
@@ -186,4 +206,23 @@ def get_device_sensor_monthly_averages(
     Retorna a média aritmética dos dados de cada sensor de um dispositivo, agrupada por mês.
     """
     sensor_service = SensorService(db)
-    return sensor_service.get_monthly_averages_for_device(device_id, current_user.id)
\ No newline at end of file
+    return sensor_service.get_monthly_averages_for_device(device_id, current_user.id, start_time, end_time)
+
+@router.get("/{device_id}/anomalies", response_model=AnomalyReport)
+def get_device_anomalies(
+    device_id: uuid.UUID,
+    start_time: datetime | None = Query(None, description="Start of the range (inclusive, default: 24 hours before end_time)"),
+    end_time: datetime | None = Query(None, description="End of the range (exclusive, default: now)"),
+    window: int = Query(30, ge=2, description="Previous readings used for the rolling z-score"),
+    z_threshold: float = Query(4.0, gt=0, description="Minimum |z-score| reported"),
+    rate_threshold: float = Query(8.0, gt=0, description="Minimum robust rate-of-change score reported"),
+    limit: int = Query(1000, ge=1, description="Most recent anomalies returned"),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Detecta anomalias nas leituras dos sensores do dispositivo: valores fora de
+    [min_value, max_value] do sensor, z-scores altos e picos na taxa de variação.
+    """
+    anomaly_service = AnomalyService(db)
+    return anomaly_service.detect_for_device(device_id, current_user.id, start_time, end_time, window, z_threshold, rate_threshold, limit)
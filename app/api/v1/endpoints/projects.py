@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, Query
 from sqlalchemy.orm import Session
 import uuid
+from datetime import datetime
 
 from app.schemas.project import ProjectCreate, ProjectOut, ProjectUpdate
+from app.schemas.sensor import SensorWithRecentData
+from app.schemas.snapshot import ProjectSnapshot
+from app.schemas.sensor_data import AnomalyReport, FleetDataAggregation
 from app.schemas.tag import TagOut # Para retorno de tags
 from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, ENTITY_KEY, SEARCH_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
+from app.services.aggregation_service import AggregationService
+from app.services.anomaly_service import AnomalyService
 from app.services.project_service import ProjectService
+from app.services.sensor_device import SensorService
 from app.db.models import User as DBUser
 
 router = APIRouter()
@@ -23,6 +32,7 @@ def add_project_links(project: ProjectOut) -> dict:
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(5)
 def create_project(project_in: ProjectCreate, 
                    tag_ids: list[uuid.UUID] = Query([]), # Para associar tags na criação
                    db: Session = Depends(get_db),
@@ -35,22 +45,30 @@ def create_project(project_in: ProjectCreate,
     project = project_service.create_project(project_in, current_user.id, tag_ids=tag_ids)
     return add_project_links(ProjectOut.model_validate(project))
 
-@router.get("/", response_model=list[dict])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(3)
+def read_projects(request: Request, response: Response,
+                  skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                  db: Session = Depends(get_db),
                   current_user: DBUser = Depends(get_current_user),
                   query: str | None = None):
     """
-    Lista todos os projetos do usuário autenticado ou pesquisa por texto.
+    Lista todos os projetos do usuário autenticado ou pesquisa por texto nos projetos dele
+    (nome e descrição, por relevância, tolerando erros de digitação).
     """
     project_service = ProjectService(db)
     if query:
-        projects = project_service.search_projects(query, skip=skip, limit=limit)
+        projects = project_service.search_projects(query, current_user.id, skip=skip, limit=limit, cursor=cursor)
+        key = SEARCH_KEY
     else:
-        projects = project_service.get_projects_by_user(current_user.id, skip=skip, limit=limit)
+        projects = project_service.get_projects_by_user(current_user.id, skip=skip, limit=limit, cursor=cursor)
+        key = ENTITY_KEY
     
-    return [add_project_links(ProjectOut.model_validate(p)) for p in projects]
+    items = [add_project_links(ProjectOut.model_validate(p)) for p in projects]
+    return page_response(request, response, items, cursor, next_cursor(projects, limit, key))
 
 @router.get("/{project_id}", response_model=dict)
+@query_budget(2)
 def read_project(project_id: uuid.UUID, db: Session = Depends(get_db),
                  current_user: DBUser = Depends(get_current_user)):
     """
@@ -64,6 +82,7 @@ def read_project(project_id: uuid.UUID, db: Session = Depends(get_db),
     return add_project_links(ProjectOut.model_validate(project))
 
 @router.put("/{project_id}", response_model=dict)
+@query_budget(4)
 def update_project(project_id: uuid.UUID, project_in: ProjectUpdate, db: Session = Depends(get_db),
                    current_user: DBUser = Depends(get_current_user)):
     """
@@ -75,6 +94,7 @@ def update_project(project_id: uuid.UUID, project_in: ProjectUpdate, db: Session
     return add_project_links(ProjectOut.model_validate(updated_project))
 
 @router.delete("/{project_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(5)
 def delete_project(project_id: uuid.UUID, db: Session = Depends(get_db),
                    current_user: DBUser = Depends(get_current_user)):
     """
@@ -88,6 +108,7 @@ def delete_project(project_id: uuid.UUID, db: Session = Depends(get_db),
 
 # Endpoints para gerenciamento de Tags em Projetos (Many-to-Many)
 @router.post("/{project_id}/tags", response_model=dict)
+@query_budget(7)
 def add_tags_to_project(project_id: uuid.UUID, tag_ids: list[uuid.UUID], db: Session = Depends(get_db),
                         current_user: DBUser = Depends(get_current_user)):
     """
@@ -98,6 +119,7 @@ def add_tags_to_project(project_id: uuid.UUID, tag_ids: list[uuid.UUID], db: Ses
     return add_project_links(ProjectOut.model_validate(project))
 
 @router.delete("/{project_id}/tags", response_model=dict)
+@query_budget(6)
 def remove_tags_from_project(project_id: uuid.UUID, tag_ids: list[uuid.UUID], db: Session = Depends(get_db),
                              current_user: DBUser = Depends(get_current_user)):
     """
@@ -108,13 +130,97 @@ def remove_tags_from_project(project_id: uuid.UUID, tag_ids: list[uuid.UUID], db
     return add_project_links(ProjectOut.model_validate(project))
 
 @router.get("/{project_id}/tags", response_model=list[TagOut])
+@query_budget(3)
 def get_project_tags(project_id: uuid.UUID, db: Session = Depends(get_db),
                      current_user: DBUser = Depends(get_current_user)):
     """
     Lista as tags associadas a um projeto.
     """
     project_service = ProjectService(db)
-    project = project_service.get_project(project_id)
-    if project.user_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this project's tags")
-    return project.tags
\ No newline at end of file
+    return project_service.get_project_tags(project_id, current_user.id)
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Verifica o cabeçalho If-None-Match (lista de ETags, fracos ou não, ou "*")."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+@router.get("/{project_id}/snapshot", response_model=ProjectSnapshot)
+@query_budget(8)
+def read_project_snapshot(
+    project_id: uuid.UUID,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Retorna o projeto inteiro em uma requisição: tags, dispositivos com status e tags, e
+    sensores com a leitura mais recente, com um número fixo de consultas. A resposta traz
+    um ETag; reenviado em If-None-Match, o snapshot só é montado se algo mudou (senão, 304).
+    """
+    project_service = ProjectService(db)
+    etag = project_service.get_snapshot_etag(project_id, current_user.id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return project_service.get_snapshot(project_id)
+
+@router.get("/{project_id}/recent-sensor-data", response_model=list[SensorWithRecentData])
+@query_budget(3)
+def get_recent_sensor_data_for_project(
+    project_id: uuid.UUID,
+    limit: int = Query(1, ge=1, le=100, description="Número de registros mais recentes por sensor."),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Retorna os N dados mais recentes de todos os sensores de todos os dispositivos do projeto,
+    em uma única consulta. Com limit=1 (o padrão) a leitura mais recente de cada sensor vem
+    da tabela de marcas d'água mantida pela ingestão, sem varrer sensor_data.
+    """
+    sensor_service = SensorService(db)
+    return sensor_service.get_recent_sensor_data_for_project(project_id, current_user.id, limit)
+
+@router.get("/{project_id}/sensor-data/aggregates", response_model=FleetDataAggregation, response_model_exclude_unset=True)
+@query_budget(4)
+def aggregate_project_sensor_data(
+    project_id: uuid.UUID,
+    interval: str = Query(..., description="Bucket size: <n><unit>, unit s, m, h, d, w or mo (e.g. 5m, 1h, 1d, 1mo)"),
+    start_time: datetime = Query(..., description="Start of the range (inclusive)"),
+    end_time: datetime = Query(..., description="End of the range (exclusive)"),
+    stats: list[str] = Query(["avg"], description="Statistics: count, min, max, avg, sum, stddev, first, last"),
+    group_by: str = Query("sensor_name", description="One series per 'sensor', per 'device' or per 'sensor_name'"),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Agrega as leituras de todos os sensores de todos os dispositivos do projeto em uma
+    única consulta (em vez de uma chamada de médias por dispositivo). Por padrão gera uma
+    série por nome de sensor (ex.: a temperatura média da frota); group_by=device ou
+    group_by=sensor detalham por dispositivo ou por sensor.
+    """
+    aggregation_service = AggregationService(db)
+    result = aggregation_service.aggregate_project_for_user(project_id, current_user.id, group_by, interval, start_time, end_time, stats)
+    return FleetDataAggregation(**result)
+
+@router.get("/{project_id}/anomalies", response_model=AnomalyReport)
+def get_project_anomalies(
+    project_id: uuid.UUID,
+    start_time: datetime | None = Query(None, description="Start of the range (inclusive, default: 24 hours before end_time)"),
+    end_time: datetime | None = Query(None, description="End of the range (exclusive, default: now)"),
+    window: int = Query(30, ge=2, description="Previous readings used for the rolling z-score"),
+    z_threshold: float = Query(4.0, gt=0, description="Minimum |z-score| reported"),
+    rate_threshold: float = Query(8.0, gt=0, description="Minimum robust rate-of-change score reported"),
+    limit: int = Query(1000, ge=1, description="Most recent anomalies returned"),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Detecta anomalias nas leituras de todos os sensores de todos os dispositivos do projeto,
+    em lotes de sensores (uma consulta e um cálculo vetorizado por lote).
+    """
+    anomaly_service = AnomalyService(db)
+    return anomaly_service.detect_for_project(project_id, current_user.id, start_time, end_time, window, z_threshold, rate_threshold, limit)
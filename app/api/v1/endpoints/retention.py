@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from sqlalchemy.orm import Session
+import uuid
+
+from app.schemas.retention import RetentionPolicyCreate, RetentionPolicyOut, RetentionPolicyUpdate
+from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, ENTITY_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
+from app.services.archive_service import archive_job
+from app.services.retention_service import RetentionService, retention_job
+from app.db.models import User as DBUser
+
+router = APIRouter()
+
+def add_retention_policy_links(policy: RetentionPolicyOut) -> dict:
+    links = {
+        "self": {"href": f"/api/v1/retention-policies/{policy.id}", "method": "GET"},
+        "update": {"href": f"/api/v1/retention-policies/{policy.id}", "method": "PUT"},
+        "delete": {"href": f"/api/v1/retention-policies/{policy.id}", "method": "DELETE"},
+    }
+    if policy.project_id:
+        links["project"] = {"href": f"/api/v1/projects/{policy.project_id}", "method": "GET"}
+    if policy.sensor_id:
+        links["sensor"] = {"href": f"/api/v1/sensors/{policy.sensor_id}", "method": "GET"}
+    return policy.model_dump(by_alias=True, exclude_unset=True) | {"_links": links}
+
+@router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(5)
+def create_retention_policy(policy_in: RetentionPolicyCreate, db: Session = Depends(get_db),
+                            current_user: DBUser = Depends(get_current_user)):
+    """
+    Cria uma política de retenção para um projeto ou para um sensor.
+    Leituras brutas mais antigas que raw_retention_days são removidas pelo job de
+    retenção; os rollups por hora e por dia as preservam de forma resumida.
+    """
+    retention_service = RetentionService(db)
+    policy = retention_service.create_policy(policy_in, current_user.id)
+    return add_retention_policy_links(RetentionPolicyOut.model_validate(policy))
+
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(2)
+def read_retention_policies(request: Request, response: Response,
+                            skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                            db: Session = Depends(get_db),
+                            current_user: DBUser = Depends(get_current_user)):
+    """
+    Lista as políticas de retenção dos projetos e sensores do usuário logado.
+    """
+    retention_service = RetentionService(db)
+    policies = retention_service.get_policies_by_user(current_user.id, skip=skip, limit=limit, cursor=cursor)
+    items = [add_retention_policy_links(RetentionPolicyOut.model_validate(p)) for p in policies]
+    return page_response(request, response, items, cursor, next_cursor(policies, limit, ENTITY_KEY))
+
+@router.get("/status", response_model=dict)
+@query_budget(1)
+def read_retention_status(current_user: DBUser = Depends(get_current_user)):
+    """
+    Estado dos jobs de retenção e de arquivamento no tier frio: última execução,
+    duração e linhas/bytes removidos ou arquivados.
+    """
+    return {"retention": retention_job.status(), "archive": archive_job.status()}
+
+@router.get("/{policy_id}", response_model=dict)
+@query_budget(2)
+def read_retention_policy(policy_id: uuid.UUID, db: Session = Depends(get_db),
+                          current_user: DBUser = Depends(get_current_user)):
+    """
+    Obtém uma política de retenção por ID.
+    """
+    retention_service = RetentionService(db)
+    policy = retention_service.get_policy(policy_id, current_user.id)
+    return add_retention_policy_links(RetentionPolicyOut.model_validate(policy))
+
+@router.put("/{policy_id}", response_model=dict)
+@query_budget(4)
+def update_retention_policy(policy_id: uuid.UUID, policy_in: RetentionPolicyUpdate, db: Session = Depends(get_db),
+                            current_user: DBUser = Depends(get_current_user)):
+    """
+    Atualiza os prazos de uma política de retenção.
+    """
+    retention_service = RetentionService(db)
+    policy = retention_service.update_policy(policy_id, policy_in, current_user.id)
+    return add_retention_policy_links(RetentionPolicyOut.model_validate(policy))
+
+@router.delete("/{policy_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
+def delete_retention_policy(policy_id: uuid.UUID, db: Session = Depends(get_db),
+                            current_user: DBUser = Depends(get_current_user)):
+    """
+    Exclui uma política de retenção. Os dados já resumidos permanecem nos rollups.
+    """
+    retention_service = RetentionService(db)
+    retention_service.delete_policy(policy_id, current_user.id)
+    return {"message": "Retention policy deleted successfully"}
@@ -1,18 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 import uuid
 from datetime import datetime
 
-from app.schemas.sensor import SensorCreate
-from app.schemas.sensor_data import IngestDataPayload, SensorDataCreate, SensorDataOut
+from pydantic import ValidationError
+from app.schemas.sensor_data import DeviceIngestSummary, IngestDataPayload, SensorDataAggregation, SensorDataCreate, SensorDataOut, SensorDataSeries
+from app.core import binary_format
+from app.core.cache import device_resolution_cache, sensor_resolution_cache
+from app.core.config import settings
 from app.core.dependencies import get_db, get_current_user
-from app.services.device_service import DeviceService
+from app.core.pagination import CURSOR_DESCRIPTION, READING_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
+from app.services.ingest_buffer import ingest_buffer
+from app.services.aggregation_service import AggregationService
+from app.services.ingest_service import IngestService
 from app.services.sensor_data_service import SensorDataService
 from app.db.models import User as DBUser
-from app.services.sensor_device import SensorService
 
 router = APIRouter()
 
+# Limite de mensagens de erro guardadas por dispositivo no resumo do streaming
+MAX_STREAM_ERRORS_PER_DEVICE = 100
+
 def add_sensor_data_links(data: SensorDataOut) -> dict:
     links = {
         "self": {"href": f"/api/v1/sensor-data/{data.id}", "method": "GET"},
@@ -20,7 +32,31 @@ def add_sensor_data_links(data: SensorDataOut) -> dict:
     }
     return data.model_dump(by_alias=True, exclude_unset=True) | {"_links": links}
 
+def ingest_response(inserted: list, duplicates: int, errors: list[str]):
+    """Monta a resposta das rotas de ingestão síncrona (207 com detalhes quando há erros)."""
+    processed_data_out = [add_sensor_data_links(SensorDataOut.model_validate(row)) for row in inserted]
+    response_detail = {
+        "message": f"Ingested {len(inserted)} readings successfully.",
+        "duplicates": duplicates, # Leituras já gravadas anteriormente (reenvios), ignoradas
+        "ingested_data": processed_data_out # Dados que foram realmente ingeridos
+    }
+    if errors:
+        response_detail["warning"] = "Some readings encountered errors."
+        response_detail["errors"] = errors
+        # Mesmo formato de um HTTPException, mas serializando Decimal/UUID das leituras
+        return JSONResponse(status_code=status.HTTP_207_MULTI_STATUS, content=jsonable_encoder({"detail": response_detail}))
+    return response_detail
+
+def buffered_ingest_response(accepted: int, errors: list[str]) -> JSONResponse:
+    """Monta a resposta 202 das rotas de ingestão no modo write-behind."""
+    response_detail = {"message": f"Accepted {accepted} readings for ingestion."}
+    if errors:
+        response_detail["warning"] = "Some readings encountered errors."
+        response_detail["errors"] = errors
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=response_detail)
+
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(6)
 def create_sensor_data(data_in: SensorDataCreate, db: Session = Depends(get_db),
                        current_user: DBUser = Depends(get_current_user)):
     """
@@ -31,8 +67,11 @@ def create_sensor_data(data_in: SensorDataCreate, db: Session = Depends(get_db),
     data = sensor_data_service.create_sensor_data(data_in, current_user.id)
     return add_sensor_data_links(SensorDataOut.model_validate(data))
 
-@router.get("/", response_model=list[dict])
-def read_sensor_data(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(4)
+def read_sensor_data(request: Request, response: Response,
+                     skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                     db: Session = Depends(get_db),
                      current_user: DBUser = Depends(get_current_user),
                      sensor_id: uuid.UUID | None = None,
                      start_time: datetime | None = Query(None, description="Start timestamp for data filtering"),
@@ -43,17 +82,60 @@ def read_sensor_data(skip: int = 0, limit: int = 100, db: Session = Depends(get_
     """
     sensor_data_service = SensorDataService(db)
     if sensor_id:
-        data = sensor_data_service.get_data_by_sensor(sensor_id, current_user.id, start_time=start_time, end_time=end_time, skip=skip, limit=limit)
+        data = sensor_data_service.get_data_by_sensor(sensor_id, current_user.id, start_time=start_time, end_time=end_time,
+                                                      skip=skip, limit=limit, cursor=cursor)
     else:
         # Não é recomendado listar TODOS os dados de sensor sem filtro em um projeto real devido ao volume
         # Para fins de demonstração, pode-se descomentar, mas avisar sobre o potencial de lentidão
         # data = sensor_data_service.get_all_sensor_data(skip=skip, limit=limit)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Please provide a 'sensor_id' to filter sensor data.")
     
-    return [add_sensor_data_links(SensorDataOut.model_validate(d)) for d in data]
+    items = [add_sensor_data_links(SensorDataOut.model_validate(d)) for d in data]
+    return page_response(request, response, items, cursor, next_cursor(data, limit, READING_KEY))
 
+@router.get("/aggregates", response_model=SensorDataAggregation, response_model_exclude_unset=True)
+@query_budget(3)
+def aggregate_sensor_data(
+    sensor_id: list[uuid.UUID] = Query(..., description="Sensors to aggregate (repeat the parameter for several)"),
+    interval: str = Query(..., description="Bucket size: <n><unit>, unit s, m, h, d, w or mo (e.g. 5m, 1h, 1d, 1mo)"),
+    start_time: datetime = Query(..., description="Start of the range (inclusive)"),
+    end_time: datetime = Query(..., description="End of the range (exclusive)"),
+    stats: list[str] = Query(["avg"], description="Statistics: count, min, max, avg, sum, stddev, first, last"),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Agrega as leituras de um ou mais sensores em buckets de tamanho arbitrário dentro de um
+    intervalo de tempo, calculando todas as estatísticas pedidas em uma única consulta.
+    Com apenas count, min, max, avg e sum, e limites alinhados ao minuto, a consulta lê os
+    rollups em vez das leituras brutas ("source" indica a tabela usada).
+    """
+    aggregation_service = AggregationService(db)
+    result = aggregation_service.aggregate_for_user(sensor_id, current_user.id, interval, start_time, end_time, stats)
+    # Cada bucket é montado só com as estatísticas pedidas; as demais não aparecem na resposta
+    return SensorDataAggregation(**result)
+
+@router.get("/series", response_model=SensorDataSeries)
+@query_budget(4)
+def read_sensor_data_series(
+    sensor_id: uuid.UUID,
+    start_time: datetime = Query(..., description="Start of the range (inclusive)"),
+    end_time: datetime = Query(..., description="End of the range (exclusive)"),
+    points: int = Query(1000, ge=3, description="Maximum number of points to return (e.g. the chart width in pixels)"),
+    method: str = Query("lttb", description="Downsampling method: 'lttb' or 'minmax'"),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Retorna a série de um sensor pronta para gráficos, reduzida no servidor a no máximo
+    `points` pontos: 'lttb' preserva o formato da curva e 'minmax' mantém o mínimo e o
+    máximo de cada bucket de tempo (todos os picos). Inclui as leituras arquivadas.
+    """
+    sensor_data_service = SensorDataService(db)
+    return sensor_data_service.get_series(sensor_id, current_user.id, start_time, end_time, points, method)
 
 @router.get("/{data_id}", response_model=dict)
+@query_budget(2)
 def read_single_sensor_data(data_id: uuid.UUID, db: Session = Depends(get_db),
                              current_user: DBUser = Depends(get_current_user)):
     """
@@ -61,12 +143,11 @@ def read_single_sensor_data(data_id: uuid.UUID, db: Session = Depends(get_db),
     O usuário deve ser o proprietário do projeto ao qual o dado pertence.
     """
     sensor_data_service = SensorDataService(db)
-    data = sensor_data_service.get_sensor_data(data_id)
-    if data.sensor.device.project.user_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this sensor data")
+    data = sensor_data_service.get_sensor_data_for_user(data_id, current_user.id)
     return add_sensor_data_links(SensorDataOut.model_validate(data))
 
 @router.delete("/{data_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(11)
 def delete_sensor_data(data_id: uuid.UUID, db: Session = Depends(get_db),
                        current_user: DBUser = Depends(get_current_user)):
     """
@@ -78,6 +159,7 @@ def delete_sensor_data(data_id: uuid.UUID, db: Session = Depends(get_db),
     return {"message": "Sensor data deleted successfully"}
 
 @router.post("/ingest", status_code=status.HTTP_207_MULTI_STATUS) # Use 207 para indicar sucesso parcial
+@query_budget(6)
 def ingest_generic_sensor_data(
     payload: IngestDataPayload,
     db: Session = Depends(get_db)
@@ -85,76 +167,155 @@ def ingest_generic_sensor_data(
     """
     Endpoint genérico para ingestão de dados de múltiplos sensores de um dispositivo IoT.
     Recebe um número de série do dispositivo e uma lista de leituras.
-    Para cada leitura, tenta encontrar o sensor correspondente. Se o sensor não existir
-    e a lógica de negócio permitir, ele pode ser criado dinamicamente.
+    Todos os sensores do payload são resolvidos em uma única consulta; os que não existem
+    são criados dinamicamente em um único INSERT, e as leituras são gravadas com um
+    INSERT multi-linha em uma única transação.
+    A ingestão é idempotente por (sensor, timestamp): leituras reenviadas são ignoradas
+    e contadas em "duplicates", então o gateway pode repetir a chamada após um timeout.
     Retorna 207 Multi-Status se houver sucesso parcial com erros.
+    Com INGEST_WRITE_BEHIND ativo, as leituras são apenas enfileiradas e a resposta é 202.
     """
-    device_service = DeviceService(db)
-    sensor_service = SensorService(db)
-    sensor_data_service = SensorDataService(db)
+    ingest_service = IngestService(db)
+
+    if ingest_buffer.is_running:
+        # Modo write-behind: as leituras são gravadas em lote por uma thread de fundo
+        accepted, errors = ingest_service.buffer_readings(payload.device_serial_number, payload.readings)
+        return buffered_ingest_response(accepted, errors)
 
-    # 1. Encontrar o Dispositivo pelo número de série
-    device = device_service.device_repo.get_by_serial_number(payload.device_serial_number)
-    if not device:
+    inserted, duplicates, errors = ingest_service.ingest_readings(payload.device_serial_number, payload.readings)
+    return ingest_response(inserted, duplicates, errors)
+
+@router.post("/ingest/binary", status_code=status.HTTP_207_MULTI_STATUS)
+@query_budget(6)
+async def ingest_binary_sensor_data(request: Request, db: Session = Depends(get_db)):
+    """
+    Ingestão no formato binário compacto (Content-Type: application/vnd.iot-readings),
+    para gateways em links com tráfego tarifado. O layout está documentado em
+    app/core/binary_format.py: cada leitura ocupa 18 bytes (índice do sensor, epoch em
+    milissegundos e valor float64). As leituras são decodificadas de forma vetorizada
+    direto para o INSERT em lote, sem criar um SensorReading por leitura.
+    A resposta é a mesma da rota JSON /ingest.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() != binary_format.CONTENT_TYPE:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Device with serial number '{payload.device_serial_number}' not found."
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be {binary_format.CONTENT_TYPE}."
         )
+    try:
+        payload = binary_format.decode_payload(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Para criar sensores dinamicamente ou para operações de SensorData,
-    # precisamos do user_id do proprietário do projeto ao qual o dispositivo pertence.
-    # Em um cenário de produção, um token de dispositivo dedicado seria mais seguro.
-    owner_user_id = device.project.user_id
+    ingest_service = IngestService(db)
+    if ingest_buffer.is_running:
+        accepted, errors = await run_in_threadpool(ingest_service.buffer_binary, payload)
+        return buffered_ingest_response(accepted, errors)
+
+    inserted, duplicates, errors = await run_in_threadpool(ingest_service.ingest_binary, payload)
+    return ingest_response(inserted, duplicates, errors)
+
+@router.post("/ingest/stream", response_model=list[DeviceIngestSummary], status_code=status.HTTP_207_MULTI_STATUS)
+async def ingest_sensor_data_stream(request: Request, db: Session = Depends(get_db)):
+    """
+    Ingestão em streaming para gateways que atendem muitos dispositivos.
+    O corpo é NDJSON (application/x-ndjson): cada linha é um IngestDataPayload
+    ({"device_serial_number": ..., "readings": [...]}).
+    O corpo é lido de forma incremental e cada linha é validada e gravada em blocos de
+    no máximo INGEST_STREAM_CHUNK_SIZE leituras, então o uso de memória não depende do
+    tamanho total do upload. Retorna um resumo por dispositivo ao final; erros de linhas
+    que não puderam ser lidas aparecem em um resumo com device_serial_number vazio.
+    Com INGEST_WRITE_BEHIND ativo, cada bloco é enfileirado no buffer (contado em
+    "accepted"); com a fila cheia a resposta é 503 e o gateway reenvia o upload, já que
+    leituras repetidas são ignoradas pela deduplicação.
+    """
+    ingest_service = IngestService(db)
+    write_behind = ingest_buffer.is_running
+    summaries: dict[str, DeviceIngestSummary] = {}
+    devices = {}
+    stream_errors = DeviceIngestSummary(device_serial_number="")
 
-    ingested_count = 0
-    errors = []
-    processed_data_out = [] # Para retornar os dados que foram ingeridos com sucesso
+    def add_errors(summary: DeviceIngestSummary, errors: list[str], failed: int):
+        summary.failed += failed
+        room = MAX_STREAM_ERRORS_PER_DEVICE - len(summary.errors)
+        summary.errors.extend(errors[:max(room, 0)])
 
-    # Use uma transação para toda a operação de ingestão do payload
-    for reading in payload.readings:
+    async def process_line(line_number: int, line: bytes):
+        if not line.strip():
+            return
         try:
-            # Tenta encontrar o sensor usando o nome/ID fornecido e o ID do dispositivo
-            sensor = sensor_service.sensor_repo.get_by_name_and_device(
-                name=reading.sensor_name_or_id,
-                device_id=device.id
-            )
-            if not sensor:
-                # Se o sensor não existir, cria-o dinamicamente
-                new_sensor_schema = SensorCreate(
-                    name=reading.sensor_name_or_id,
-                    unit_of_measurement=reading.unit_of_measurement,
-                    device_id=device.id
-                )
-                sensor = sensor_service.create_sensor(new_sensor_schema, owner_user_id)
-                print(f"DEBUG: Sensor '{reading.sensor_name_or_id}' criado (ID: {sensor.id}) para o dispositivo '{device.name}'.")
-
-            # Criar o SensorData para a leitura
-            sensor_data_schema = SensorDataCreate(
-                sensor_id=sensor.id,
-                value=reading.value,
-                timestamp=reading.timestamp if reading.timestamp else datetime.utcnow()
+            payload = IngestDataPayload.model_validate_json(line)
+        except ValidationError as e:
+            add_errors(stream_errors, [f"Linha {line_number}: payload inválido - {e.errors()[0]['msg']}"], 0)
+            return
+
+        serial = payload.device_serial_number
+        summary = summaries.setdefault(serial, DeviceIngestSummary(device_serial_number=serial))
+        if serial not in devices:
+            try:
+                devices[serial] = await run_in_threadpool(ingest_service.resolve_device, serial)
+            except HTTPException as e:
+                devices[serial] = None
+                add_errors(summary, [e.detail], 0)
+        device = devices[serial]
+        if device is None:
+            add_errors(summary, [], len(payload.readings))
+            return
+
+        chunk_size = settings.INGEST_STREAM_CHUNK_SIZE
+        for start in range(0, len(payload.readings), chunk_size):
+            chunk = payload.readings[start:start + chunk_size]
+            if write_behind:
+                accepted, errors = await run_in_threadpool(ingest_service.buffer_for_device, device, serial, chunk)
+                summary.accepted += accepted
+                add_errors(summary, errors, len(errors))
+                continue
+            inserted, duplicates, errors = await run_in_threadpool(ingest_service.ingest_for_device, device, serial, chunk)
+            summary.ingested += len(inserted)
+            summary.duplicates += duplicates
+            add_errors(summary, errors, len(errors))
+
+    def check_line_length(length: int):
+        if length > settings.INGEST_STREAM_MAX_LINE_BYTES:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line {line_number + 1} exceeds {settings.INGEST_STREAM_MAX_LINE_BYTES} bytes."
             )
-                
-            # A camada de serviço já garante a atomicidade interna, mas a transação externa
-            # garante que múltiplas inserções/criações para um payload sejam atômicas.
-            new_data = sensor_data_service.create_sensor_data(sensor_data_schema, owner_user_id)
-            processed_data_out.append(add_sensor_data_links(SensorDataOut.model_validate(new_data)))
-            ingested_count += 1
-
-        except HTTPException as e:
-            errors.append(f"Leitura '{reading.sensor_name_or_id}' (Disp: {payload.device_serial_number}): {e.detail}")
-            print(f"DEBUG: Erro ao processar leitura: {e.detail}")
-        except Exception as e:
-            errors.append(f"Leitura '{reading.sensor_name_or_id}' (Disp: {payload.device_serial_number}): Erro inesperado - {str(e)}")
-            print(f"DEBUG: Erro inesperado: {e}")
-        
-    response_detail = {
-        "message": f"Ingested {ingested_count} readings successfully.",
-        "ingested_data": processed_data_out # Dados que foram realmente ingeridos
-    }
-    if errors:
-        response_detail["warning"] = "Some readings encountered errors."
-        response_detail["errors"] = errors
-        raise HTTPException(status_code=status.HTTP_207_MULTI_STATUS, detail=response_detail)
 
-    return response_detail
+    buffer = b""
+    line_number = 0
+    async for data in request.stream():
+        buffer += data
+        # As linhas completas do bloco são localizadas por posição; o restante (linha
+        # incompleta) é copiado uma vez por bloco recebido
+        start = 0
+        end = buffer.find(b"\n")
+        while end != -1:
+            check_line_length(end - start)
+            line_number += 1
+            await process_line(line_number, buffer[start:end])
+            start = end + 1
+            end = buffer.find(b"\n", start)
+        buffer = buffer[start:]
+        check_line_length(len(buffer))
+    if buffer:
+        await process_line(line_number + 1, buffer)
+
+    result = list(summaries.values())
+    if stream_errors.errors:
+        result.append(stream_errors)
+    return result
+
+@router.get("/ingest/metrics", response_model=dict)
+@query_budget(1)
+def read_ingest_metrics(current_user: DBUser = Depends(get_current_user)):
+    """
+    Métricas operacionais da ingestão (profundidade da fila write-behind,
+    latência de flush, itens descartados e acertos do cache de resolução).
+    """
+    return {
+        "write_behind": ingest_buffer.metrics(),
+        "resolution_cache": {
+            "devices": device_resolution_cache.stats(),
+            "sensors": sensor_resolution_cache.stats(),
+        },
+    }
@@ -1,10 +1,12 @@
 from app.services.sensor_device import SensorService
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 import uuid
 
 from app.schemas.sensor import SensorCreate, SensorOut, SensorUpdate
 from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, ENTITY_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
 from app.db.models import User as DBUser
 
 router = APIRouter()
@@ -21,6 +23,7 @@ def add_sensor_links(sensor: SensorOut) -> dict:
     return sensor.model_dump(by_alias=True, exclude_unset=True) | {"_links": links}
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 def create_sensor(sensor_in: SensorCreate, db: Session = Depends(get_db),
                   current_user: DBUser = Depends(get_current_user)):
     """
@@ -31,8 +34,11 @@ def create_sensor(sensor_in: SensorCreate, db: Session = Depends(get_db),
     sensor = sensor_service.create_sensor(sensor_in, current_user.id)
     return add_sensor_links(SensorOut.model_validate(sensor))
 
-@router.get("/", response_model=list[dict])
-def read_sensors(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(3)
+def read_sensors(request: Request, response: Response,
+                 skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+                 db: Session = Depends(get_db),
                  current_user: DBUser = Depends(get_current_user),
                  device_id: uuid.UUID | None = None):
     """
@@ -41,15 +47,17 @@ def read_sensors(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
     """
     sensor_service = SensorService(db)
     if device_id:
-        sensors = sensor_service.get_sensors_by_device(device_id, current_user.id, skip=skip, limit=limit)
+        sensors = sensor_service.get_sensors_by_device(device_id, current_user.id, skip=skip, limit=limit, cursor=cursor)
     else:
         # Lista todos os sensores que o usuário tem acesso (mais complexo sem filtro)
         # Por simplicidade, pode-se exigir device_id ou implementar um filtro mais amplo aqui
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Please provide a 'device_id' parameter.")
     
-    return [add_sensor_links(SensorOut.model_validate(s)) for s in sensors]
+    items = [add_sensor_links(SensorOut.model_validate(s)) for s in sensors]
+    return page_response(request, response, items, cursor, next_cursor(sensors, limit, ENTITY_KEY))
 
 @router.get("/{sensor_id}", response_model=dict)
+@query_budget(2)
 def read_sensor(sensor_id: uuid.UUID, db: Session = Depends(get_db),
                 current_user: DBUser = Depends(get_current_user)):
     """
@@ -57,12 +65,11 @@ def read_sensor(sensor_id: uuid.UUID, db: Session = Depends(get_db),
     O usuário deve ser o proprietário do projeto ao qual o sensor pertence.
     """
     sensor_service = SensorService(db)
-    sensor = sensor_service.get_sensor(sensor_id)
-    if sensor.device.project.user_id != current_user.id:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this sensor")
+    sensor = sensor_service.get_sensor_for_user(sensor_id, current_user.id)
     return add_sensor_links(SensorOut.model_validate(sensor))
 
 @router.put("/{sensor_id}", response_model=dict)
+@query_budget(4)
 def update_sensor(sensor_id: uuid.UUID, sensor_in: SensorUpdate, db: Session = Depends(get_db),
                   current_user: DBUser = Depends(get_current_user)):
     """
@@ -74,6 +81,7 @@ def update_sensor(sensor_id: uuid.UUID, sensor_in: SensorUpdate, db: Session = D
     return add_sensor_links(SensorOut.model_validate(updated_sensor))
 
 @router.delete("/{sensor_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
 def delete_sensor(sensor_id: uuid.UUID, db: Session = Depends(get_db),
                   current_user: DBUser = Depends(get_current_user)):
     """
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from sqlalchemy.orm import Session
 import uuid
+from datetime import datetime
 
+from app.schemas.sensor_data import FleetDataAggregation
 from app.schemas.tag import TagCreate, TagOut, TagUpdate
 from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, SEARCH_KEY, TAG_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
+from app.services.aggregation_service import AggregationService
 from app.services.tag_service import TagService
 from app.db.models import User as DBUser
 
@@ -22,6 +27,7 @@ def add_tag_links(tag: TagOut) -> dict:
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@query_budget(4)
 def create_tag(tag_in: TagCreate, db: Session = Depends(get_db),
                current_user: DBUser = Depends(get_current_user)): # Tags podem ser criadas por qualquer usuário autenticado
     """
@@ -31,8 +37,11 @@ def create_tag(tag_in: TagCreate, db: Session = Depends(get_db),
     tag = tag_service.create_tag(tag_in)
     return add_tag_links(TagOut.model_validate(tag))
 
-@router.get("/", response_model=list[dict])
-def read_tags(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(3)
+def read_tags(request: Request, response: Response,
+              skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+              db: Session = Depends(get_db),
               current_user: DBUser = Depends(get_current_user),
               query: str | None = None):
     """
@@ -40,13 +49,17 @@ def read_tags(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
     """
     tag_service = TagService(db)
     if query:
-        tags = tag_service.search_tags(query, skip=skip, limit=limit)
+        tags = tag_service.search_tags(query, skip=skip, limit=limit, cursor=cursor)
+        key = SEARCH_KEY
     else:
-        tags = tag_service.get_all_tags(skip=skip, limit=limit)
+        tags = tag_service.get_all_tags(skip=skip, limit=limit, cursor=cursor)
+        key = TAG_KEY
     
-    return [add_tag_links(TagOut.model_validate(t)) for t in tags]
+    items = [add_tag_links(TagOut.model_validate(t)) for t in tags]
+    return page_response(request, response, items, cursor, next_cursor(tags, limit, key))
 
 @router.get("/{tag_id}", response_model=dict)
+@query_budget(2)
 def read_tag(tag_id: uuid.UUID, db: Session = Depends(get_db),
              current_user: DBUser = Depends(get_current_user)):
     """
@@ -57,6 +70,7 @@ def read_tag(tag_id: uuid.UUID, db: Session = Depends(get_db),
     return add_tag_links(TagOut.model_validate(tag))
 
 @router.put("/{tag_id}", response_model=dict)
+@query_budget(4)
 def update_tag(tag_id: uuid.UUID, tag_in: TagUpdate, db: Session = Depends(get_db),
                current_user: DBUser = Depends(get_current_user)):
     """
@@ -67,6 +81,7 @@ def update_tag(tag_id: uuid.UUID, tag_in: TagUpdate, db: Session = Depends(get_d
     return add_tag_links(TagOut.model_validate(updated_tag))
 
 @router.delete("/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
 def delete_tag(tag_id: uuid.UUID, db: Session = Depends(get_db),
                current_user: DBUser = Depends(get_current_user)):
     """
@@ -74,4 +89,25 @@ def delete_tag(tag_id: uuid.UUID, db: Session = Depends(get_db),
     """
     tag_service = TagService(db)
     tag_service.delete_tag(tag_id)
-    return {"message": "Tag deleted successfully"}
\ No newline at end of file
+    return {"message": "Tag deleted successfully"}
+
+@router.get("/{tag_id}/sensor-data/aggregates", response_model=FleetDataAggregation, response_model_exclude_unset=True)
+@query_budget(4)
+def aggregate_tag_sensor_data(
+    tag_id: uuid.UUID,
+    interval: str = Query(..., description="Bucket size: <n><unit>, unit s, m, h, d, w or mo (e.g. 5m, 1h, 1d, 1mo)"),
+    start_time: datetime = Query(..., description="Start of the range (inclusive)"),
+    end_time: datetime = Query(..., description="End of the range (exclusive)"),
+    stats: list[str] = Query(["avg"], description="Statistics: count, min, max, avg, sum, stddev, first, last"),
+    group_by: str = Query("sensor_name", description="One series per 'sensor', per 'device' or per 'sensor_name'"),
+    db: Session = Depends(get_db),
+    current_user: DBUser = Depends(get_current_user)
+):
+    """
+    Agrega, em uma única consulta, as leituras dos sensores dos dispositivos do usuário
+    marcados com a tag, diretamente ou pelo projeto. As opções são as mesmas da agregação
+    por projeto.
+    """
+    aggregation_service = AggregationService(db)
+    result = aggregation_service.aggregate_tag_for_user(tag_id, current_user.id, group_by, interval, start_time, end_time, stats)
+    return FleetDataAggregation(**result)
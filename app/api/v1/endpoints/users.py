@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.orm import Session
 import uuid
 
 from app.schemas.user import UserCreate, UserOut, UserUpdate
 from app.core.dependencies import get_db, get_current_user
+from app.core.pagination import CURSOR_DESCRIPTION, ENTITY_KEY, next_cursor, page_response
+from app.core.query_budget import query_budget
 from app.services.user_service import UserService
 from app.db.models import User as DBUser
 
@@ -17,17 +19,22 @@ def add_user_links(user: UserOut) -> dict:
     }
     return user.model_dump(by_alias=True, exclude_unset=True) | {"_links": links}
 
-@router.get("/", response_model=list[dict])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
+@router.get("/", response_model=list[dict] | dict)
+@query_budget(2)
+def read_users(request: Request, response: Response,
+               skip: int = 0, limit: int = 100, cursor: str | None = Query(None, description=CURSOR_DESCRIPTION),
+               db: Session = Depends(get_db),
                current_user: DBUser = Depends(get_current_user)):
     """
     Lista todos os usuários. Requer autenticação.
     """
     user_service = UserService(db)
-    users = user_service.get_all_users(skip=skip, limit=limit)
-    return [add_user_links(UserOut.from_orm(user)) for user in users]
+    users = user_service.get_all_users(skip=skip, limit=limit, cursor=cursor)
+    items = [add_user_links(UserOut.from_orm(user)) for user in users]
+    return page_response(request, response, items, cursor, next_cursor(users, limit, ENTITY_KEY))
 
 @router.get("/{user_id}", response_model=dict)
+@query_budget(2)
 def read_user(user_id: uuid.UUID, db: Session = Depends(get_db),
               current_user: DBUser = Depends(get_current_user)):
     """
@@ -40,6 +47,7 @@ def read_user(user_id: uuid.UUID, db: Session = Depends(get_db),
     return add_user_links(UserOut.from_orm(user))
 
 @router.put("/{user_id}", response_model=dict)
+@query_budget(3)
 def update_user(user_id: uuid.UUID, user_in: UserUpdate, db: Session = Depends(get_db),
                 current_user: DBUser = Depends(get_current_user)):
     """
@@ -52,6 +60,7 @@ def update_user(user_id: uuid.UUID, user_in: UserUpdate, db: Session = Depends(g
     return add_user_links(UserOut.from_orm(updated_user))
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@query_budget(3)
 def delete_user(user_id: uuid.UUID, db: Session = Depends(get_db),
                 current_user: DBUser = Depends(get_current_user)):
     """
@@ -0,0 +1,140 @@
+"""
+Avaliação incremental das regras de alerta por limite (threshold) com histerese.
+
+As regras habilitadas ficam em memória, indexadas por sensor_id: cada leitura gravada custa
+uma busca no dicionário e uma comparação por regra do sensor, sem consultar o banco. O
+índice é por processo e é recarregado do banco (onde o estado de cada regra é persistido)
+a cada ALERT_RULES_REFRESH_SECONDS, quando uma regra muda neste processo ou quando uma
+transação que gerou transições é revertida.
+
+Estados de uma regra:
+
+    ok     valor dentro de [lower, upper]
+    high   valor acima de upper; volta a ok só abaixo de upper - hysteresis
+    low    valor abaixo de lower; volta a ok só acima de lower + hysteresis
+"""
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Iterable
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+STATES = ("ok", "high", "low")
+# Marca, em Session.info, uma transação que gerou transições ainda não confirmadas
+PENDING_TRANSITIONS = "alert_transitions_pending"
+
+class RuleState:
+    __slots__ = ("rule_id", "sensor_id", "lower", "upper", "hysteresis", "state", "last_timestamp")
+
+    def __init__(self, rule_id: uuid.UUID, sensor_id: uuid.UUID, lower: float | None, upper: float | None,
+                 hysteresis: float, state: str, last_timestamp: datetime | None):
+        self.rule_id = rule_id
+        self.sensor_id = sensor_id
+        self.lower = lower
+        self.upper = upper
+        self.hysteresis = hysteresis
+        self.state = state
+        self.last_timestamp = last_timestamp
+
+    def next_state(self, value: float) -> str:
+        if self.upper is not None and value > self.upper:
+            return "high"
+        if self.lower is not None and value < self.lower:
+            return "low"
+        # Dentro dos limites, mas ainda na faixa de histerese: mantém o alarme
+        if self.state == "high" and self.upper is not None and value > self.upper - self.hysteresis:
+            return "high"
+        if self.state == "low" and self.lower is not None and value < self.lower + self.hysteresis:
+            return "low"
+        return "ok"
+
+class AlertRuleIndex:
+    """Regras habilitadas por sensor_id, com o estado atual de cada uma. Thread-safe."""
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._rules: dict[uuid.UUID, list[RuleState]] = {}
+        self._loaded_at: float | None = None
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.transitions = 0
+        self.reloads = 0
+
+    @property
+    def is_stale(self) -> bool:
+        loaded_at = self._loaded_at
+        return loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds
+
+    def load(self, rules: Iterable[RuleState]):
+        index = {}
+        for rule in rules:
+            index.setdefault(rule.sensor_id, []).append(rule)
+        with self._lock:
+            self._rules = index
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def evaluate(self, readings: Iterable) -> list[dict]:
+        """
+        Avalia leituras com sensor_id, value e timestamp, na ordem de timestamp, e devolve as
+        transições de estado (uma por mudança). Leituras anteriores à última avaliada pela
+        regra (reenvios, backfill) não mudam o estado.
+        """
+        transitions = []
+        with self._lock:
+            rules = self._rules
+            if not rules:
+                return transitions
+            matching = [r for r in readings if r.sensor_id in rules]
+            for reading in sorted(matching, key=lambda r: r.timestamp):
+                value = float(reading.value)
+                for rule in rules[reading.sensor_id]:
+                    if rule.last_timestamp is not None and reading.timestamp < rule.last_timestamp:
+                        continue
+                    rule.last_timestamp = reading.timestamp
+                    state = rule.next_state(value)
+                    if state != rule.state:
+                        transitions.append({
+                            "rule_id": rule.rule_id,
+                            "sensor_id": rule.sensor_id,
+                            "previous_state": rule.state,
+                            "state": state,
+                            "value": reading.value,
+                            "timestamp": reading.timestamp,
+                        })
+                        rule.state = state
+            self.evaluated += len(matching)
+            self.transitions += len(transitions)
+        return transitions
+
+    def stats(self) -> dict:
+        with self._lock:
+            sensors = len(self._rules)
+            rules = sum(len(r) for r in self._rules.values())
+        return {
+            "sensors": sensors,
+            "rules": rules,
+            "evaluated": self.evaluated,
+            "transitions": self.transitions,
+            "reloads": self.reloads,
+        }
+
+alert_rule_index = AlertRuleIndex(settings.ALERT_RULES_REFRESH_SECONDS)
+
+# O estado em memória muda antes do commit; se a transação for revertida, o índice é
+# recarregado do banco na próxima avaliação.
+@event.listens_for(Session, "after_commit")
+def _clear_pending_transitions(session: Session):
+    session.info.pop(PENDING_TRANSITIONS, None)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_transitions(session: Session):
+    if session.info.pop(PENDING_TRANSITIONS, None):
+        alert_rule_index.invalidate()
@@ -0,0 +1,91 @@
+"""
+Detecção de anomalias vetorizada sobre leituras de vários sensores de uma vez. As leituras
+chegam como arrays paralelos ordenados por (sensor, timestamp):
+
+    index       int      ordinal do sensor (0..n_sensors-1) de cada leitura
+    timestamps  int64    epoch em microssegundos
+    values      float64  valor
+
+Cada função devolve um array do mesmo tamanho das leituras, sem laços em Python por leitura.
+
+    range_violations        valor fora de [min_value, max_value] do sensor
+    rolling_zscores         z-score em relação às `window` leituras anteriores do mesmo sensor
+    rate_of_change_scores   escore robusto (mediana/MAD do sensor) da taxa de variação por segundo
+"""
+import numpy as np
+
+# Converte o MAD em estimativa do desvio padrão para dados normais
+MAD_SCALE = 1.4826
+
+def segment_starts(index: np.ndarray) -> np.ndarray:
+    """Posição da primeira leitura do sensor de cada leitura."""
+    first = np.ones(len(index), dtype=bool)
+    first[1:] = index[1:] != index[:-1]
+    return np.maximum.accumulate(np.where(first, np.arange(len(index)), 0))
+
+def range_violations(index: np.ndarray, values: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """lower/upper são arrays por sensor; NaN significa sem limite (comparações com NaN são falsas)."""
+    return (values < lower[index]) | (values > upper[index])
+
+def rolling_zscores(index: np.ndarray, values: np.ndarray, window: int) -> np.ndarray:
+    """
+    z-score de cada leitura em relação à média e ao desvio padrão das `window` leituras
+    anteriores do mesmo sensor, por somas acumuladas. NaN enquanto a janela não está cheia
+    ou quando a janela é constante.
+    """
+    n = len(values)
+    starts = segment_starts(index)
+    # Centrar cada sensor no seu primeiro valor reduz o cancelamento numérico nas somas
+    centered = values - values[starts]
+    s1 = np.r_[0.0, np.cumsum(centered)]
+    s2 = np.r_[0.0, np.cumsum(centered * centered)]
+    position = np.arange(n)
+    lo = np.maximum(position - window, starts)
+    count = position - lo
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (s1[position] - s1[lo]) / count
+        variance = np.maximum((s2[position] - s2[lo]) / count - mean * mean, 0.0)
+        std = np.sqrt(variance)
+        z = (centered - mean) / std
+    z[(count < window) | (std == 0)] = np.nan
+    return z
+
+def _segment_medians(index: np.ndarray, values: np.ndarray, n_segments: int) -> np.ndarray:
+    """Mediana de values por segmento (NaN para segmentos vazios)."""
+    order = np.lexsort((values, index))
+    sorted_values = values[order]
+    counts = np.bincount(index, minlength=n_segments)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    medians = np.full(n_segments, np.nan)
+    present = counts > 0
+    s, c = starts[present], counts[present]
+    medians[present] = (sorted_values[s + (c - 1) // 2] + sorted_values[s + c // 2]) / 2
+    return medians
+
+def rate_of_change_scores(index: np.ndarray, timestamps: np.ndarray, values: np.ndarray, n_sensors: int) -> np.ndarray:
+    """
+    Taxa de variação (valor/segundo) de cada leitura em relação à anterior do mesmo sensor,
+    convertida em escore robusto |taxa - mediana| / (1.4826 * MAD) com a mediana e o MAD das
+    taxas do sensor. NaN na primeira leitura de cada sensor e quando o MAD é zero.
+    """
+    n = len(values)
+    rates = np.full(n, np.nan)
+    if n > 1:
+        elapsed = np.diff(timestamps) / 1e6
+        same_sensor = (index[1:] == index[:-1]) & (elapsed > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates[1:] = np.where(same_sensor, np.diff(values) / elapsed, np.nan)
+
+    scores = np.full(n, np.nan)
+    valid = ~np.isnan(rates)
+    if not valid.any():
+        return scores
+    valid_index = index[valid]
+    valid_rates = rates[valid]
+    medians = _segment_medians(valid_index, valid_rates, n_sensors)
+    deviations = np.abs(valid_rates - medians[valid_index])
+    mads = _segment_medians(valid_index, deviations, n_sensors)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = MAD_SCALE * mads[valid_index]
+        scores[valid] = np.where(scale > 0, deviations / scale, np.nan)
+    return scores
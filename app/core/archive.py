@@ -0,0 +1,89 @@
+"""
+Arquivos do tier frio de sensor_data: um arquivo Arrow IPC por sensor e intervalo
+arquivado, com as colunas id (16 bytes), timestamp (µs, sem fuso) e value (texto
+decimal, sem perda de precisão do Numeric). As linhas ficam ordenadas por timestamp,
+então a leitura de um intervalo é uma busca binária sobre o arquivo mapeado em memória,
+sem carregar o restante do arquivo.
+"""
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.binary(16)),
+    ("timestamp", pa.timestamp("us")),
+    ("value", pa.string()),
+])
+
+def write_archive(path: str, chunks: Iterable[list], metadata: dict[str, str]) -> int:
+    """
+    Grava as linhas (id, timestamp, value), já ordenadas por timestamp, em lotes.
+    O arquivo é escrito com outro nome e renomeado ao final, então um arquivo no
+    caminho final está sempre completo. Retorna o número de linhas gravadas.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    written = 0
+    schema = ARCHIVE_SCHEMA.with_metadata(metadata)
+    try:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for chunk in chunks:
+                writer.write_batch(pa.record_batch([
+                    pa.array([row.id.bytes for row in chunk], pa.binary(16)),
+                    pa.array([row.timestamp for row in chunk], pa.timestamp("us")),
+                    pa.array([str(row.value) for row in chunk], pa.string()),
+                ], schema=schema))
+                written += len(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_archive(tmp_path)
+        raise
+    return written
+
+def read_archive(path: str, start_time: datetime | None = None, end_time: datetime | None = None,
+                 newest: int | None = None) -> list[tuple[uuid.UUID, datetime, Decimal]]:
+    """
+    Lê as linhas com start_time <= timestamp <= end_time, da mais recente para a mais
+    antiga, limitadas às `newest` mais recentes se informado.
+    """
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        timestamps = table.column("timestamp").to_numpy()
+        lo = np.searchsorted(timestamps, np.datetime64(start_time, "us"), side="left") if start_time else 0
+        hi = np.searchsorted(timestamps, np.datetime64(end_time, "us"), side="right") if end_time else len(timestamps)
+        if newest is not None:
+            lo = max(lo, hi - newest)
+        if hi <= lo:
+            return []
+        window = table.slice(lo, hi - lo)
+        rows = zip(
+            window.column("id").to_pylist(),
+            window.column("timestamp").to_pylist(),
+            window.column("value").to_pylist(),
+        )
+        return [(uuid.UUID(bytes=raw_id), ts, Decimal(value)) for raw_id, ts, value in reversed(list(rows))]
+
+def read_archive_series(path: str, start_time: datetime, end_time: datetime) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lê as leituras com start_time <= timestamp < end_time como arrays numpy, em ordem de
+    timestamp: epoch em microssegundos (int64) e valor (float64), sem criar objetos Python.
+    """
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        timestamps = table.column("timestamp").to_numpy()
+        lo = np.searchsorted(timestamps, np.datetime64(start_time, "us"), side="left")
+        hi = np.searchsorted(timestamps, np.datetime64(end_time, "us"), side="left")
+        values = pc.cast(table.column("value").slice(lo, hi - lo), pa.float64()).to_numpy()
+        return timestamps[lo:hi].astype(np.int64), values
+
+def remove_archive(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
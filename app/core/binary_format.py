@@ -0,0 +1,84 @@
+"""
+Formato binário compacto de ingestão (application/vnd.iot-readings), pensado para
+gateways em links celulares. Todos os inteiros são little-endian.
+
+    magic        4 bytes   b"IOTB"
+    version      u8        1
+    serial_len   u8        tamanho do número de série em bytes
+    serial       bytes     número de série do dispositivo (UTF-8)
+    n_sensors    u16       quantidade de sensores na tabela de nomes
+    sensores     n_sensors x (name_len u8, name bytes UTF-8)
+    n_readings   u32       quantidade de leituras
+    leituras     n_readings x 18 bytes:
+                     sensor_index u16   índice na tabela de sensores
+                     timestamp    i64   epoch em milissegundos (UTC), de 1970 até o ano 9999
+                     value        f64
+
+As leituras são decodificadas de uma vez com numpy.frombuffer, sem criar um objeto
+Python por leitura.
+"""
+import struct
+import numpy as np
+
+MAGIC = b"IOTB"
+VERSION = 1
+CONTENT_TYPE = "application/vnd.iot-readings"
+
+READING_DTYPE = np.dtype([("sensor_index", "<u2"), ("timestamp_ms", "<i8"), ("value", "<f8")])
+# Intervalo aceito para timestamp_ms: [1970-01-01, 10000-01-01), o que cabe em datetime
+TIMESTAMP_MS_MIN = 0
+TIMESTAMP_MS_MAX = 253402300800000
+
+class BinaryPayload:
+    def __init__(self, device_serial_number: str, sensor_names: list[str], readings: np.ndarray):
+        self.device_serial_number = device_serial_number
+        self.sensor_names = sensor_names
+        self.readings = readings
+
+def decode_payload(body: bytes) -> BinaryPayload:
+    """Decodifica o corpo binário. Lança ValueError se o payload for inválido."""
+    view = memoryview(body)
+    try:
+        magic, version, serial_len = struct.unpack_from("<4sBB", view, 0)
+        if magic != MAGIC:
+            raise ValueError("Invalid magic header.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported binary format version {version}.")
+        offset = 6
+        serial = bytes(view[offset:offset + serial_len]).decode("utf-8")
+        offset += serial_len
+
+        (n_sensors,) = struct.unpack_from("<H", view, offset)
+        offset += 2
+        sensor_names = []
+        for _ in range(n_sensors):
+            (name_len,) = struct.unpack_from("<B", view, offset)
+            offset += 1
+            sensor_names.append(bytes(view[offset:offset + name_len]).decode("utf-8"))
+            offset += name_len
+
+        (n_readings,) = struct.unpack_from("<I", view, offset)
+        offset += 4
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed header: {e}") from e
+
+    expected = n_readings * READING_DTYPE.itemsize
+    if len(view) - offset != expected:
+        raise ValueError(f"Expected {expected} bytes of readings, got {len(view) - offset}.")
+    readings = np.frombuffer(body, dtype=READING_DTYPE, count=n_readings, offset=offset)
+    return BinaryPayload(serial, sensor_names, readings)
+
+def encode_payload(device_serial_number: str, sensor_names: list[str], sensor_index, timestamp_ms, values) -> bytes:
+    """Codifica um payload no mesmo formato (útil para gateways em Python e para testes manuais)."""
+    serial = device_serial_number.encode("utf-8")
+    parts = [struct.pack("<4sBB", MAGIC, VERSION, len(serial)), serial, struct.pack("<H", len(sensor_names))]
+    for name in sensor_names:
+        encoded = name.encode("utf-8")
+        parts.append(struct.pack("<B", len(encoded)) + encoded)
+    readings = np.empty(len(values), dtype=READING_DTYPE)
+    readings["sensor_index"] = sensor_index
+    readings["timestamp_ms"] = timestamp_ms
+    readings["value"] = values
+    parts.append(struct.pack("<I", len(readings)))
+    parts.append(readings.tobytes())
+    return b"".join(parts)
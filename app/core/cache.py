@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.core.config import settings
+
+class LRUCache:
+    """
+    Cache LRU em memória, thread-safe, com TTL opcional e contadores de acerto/erro.
+    O cache é por processo: com vários workers, o TTL limita por quanto tempo um
+    worker pode enxergar um valor já invalidado em outro.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float | None = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (self.ttl_seconds is not None and entry[1] < time.monotonic()):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else 0.0
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+# serial_number -> (id, owner_user_id) do dispositivo
+device_resolution_cache = LRUCache(settings.RESOLUTION_CACHE_MAX_SIZE, settings.RESOLUTION_CACHE_TTL_SECONDS)
+# (device_id, nome do sensor) -> sensor_id
+sensor_resolution_cache = LRUCache(settings.RESOLUTION_CACHE_MAX_SIZE, settings.RESOLUTION_CACHE_TTL_SECONDS)
+
+def invalidate_device_resolution(serial_number: str, device_id=None):
+    """Remove do cache o número de série e, se informado, todos os sensores do dispositivo."""
+    device_resolution_cache.invalidate(serial_number)
+    if device_id is not None:
+        sensor_resolution_cache.invalidate_where(lambda key: key[0] == device_id)
+
+# (device_id, intervalo, início do bucket) -> (assinatura de revisões dos sensores, {sensor_id: média}).
+# Só guarda buckets de períodos fechados; sem TTL, pois a assinatura detecta mudanças.
+aggregate_cache = LRUCache(settings.AGGREGATE_CACHE_MAX_SIZE)
@@ -13,4 +13,71 @@ class Settings:
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 
 
+    # Ingestão em streaming (NDJSON): leituras gravadas por transação e tamanho máximo de uma linha
+    INGEST_STREAM_CHUNK_SIZE: int = int(os.getenv("INGEST_STREAM_CHUNK_SIZE", "500"))
+    INGEST_STREAM_MAX_LINE_BYTES: int = int(os.getenv("INGEST_STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
+    # Modo write-behind: a ingestão enfileira as leituras e responde 202; uma thread grava em lotes
+    INGEST_WRITE_BEHIND: bool = os.getenv("INGEST_WRITE_BEHIND", "false").lower() == "true"
+    INGEST_BUFFER_MAX_SIZE: int = int(os.getenv("INGEST_BUFFER_MAX_SIZE", "100000"))
+    INGEST_FLUSH_BATCH_SIZE: int = int(os.getenv("INGEST_FLUSH_BATCH_SIZE", "5000"))
+    INGEST_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("INGEST_FLUSH_INTERVAL_SECONDS", "1.0"))
+
+    # Cache de resolução serial_number -> dispositivo e (dispositivo, nome) -> sensor
+    RESOLUTION_CACHE_MAX_SIZE: int = int(os.getenv("RESOLUTION_CACHE_MAX_SIZE", "50000"))
+    RESOLUTION_CACHE_TTL_SECONDS: float = float(os.getenv("RESOLUTION_CACHE_TTL_SECONDS", "300"))
+
+    # Corpos comprimidos (Content-Encoding) aceitos nas rotas de ingestão/bulk, com limite descompactado
+    COMPRESSED_BODY_PATHS: list[str] = os.getenv("COMPRESSED_BODY_PATHS", "/api/v1/sensor-data/ingest").split(",")
+    MAX_DECOMPRESSED_BODY_BYTES: int = int(os.getenv("MAX_DECOMPRESSED_BODY_BYTES", str(64 * 1024 * 1024)))
+
+    # Particionamento mensal de sensor_data: partições futuras criadas e antigas expiradas (0 = nunca)
+    PARTITION_MONTHS_AHEAD: int = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+    PARTITION_LOCK_TIMEOUT: str = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+    SENSOR_DATA_RETENTION_MONTHS: int = int(os.getenv("SENSOR_DATA_RETENTION_MONTHS", "0"))
+    SENSOR_DATA_DROP_EXPIRED_PARTITIONS: bool = os.getenv("SENSOR_DATA_DROP_EXPIRED_PARTITIONS", "false").lower() == "true"
+
+    # Chave primária de sensor_data e commands: "uuid7" (ordenada no tempo) ou "uuid4" (aleatória)
+    ID_STRATEGY: str = os.getenv("ID_STRATEGY", "uuid7").lower()
+
+    # Retenção: intervalo do job, leituras removidas por transação e espera máxima por locks
+    RETENTION_INTERVAL_SECONDS: float = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+    RETENTION_LOCK_TIMEOUT: str = os.getenv("RETENTION_LOCK_TIMEOUT", "2s")
+
+    # Tier frio: meses fechados mais antigos que ARCHIVE_AFTER_DAYS (0 = desativado) vão para
+    # arquivos Arrow IPC em ARCHIVE_DIR e saem do PostgreSQL
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "archive")
+    ARCHIVE_AFTER_DAYS: int = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+    ARCHIVE_INTERVAL_SECONDS: float = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "86400"))
+    ARCHIVE_MAX_RANGES_PER_RUN: int = int(os.getenv("ARCHIVE_MAX_RANGES_PER_RUN", "100"))
+    ARCHIVE_FETCH_SIZE: int = int(os.getenv("ARCHIVE_FETCH_SIZE", "10000"))
+    # Agregação em buckets (/api/v1/sensor-data/aggregates): máximo de buckets (sensores x buckets) por consulta
+    AGGREGATE_MAX_BUCKETS: int = int(os.getenv("AGGREGATE_MAX_BUCKETS", "10000"))
+    # Cache das médias diárias/semanais/mensais por dispositivo: buckets fechados guardados e
+    # margem após a meia-noite (UTC) antes de considerar o dia anterior fechado
+    AGGREGATE_CACHE_MAX_SIZE: int = int(os.getenv("AGGREGATE_CACHE_MAX_SIZE", "100000"))
+    AGGREGATE_CACHE_CLOSE_GRACE_SECONDS: float = float(os.getenv("AGGREGATE_CACHE_CLOSE_GRACE_SECONDS", "300"))
+    # Séries reduzidas para gráficos (/api/v1/sensor-data/series): máximo de pontos pedidos e
+    # linhas lidas por bloco do cursor
+    SERIES_MAX_POINTS: int = int(os.getenv("SERIES_MAX_POINTS", "10000"))
+    SERIES_FETCH_SIZE: int = int(os.getenv("SERIES_FETCH_SIZE", "50000"))
+    # Detecção de anomalias (/api/v1/devices|projects/{id}/anomalies): sensores por consulta,
+    # linhas lidas por bloco do cursor, maior intervalo analisado e máximo de anomalias devolvidas
+    ANOMALY_SENSOR_BATCH_SIZE: int = int(os.getenv("ANOMALY_SENSOR_BATCH_SIZE", "500"))
+    ANOMALY_FETCH_SIZE: int = int(os.getenv("ANOMALY_FETCH_SIZE", "50000"))
+    ANOMALY_MAX_RANGE_DAYS: int = int(os.getenv("ANOMALY_MAX_RANGE_DAYS", "31"))
+    ANOMALY_MAX_RESULTS: int = int(os.getenv("ANOMALY_MAX_RESULTS", "10000"))
+    # Regras de alerta avaliadas na ingestão: intervalo para recarregar o índice em memória
+    # (mudanças de regras feitas em outros workers e estado gravado por eles)
+    ALERT_RULES_REFRESH_SECONDS: float = float(os.getenv("ALERT_RULES_REFRESH_SECONDS", "60"))
+    # Busca textual (?query=): similaridade mínima (0 a 1) de um trecho do texto com o termo
+    # para contar como correspondência aproximada (erros de digitação)
+    SEARCH_SIMILARITY_THRESHOLD: float = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.5"))
+    # Statements SQL por requisição: cabeçalho X-Query-Count nas respostas e, em testes, 500
+    # quando uma rota passa do orçamento declarado com @query_budget (app/core/query_budget.py)
+    QUERY_COUNT_HEADER: bool = os.getenv("QUERY_COUNT_HEADER", "false").lower() == "true"
+    QUERY_BUDGET_STRICT: bool = os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Redução de séries temporais para gráficos. As duas funções recebem os arrays x (tempo,
+crescente) e y (valor) e devolvem os índices, em ordem crescente, dos pontos mantidos.
+
+    lttb    Largest-Triangle-Three-Buckets: um ponto por bucket, o que forma o maior
+            triângulo com o ponto escolhido no bucket anterior e a média do seguinte.
+            Preserva o formato visual da série com exatamente `threshold` pontos.
+    minmax  Mínimo e máximo de cada bucket de tempo (um bucket por "pixel"): mantém
+            todos os picos, com até 2 pontos por bucket.
+
+O trabalho por ponto é vetorizado; só o laço do LTTB sobre os buckets é em Python.
+"""
+import numpy as np
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    # O primeiro e o último ponto são sempre mantidos; os demais são divididos em threshold - 2
+    # buckets de tamanho quase igual (todos não vazios, pois threshold - 2 <= n - 2)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < threshold - 2:
+            cx, cy = avg_x[i + 1], avg_y[i + 1]
+        else:
+            cx, cy = x[n - 1], y[n - 1]
+        # Dobro da área do triângulo (a, b, c) para cada candidato b do bucket
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def minmax(x: np.ndarray, y: np.ndarray, buckets: int) -> np.ndarray:
+    n = len(x)
+    if n <= 2 * buckets or buckets < 1:
+        return np.arange(n)
+
+    span = int(x[-1] - x[0]) + 1
+    bucket = (x - x[0]).astype(np.int64) * buckets // span
+    # Ordena por (bucket, valor): o primeiro de cada bucket é o mínimo e o último, o máximo
+    order = np.lexsort((y, bucket))
+    sorted_buckets = bucket[order]
+    starts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate((order[starts], order[ends], [0, n - 1])))
@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+class PeriodicJob:
+    """
+    Executa uma função de manutenção em uma thread de fundo: uma vez ao iniciar e
+    depois a cada interval_seconds, até stop(). Exceções são registradas em last_error
+    e não interrompem as próximas execuções.
+    """
+    def __init__(self, name: str, interval_seconds: float, func: Callable[[], object]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.func = func
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.runs = 0
+        self.last_run_at: datetime | None = None
+        self.last_duration_seconds = 0.0
+        self.last_result = None
+        self.last_error: str | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"job-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        if not self.is_running:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+
+    def run_once(self):
+        started = time.perf_counter()
+        self.last_run_at = datetime.utcnow()
+        try:
+            self.last_result = self.func()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.exception("Erro no job '%s'", self.name)
+        self.runs += 1
+        self.last_duration_seconds = time.perf_counter() - started
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "running": self.is_running,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.interval_seconds)
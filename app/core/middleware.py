@@ -0,0 +1,178 @@
+import zlib
+from fastapi import HTTPException, status
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.query_budget import StatementCounter, budget_for, current_counter
+
+try:
+    import zstandard
+except ImportError: # zstd é opcional: sem o pacote, apenas gzip/deflate são aceitos
+    zstandard = None
+
+DECOMPRESSION_ERRORS = (zlib.error, zstandard.ZstdError) if zstandard is not None else (zlib.error,)
+
+# Tamanho máximo de saída por chamada ao descompressor
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+# O descompressor zstd não aceita max_length; a entrada é fatiada para limitar a saída por chamada
+ZSTD_INPUT_SLICE = 256
+
+class _ZlibDecompressor:
+    def __init__(self, wbits: int):
+        self._obj = zlib.decompressobj(wbits)
+
+    def decompress(self, data: bytes) -> tuple[bytes, bytes]:
+        out = self._obj.decompress(data, DECOMPRESS_CHUNK_SIZE)
+        return out, self._obj.unconsumed_tail
+
+    def finish(self) -> bytes:
+        out = self._obj.flush()
+        if not self._obj.eof:
+            raise zlib.error("truncated compressed body")
+        return out
+
+class _ZstdDecompressor:
+    def __init__(self):
+        self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> tuple[bytes, bytes]:
+        return self._obj.decompress(data[:ZSTD_INPUT_SLICE]), data[ZSTD_INPUT_SLICE:]
+
+    def finish(self) -> bytes:
+        # Como no zlib: um frame cortado não pode virar um corpo válido mais curto
+        if not self._obj.eof:
+            raise zstandard.ZstdError("truncated compressed body")
+        return b""
+
+def _decompressor_for(encoding: str):
+    if encoding in ("gzip", "x-gzip"):
+        return _ZlibDecompressor(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _ZlibDecompressor(zlib.MAX_WBITS)
+    if encoding == "zstd" and zstandard is not None:
+        return _ZstdDecompressor()
+    return None
+
+class RequestDecompressionMiddleware:
+    """
+    Aceita corpos de requisição com Content-Encoding gzip/deflate (e zstd, se o pacote
+    zstandard estiver instalado) nas rotas cujos caminhos começam com um dos prefixos
+    configurados. A descompressão é feita em streaming, bloco a bloco, à medida que a
+    rota consome o corpo; ao passar de max_size bytes descompactados a requisição é
+    abortada com 413, então um "zip bomb" não esgota a memória do worker.
+    """
+    def __init__(self, app: ASGIApp, paths: list[str], max_size: int):
+        self.app = app
+        self.paths = tuple(paths)
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = dict(scope["headers"]).get(b"content-encoding", b"").decode("latin-1").strip().lower()
+        if encoding in ("", "identity"):
+            await self.app(scope, receive, send)
+            return
+
+        decompressor = _decompressor_for(encoding)
+        if decompressor is None:
+            response = JSONResponse(
+                {"detail": f"Unsupported Content-Encoding '{encoding}'."},
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+            await response(scope, receive, send)
+            return
+
+        # O corpo entregue à rota já está descompactado e tem outro tamanho
+        headers = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        scope = dict(scope, headers=headers)
+        await self.app(scope, _DecompressingReceive(receive, decompressor, self.max_size), send)
+
+class _DecompressingReceive:
+    """Callable 'receive' do ASGI que entrega o corpo já descompactado."""
+    def __init__(self, receive: Receive, decompressor, max_size: int):
+        self._receive = receive
+        self._decompressor = decompressor
+        self._max_size = max_size
+        self._pending = b""
+        self._more_body = True
+        self._finished = False
+        self._total = 0
+
+    async def __call__(self) -> Message:
+        if self._finished:
+            return await self._receive()
+
+        try:
+            if not self._pending and self._more_body:
+                message = await self._receive()
+                if message["type"] != "http.request":
+                    return message
+                self._pending = message.get("body", b"")
+                self._more_body = message.get("more_body", False)
+
+            out, self._pending = self._decompressor.decompress(self._pending)
+            if not self._pending and not self._more_body:
+                out += self._decompressor.finish()
+                self._finished = True
+        except DECOMPRESSION_ERRORS as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid compressed body: {e}")
+
+        self._total += len(out)
+        if self._total > self._max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Decompressed body exceeds {self._max_size} bytes."
+            )
+        return {"type": "http.request", "body": out, "more_body": not self._finished}
+
+class QueryBudgetMiddleware:
+    """
+    Conta os statements SQL de cada requisição (ver app/core/query_budget.py). A contagem é
+    lida no início da resposta, quando a rota já terminou; a rota vem de scope["endpoint"],
+    preenchido pelo router, então este middleware precisa ficar por dentro dos que copiam o scope.
+    """
+    def __init__(self, app: ASGIApp, header: bool, strict: bool):
+        self.app = app
+        self.header = header
+        self.strict = strict
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = StatementCounter()
+        token = current_counter.set(counter)
+        replaced = False
+
+        async def send_with_count(message: Message):
+            nonlocal replaced
+            if message["type"] == "http.response.start":
+                budget = budget_for(scope.get("endpoint"))
+                if self.strict and budget is not None and counter.count > budget:
+                    replaced = True
+                    response = JSONResponse(
+                        {"detail": f"Query budget exceeded: {counter.count} statements, budget {budget}"},
+                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        headers={"X-Query-Count": str(counter.count), "X-Query-Budget": str(budget)},
+                    )
+                    await response(scope, receive, send)
+                    return
+                if self.header:
+                    headers = MutableHeaders(scope=message)
+                    headers["X-Query-Count"] = str(counter.count)
+                    if budget is not None:
+                        headers["X-Query-Budget"] = str(budget)
+            elif replaced:
+                # Corpo da resposta original, já substituída pelo erro
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            current_counter.reset(token)
@@ -0,0 +1,89 @@
+"""
+Paginação por cursor (keyset). Em vez de OFFSET, que lê e descarta todas as linhas
+anteriores à página, cada página continua a partir da chave de ordenação da última linha
+da página anterior:
+
+    WHERE created_at >= :c AND (created_at, id) > (:c, :id) ORDER BY created_at, id LIMIT n
+
+O custo é o mesmo em qualquer página e inserções/remoções entre as requisições não fazem
+linhas repetirem ou sumirem. A chave termina sempre em id para ser única. O cursor é opaco
+para o cliente: os valores da chave em JSON, codificados em base64 url-safe.
+
+Sem `cursor` na requisição os endpoints de listagem continuam devolvendo a lista, como com
+skip/limit; com `cursor` (vazio na primeira página) devolvem {"items": [...], "_links": {...}}.
+O link da próxima página vai em `_links.next` e no cabeçalho Link (rel="next").
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Optional, Sequence
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import and_, literal, tuple_
+
+CURSOR_DESCRIPTION = "Cursor from the previous page's next link; send it empty for the first page to get {items, _links}"
+
+# Chaves de ordenação (atributos do modelo)
+ENTITY_KEY = ("created_at", "id")
+COMMAND_KEY = ("issued_at", "id")
+TAG_KEY = ("name", "id")
+READING_KEY = ("timestamp", "id")
+# Resultados de busca: relevância (atributo definido por BaseRepository.search_by_text)
+SEARCH_KEY = ("search_rank", "id")
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else str(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _parse(value: Any, column) -> Any:
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    return python_type(value)
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    """Valores da chave, convertidos para os tipos das colunas. Cursor inválido: 400."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [_parse(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def keyset(query, columns: Sequence, cursor: Optional[str], descending: bool = False):
+    """
+    Ordena a query pela chave e, com cursor, filtra as linhas depois dele. A condição
+    redundante na primeira coluna deixa o intervalo explícito para o índice.
+    """
+    query = query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, columns)
+    row = tuple_(*columns)
+    after = tuple_(*(literal(value, column.type) for value, column in zip(values, columns)))
+    if descending:
+        return query.filter(and_(columns[0] <= values[0], row < after))
+    return query.filter(and_(columns[0] >= values[0], row > after))
+
+def next_cursor(rows: Sequence, limit: int, key: Sequence[str]) -> Optional[str]:
+    """Cursor da página seguinte, ou None se esta página não veio cheia."""
+    if limit <= 0 or len(rows) < limit:
+        return None
+    return encode_cursor([getattr(rows[-1], name) for name in key])
+
+def _href(url) -> str:
+    return f"{url.path}?{url.query}" if url.query else url.path
+
+def page_response(request: Request, response: Response, items: list, cursor: Optional[str], next_page: Optional[str]):
+    """Resposta de uma listagem: a lista (sem cursor) ou a página com `_links` (com cursor)."""
+    links = {"self": {"href": _href(request.url), "method": "GET"}}
+    if next_page:
+        url = request.url.remove_query_params("skip").include_query_params(cursor=next_page)
+        links["next"] = {"href": _href(url), "method": "GET"}
+        response.headers["Link"] = f'<{links["next"]["href"]}>; rel="next"'
+    if cursor is None:
+        return items
+    return {"items": items, "_links": links}
@@ -0,0 +1,43 @@
+"""
+Contagem de statements SQL por requisição, para pegar N+1 e outras regressões no número de
+consultas. Cada rota pode declarar um orçamento com @query_budget(n) (abaixo do decorador do
+router); o QueryBudgetMiddleware conta os statements executados durante a requisição e:
+
+    QUERY_COUNT_HEADER=true    devolve X-Query-Count (e X-Query-Budget, se a rota tiver um)
+    QUERY_BUDGET_STRICT=true   modo de teste: passar do orçamento vira um 500 com a contagem
+
+O contador fica numa ContextVar definida pelo middleware; as rotas e dependências síncronas
+rodam no threadpool com uma cópia do contexto, que aponta para o mesmo contador. Consultas
+fora de requisições (jobs, write-behind) não são contadas. A autenticação entra na conta.
+Na API ficam sem orçamento só as rotas cujo número de consultas cresce com o volume por desenho:
+a detecção de anomalias (uma consulta por lote de sensores) e a ingestão em streaming (por
+bloco de leituras). tests/test_query_budgets.py chama cada rota com orçamento no modo estrito.
+"""
+from contextvars import ContextVar
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class StatementCounter:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count = 0
+
+current_counter: ContextVar[Optional[StatementCounter]] = ContextVar("query_counter", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = current_counter.get()
+    if counter is not None:
+        counter.count += 1
+
+def query_budget(statements: int) -> Callable:
+    """Declara o número máximo de statements SQL de uma rota (autenticação incluída)."""
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.query_budget = statements
+        return endpoint
+    return decorator
+
+def budget_for(endpoint: Optional[Callable]) -> Optional[int]:
+    return getattr(endpoint, "query_budget", None)
@@ -0,0 +1,41 @@
+import os
+import threading
+import time
+import uuid
+
+from app.core.config import settings
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+def uuid7() -> uuid.UUID:
+    """
+    Gera um UUID versão 7 (RFC 9562): 48 bits de epoch em milissegundos, seguidos de um
+    contador de 12 bits e 62 bits aleatórios. IDs gerados em sequência são crescentes
+    (inclusive dentro do mesmo milissegundo, graças ao contador), então novas linhas vão
+    sempre para o fim do índice da chave primária, sem espalhar inserções pela B-tree.
+    """
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _counter = 0
+        else:
+            # Mesmo milissegundo (ou relógio voltou): avança o contador; ao estourar os
+            # 12 bits, avança o próprio timestamp para manter a ordem
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+def new_id() -> uuid.UUID:
+    """Default de chave primária das tabelas de alto volume, conforme settings.ID_STRATEGY."""
+    if settings.ID_STRATEGY == "uuid4":
+        return uuid.uuid4()
+    return uuid7()
@@ -0,0 +1,24 @@
+"""
+Perfis de carregamento dos relacionamentos. Nos modelos todos os relacionamentos são lazy: o
+acesso a uma coleção ou ao objeto relacionado dispara uma consulta, o que em laços vira N+1.
+Quem já sabe o que vai ler pede um perfil ao repositório (parâmetro `options`):
+
+    selectinload   coleções (tags, devices): uma consulta a mais com IN para todas as linhas
+    joinedload     relações muitos-para-um (dono): vem na mesma consulta, por JOIN
+
+A autorização por dono não precisa de perfil: get_with_owner/scope_to_user já juntam a
+cadeia até projects na própria consulta (ver BaseRepository).
+"""
+from sqlalchemy.orm import selectinload
+
+from app.db.models import Device, Project
+
+# Tags do projeto/dispositivo: listagem e inclusão/remoção de tags
+PROJECT_TAGS = (selectinload(Project.tags),)
+DEVICE_TAGS = (selectinload(Device.tags),)
+# Árvore do snapshot: tags, dispositivos, sensores e tags dos dispositivos (cinco consultas)
+PROJECT_TREE = (
+    selectinload(Project.tags),
+    selectinload(Project.devices).selectinload(Device.sensors),
+    selectinload(Project.devices).selectinload(Device.tags),
+)
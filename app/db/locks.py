@@ -0,0 +1,20 @@
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+@contextmanager
+def try_advisory_lock(engine: Engine, key: int):
+    """
+    Tenta obter um advisory lock de sessão do PostgreSQL, sem esperar, e indica se
+    conseguiu. O lock fica em uma conexão dedicada durante todo o bloco: uma Session
+    devolve a conexão ao pool a cada commit, e o lock não pode mudar de conexão.
+    """
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                conn.commit()
@@ -1,9 +1,11 @@
 import uuid
-from sqlalchemy import Column, String, Text, Boolean, DateTime, ForeignKey, Numeric, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, Boolean, DateTime, ForeignKey, Numeric, Table, UniqueConstraint, Index, Integer, BigInteger, CheckConstraint, PrimaryKeyConstraint
+from sqlalchemy.orm import declared_attr, relationship
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
+from app.db import search
 from app.db.base import Base
+from app.db.ids import new_id
 
 project_tags = Table(
     'project_tags',
@@ -30,10 +32,17 @@ class User(Base):
     created_at = Column(DateTime(timezone=False), server_default=func.now())
     updated_at = Column(DateTime(timezone=False), onupdate=func.now(), server_default=func.now())
 
-    projects = relationship("Project", back_populates="owner", cascade="all, delete-orphan")
+    # passive_deletes: as FKs (e as das tabelas de associação de tags) têm ON DELETE CASCADE,
+    # então o banco remove os filhos sem o ORM carregá-los; sem isso, excluir um dispositivo
+    # lia todas as leituras de cada sensor, e excluir um projeto, as tags de cada dispositivo
+    projects = relationship("Project", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
 
 class Project(Base):
     __tablename__ = "projects"
+    # Listagem por dono em ordem de (created_at, id), paginada por cursor
+    __table_args__ = (
+        Index("ix_projects_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(100), nullable=False)
@@ -43,11 +52,23 @@ class Project(Base):
     updated_at = Column(DateTime(timezone=False), onupdate=func.now(), server_default=func.now())
 
     owner = relationship("User", back_populates="projects")
-    devices = relationship("Device", back_populates="project", cascade="all, delete-orphan")
-    tags = relationship("Tag", secondary=project_tags, back_populates="projects")
+    devices = relationship("Device", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    tags = relationship("Tag", secondary=project_tags, back_populates="projects", passive_deletes=True)
+
+def search_index(name: str, *columns) -> Index:
+    """Índice GIN de trigramas sobre o documento de busca (ver app/db/search.py)."""
+    return Index(
+        name, search.document(*columns).label("search_document"),
+        postgresql_using="gin", postgresql_ops={"search_document": "gin_trgm_ops"},
+    )
+
+search_index("ix_projects_search_trgm", Project.name, Project.description)
 
 class Device(Base):
     __tablename__ = "devices"
+    __table_args__ = (
+        Index("ix_devices_project_id_created_at_id", "project_id", "created_at", "id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(100), nullable=False)
@@ -60,13 +81,20 @@ class Device(Base):
     updated_at = Column(DateTime(timezone=False), onupdate=func.now(), server_default=func.now())
 
     project = relationship("Project", back_populates="devices")
-    sensors = relationship("Sensor", back_populates="device", cascade="all, delete-orphan")
-    tags = relationship("Tag", secondary=device_tags, back_populates="devices")
-    commands = relationship("Command", back_populates="device", cascade="all, delete-orphan")
+    sensors = relationship("Sensor", back_populates="device", cascade="all, delete-orphan", passive_deletes=True)
+    tags = relationship("Tag", secondary=device_tags, back_populates="devices", passive_deletes=True)
+    commands = relationship("Command", back_populates="device", cascade="all, delete-orphan", passive_deletes=True)
+
+search_index("ix_devices_search_trgm", Device.name, Device.description, Device.serial_number)
 
 
 class Sensor(Base):
     __tablename__ = "sensors"
+    __table_args__ = (
+        Index("ix_sensors_device_id_created_at_id", "device_id", "created_at", "id"),
+        # A ingestão cria sensores com ON CONFLICT (device_id, name) DO NOTHING
+        UniqueConstraint("device_id", "name", name="uq_sensors_device_id_name"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(100), nullable=False)
@@ -78,14 +106,24 @@ class Sensor(Base):
     updated_at = Column(DateTime(timezone=False), onupdate=func.now(), server_default=func.now())
 
     device = relationship("Device", back_populates="sensors")
-    sensor_data = relationship("SensorData", back_populates="sensor", cascade="all, delete-orphan")
+    sensor_data = relationship("SensorData", back_populates="sensor", cascade="all, delete-orphan", passive_deletes=True)
 
 class SensorData(Base):
     __tablename__ = "sensor_data"
+    # Chave natural da leitura: permite reenvios idempotentes com ON CONFLICT DO NOTHING.
+    # A tabela é particionada por mês em timestamp (ver app/db/partitions.py); por isso
+    # timestamp faz parte da chave primária, como o Postgres exige em tabelas particionadas.
+    __table_args__ = (
+        UniqueConstraint("sensor_id", "timestamp", name="uq_sensor_data_sensor_id_timestamp"),
+        # Filtros só por intervalo de tempo (médias por dispositivo, retenção)
+        Index("ix_sensor_data_timestamp_brin", "timestamp", postgresql_using="brin"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Gerada conforme ID_STRATEGY (UUIDv7 por padrão): inserções sempre no fim do índice da PK
+    id = Column(UUID(as_uuid=True), primary_key=True, default=new_id, server_default=text("uuid_generate_v7()"))
     value = Column(Numeric, nullable=False)
-    timestamp = Column(DateTime(timezone=False), server_default=func.now())
+    timestamp = Column(DateTime(timezone=False), primary_key=True, server_default=func.now())
     sensor_id = Column(UUID(as_uuid=True), ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False)
 
     sensor = relationship("Sensor", back_populates="sensor_data")
@@ -96,13 +134,21 @@ class Tag(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(50), unique=True, nullable=False)
 
-    projects = relationship("Project", secondary=project_tags, back_populates="tags")
-    devices = relationship("Device", secondary=device_tags, back_populates="tags")
+    projects = relationship("Project", secondary=project_tags, back_populates="tags", passive_deletes=True)
+    devices = relationship("Device", secondary=device_tags, back_populates="tags", passive_deletes=True)
+
+search_index("ix_tags_search_trgm", Tag.name)
     
 class Command(Base):
     __tablename__ = "commands"
+    # Fila de comandos pendentes de cada dispositivo, consultada pelos gateways
+    __table_args__ = (
+        Index("ix_commands_device_id_status", "device_id", "status"),
+        # Histórico de comandos do dispositivo, paginado por cursor
+        Index("ix_commands_device_id_issued_at_id", "device_id", "issued_at", "id"),
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=new_id, server_default=text("uuid_generate_v7()"))
     device_id = Column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"), nullable=False)
     command_type = Column(String(50), nullable=False) # Ex: 'ligar_bomba', 'desligar_luz'
     parameters = Column(Text, nullable=True) # JSON string ou texto com parâmetros adicionais
@@ -112,4 +158,116 @@ class Command(Base):
     response_message = Column(Text, nullable=True) # Mensagem de resposta do dispositivo
 
     device = relationship("Device", back_populates="commands")
-    
\ No newline at end of file
+
+class RetentionPolicy(Base):
+    __tablename__ = "retention_policies"
+    # Vale para um projeto inteiro ou para um sensor (exatamente um dos dois); a política do sensor prevalece
+    __table_args__ = (
+        CheckConstraint("(project_id IS NULL) <> (sensor_id IS NULL)", name="ck_retention_policies_scope"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), unique=True, nullable=True)
+    sensor_id = Column(UUID(as_uuid=True), ForeignKey("sensors.id", ondelete="CASCADE"), unique=True, nullable=True)
+    raw_retention_days = Column(Integer, nullable=False) # Prazo das leituras brutas e dos rollups por minuto
+    rollup_retention_days = Column(Integer, nullable=True) # Rollups por hora e por dia; None: para sempre
+    created_at = Column(DateTime(timezone=False), server_default=func.now())
+    updated_at = Column(DateTime(timezone=False), onupdate=func.now(), server_default=func.now())
+
+class SensorDataRollupMixin:
+    """
+    Resumo das leituras de um sensor por intervalo (bucket), mantido de forma incremental
+    pela ingestão. granularity é a unidade de date_trunc que define o bucket.
+    """
+    granularity: str
+
+    # Chave (sensor_id, bucket), nessa ordem: as consultas são sempre por sensor e intervalo
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (PrimaryKeyConstraint("sensor_id", "bucket"),)
+
+    @declared_attr
+    def sensor_id(cls):
+        return Column(UUID(as_uuid=True), ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False)
+
+    bucket = Column(DateTime(timezone=False), nullable=False) # Início do intervalo
+    sample_count = Column(BigInteger, nullable=False)
+    value_sum = Column(Numeric, nullable=False)
+    value_min = Column(Numeric, nullable=False)
+    value_max = Column(Numeric, nullable=False)
+
+class SensorDataRollupMinute(SensorDataRollupMixin, Base):
+    __tablename__ = "sensor_data_rollup_1m"
+    granularity = "minute"
+
+class SensorDataRollupHourly(SensorDataRollupMixin, Base):
+    __tablename__ = "sensor_data_rollup_1h"
+    granularity = "hour"
+
+class SensorDataRollupDaily(SensorDataRollupMixin, Base):
+    __tablename__ = "sensor_data_rollup_1d"
+    granularity = "day"
+
+class SensorDataWatermark(Base):
+    __tablename__ = "sensor_data_watermarks"
+    # Marcas d'água por sensor, atualizadas no mesmo comando que acumula as leituras nos rollups.
+    # revision muda sempre que um período já fechado (dia anterior ao atual) é alterado,
+    # o que invalida os agregados desse sensor guardados em cache. latest_id e latest_value são a
+    # leitura mais recente recebida, servida sem consultar sensor_data (None se o sensor ficou
+    # sem leituras após remoções pela API).
+
+    sensor_id = Column(UUID(as_uuid=True), ForeignKey("sensors.id", ondelete="CASCADE"), primary_key=True)
+    earliest_timestamp = Column(DateTime(timezone=False), nullable=False)
+    latest_timestamp = Column(DateTime(timezone=False), nullable=False)
+    latest_id = Column(UUID(as_uuid=True), nullable=True)
+    latest_value = Column(Numeric, nullable=True)
+    revision = Column(BigInteger, nullable=False, server_default=text("0"))
+
+class SensorDataArchive(Base):
+    __tablename__ = "sensor_data_archives"
+    # Manifesto do tier frio: cada linha aponta para um arquivo Arrow IPC em ARCHIVE_DIR
+    __table_args__ = (
+        Index("ix_sensor_data_archives_sensor_id_range_end", "sensor_id", "range_end"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=new_id)
+    sensor_id = Column(UUID(as_uuid=True), ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False)
+    range_start = Column(DateTime(timezone=False), nullable=False) # Leitura mais antiga do arquivo
+    range_end = Column(DateTime(timezone=False), nullable=False) # Leitura mais recente do arquivo
+    row_count = Column(BigInteger, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    path = Column(String(255), nullable=False) # Relativo a ARCHIVE_DIR
+    created_at = Column(DateTime(timezone=False), server_default=func.now())
+
+class AlertRule(Base):
+    __tablename__ = "alert_rules"
+    # Regra de limite de um sensor, avaliada na ingestão (ver app/core/alerts.py).
+    # state é o estado atual, persistido a cada transição junto com um AlertEvent.
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    sensor_id = Column(UUID(as_uuid=True), ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String(100), nullable=False)
+    lower = Column(Numeric, nullable=True) # Sem limite inferior se None
+    upper = Column(Numeric, nullable=True) # Sem limite superior se None
+    hysteresis = Column(Numeric, nullable=False, server_default=text("0"))
+    enabled = Column(Boolean, nullable=False, server_default=text("true"))
+    state = Column(String(10), nullable=False, server_default=text("'ok'")) # 'ok', 'high' ou 'low'
+    state_changed_at = Column(DateTime(timezone=False), nullable=True) # Timestamp da leitura da última transição
+    created_at = Column(DateTime(timezone=False), server_default=func.now())
+    updated_at = Column(DateTime(timezone=False), onupdate=func.now(), server_default=func.now())
+
+class AlertEvent(Base):
+    __tablename__ = "alert_events"
+    # Histórico de transições de estado das regras, consultado por regra ou por período
+    __table_args__ = (
+        Index("ix_alert_events_rule_id_timestamp", "rule_id", "timestamp"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=new_id, server_default=text("uuid_generate_v7()"))
+    rule_id = Column(UUID(as_uuid=True), ForeignKey("alert_rules.id", ondelete="CASCADE"), nullable=False)
+    sensor_id = Column(UUID(as_uuid=True), ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False)
+    previous_state = Column(String(10), nullable=False)
+    state = Column(String(10), nullable=False)
+    value = Column(Numeric, nullable=False) # Leitura que causou a transição
+    timestamp = Column(DateTime(timezone=False), nullable=False) # Timestamp dessa leitura
+    created_at = Column(DateTime(timezone=False), server_default=func.now())
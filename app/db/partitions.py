@@ -0,0 +1,116 @@
+import re
+from datetime import date, datetime
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+
+PARENT_TABLE = "sensor_data"
+DEFAULT_PARTITION = "sensor_data_default"
+PARTITION_NAME = re.compile(r"^sensor_data_(\d{4})_(\d{2})$")
+# Chave do advisory lock: evita que vários workers rodem o DDL de partições ao mesmo tempo
+MAINTENANCE_LOCK_KEY = 0x5E4501
+
+def month_start(value: date | datetime) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month.year:04d}_{month.month:02d}"
+
+def list_partitions(conn: Connection) -> dict[date, str]:
+    """Retorna mês -> nome das partições mensais anexadas a sensor_data."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :parent"
+    ), {"parent": PARENT_TABLE}).scalars()
+    partitions = {}
+    for name in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+def create_month_partition(conn: Connection, month: date):
+    """
+    Cria a partição de um mês. Linhas desse intervalo que caíram na partição default
+    (antes de a partição existir) são movidas para ela antes do ATTACH.
+    """
+    name = partition_name(month)
+    params = {"start": month, "end": add_months(month, 1)}
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), params)
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{params['start'].isoformat()}') TO ('{params['end'].isoformat()}')"
+    ))
+
+def default_partition_months(conn: Connection, before: date) -> list[date]:
+    """Meses anteriores a before que têm linhas na partição default."""
+    rows = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', timestamp) FROM {DEFAULT_PARTITION} WHERE timestamp < :before"
+    ), {"before": before}).scalars()
+    return sorted(month_start(month) for month in rows)
+
+def ensure_partitions(conn: Connection, today: date, months_ahead: int) -> list[str]:
+    """
+    Garante a partição default e as partições do mês atual e dos próximos months_ahead meses.
+    Meses passados com leituras na partição default (atrasadas, ou gravadas antes da
+    partição existir) também ganham sua partição; assim expire_partitions as alcança.
+    """
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT"))
+    existing = list_partitions(conn)
+    created = []
+    current = month_start(today)
+    months = default_partition_months(conn, current) + [add_months(current, offset) for offset in range(months_ahead + 1)]
+    for month in months:
+        if month not in existing:
+            create_month_partition(conn, month)
+            created.append(partition_name(month))
+    return created
+
+def expire_partitions(conn: Connection, today: date, retention_months: int, drop: bool) -> list[str]:
+    """
+    Desanexa (e opcionalmente remove) as partições inteiramente anteriores à janela de
+    retenção. DETACH/DROP de uma partição é instantâneo e não gera o VACUUM de um DELETE.
+    """
+    cutoff = add_months(month_start(today), -retention_months)
+    expired = []
+    for month, name in sorted(list_partitions(conn).items()):
+        if add_months(month, 1) <= cutoff:
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+            expired.append(name)
+    return expired
+
+def maintain_sensor_data_partitions(engine: Engine) -> dict:
+    """
+    Manutenção periódica das partições de sensor_data: cria as partições futuras (e as de
+    meses passados presos na default) e, se SENSOR_DATA_RETENTION_MONTHS > 0, desanexa/remove
+    as antigas.
+    """
+    if engine.dialect.name != "postgresql":
+        return {"created": [], "expired": []}
+
+    today = datetime.utcnow().date()
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+        # Um ATTACH/DETACH esperando lock enfileiraria todas as leituras e escritas em sensor_data;
+        # melhor desistir e tentar de novo na próxima execução do job.
+        conn.execute(text(f"SET LOCAL lock_timeout = '{settings.PARTITION_LOCK_TIMEOUT}'"))
+        created = ensure_partitions(conn, today, settings.PARTITION_MONTHS_AHEAD)
+        expired = []
+        if settings.SENSOR_DATA_RETENTION_MONTHS > 0:
+            expired = expire_partitions(
+                conn, today, settings.SENSOR_DATA_RETENTION_MONTHS, settings.SENSOR_DATA_DROP_EXPIRED_PARTITIONS
+            )
+    return {"created": created, "expired": expired}
@@ -0,0 +1,40 @@
+"""
+Busca textual com pg_trgm. Cada tabela pesquisável tem um documento (as colunas de busca
+concatenadas) com um índice GIN gin_trgm_ops sobre a mesma expressão, que atende os dois
+critérios de correspondência:
+
+    documento ILIKE '%termo%'   o termo aparece no documento (inclui prefixos)
+    termo <% documento          algum trecho do documento é parecido com o termo
+                                (word_similarity >= pg_trgm.word_similarity_threshold),
+                                o que tolera erros de digitação
+
+O ranking soma 1 às correspondências exatas e ordena pela similaridade. A expressão do
+documento precisa ser idêntica no índice (models.py) e nas consultas para o índice ser usado.
+"""
+from sqlalchemy import Float, case, cast, func, literal
+from sqlalchemy.orm import Session
+
+def document(*columns):
+    """Colunas concatenadas com espaço; coalesce e || são IMMUTABLE, então a expressão pode ser indexada."""
+    parts = [func.coalesce(column, "") for column in columns]
+    expression = parts[0]
+    for part in parts[1:]:
+        expression = expression.op("||")(" ").op("||")(part)
+    return expression
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def matches(doc, term: str):
+    return doc.ilike(f"%{escape_like(term)}%", escape="\\") | literal(term).op("<%")(doc)
+
+def rank(doc, term: str):
+    exact = case((doc.ilike(f"%{escape_like(term)}%", escape="\\"), 1), else_=0)
+    # Em double precision: o valor vai no cursor e precisa voltar igual na comparação
+    return cast(exact + func.word_similarity(term, doc), Float).label("search_rank")
+
+def set_similarity_threshold(db: Session, threshold: float):
+    """Limiar do operador <% na transação atual."""
+    db.execute(
+        func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True).select()
+    )
@@ -1,17 +1,61 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from app.api.v1.endpoints import (
-    command, users, projects, devices, sensors, sensor_data, tags, auth
+    command, users, projects, devices, sensors, sensor_data, tags, auth, retention, alerts
 )
-from app.db.base import Base
 from app.db.session import engine
+from app.core.config import settings
+from app.core.middleware import QueryBudgetMiddleware, RequestDecompressionMiddleware
+from app.core.jobs import PeriodicJob
+from app.db.partitions import maintain_sensor_data_partitions
+from app.services.ingest_buffer import ingest_buffer
+from app.services.retention_service import retention_job
+from app.services.archive_service import archive_job
 
-def create_app():
-    Base.metadata.create_all(bind=engine)
+partition_job = PeriodicJob(
+    "sensor-data-partitions",
+    settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+    lambda: maintain_sensor_data_partitions(engine),
+)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A primeira manutenção roda antes de aceitar requisições, para a partição do mês existir
+    await run_in_threadpool(partition_job.run_once)
+    partition_job.start()
+    retention_job.start()
+    archive_job.start()
+    if settings.INGEST_WRITE_BEHIND:
+        ingest_buffer.start()
+    yield
+    # Esvazia a fila write-behind antes de encerrar o worker
+    await run_in_threadpool(ingest_buffer.stop)
+    await run_in_threadpool(archive_job.stop)
+    await run_in_threadpool(retention_job.stop)
+    await run_in_threadpool(partition_job.stop)
+
+def create_app():
+    # O esquema é criado e atualizado pelas migrações (alembic upgrade head), não na inicialização
     app = FastAPI(
         title="IoT Project Manager API",
         description="API RESTful para gerenciar projetos, dispositivos e sensores de IoT, com HATEOAS e autenticação.",
         version="1.0.0",
+        lifespan=lifespan,
+    )
+
+    # Adicionado antes para ficar por dentro da descompressão, que copia o scope
+    if settings.QUERY_COUNT_HEADER or settings.QUERY_BUDGET_STRICT:
+        app.add_middleware(
+            QueryBudgetMiddleware,
+            header=settings.QUERY_COUNT_HEADER,
+            strict=settings.QUERY_BUDGET_STRICT,
+        )
+
+    app.add_middleware(
+        RequestDecompressionMiddleware,
+        paths=settings.COMPRESSED_BODY_PATHS,
+        max_size=settings.MAX_DECOMPRESSED_BODY_BYTES,
     )
 
     # Inclui os routers da API
@@ -23,6 +67,8 @@ def create_app():
     app.include_router(sensor_data.router, prefix="/api/v1/sensor-data", tags=["Sensor Data"])
     app.include_router(tags.router, prefix="/api/v1/tags", tags=["Tags"])
     app.include_router(command.router, prefix="/api/v1/commands", tags=["Commands"])
+    app.include_router(retention.router, prefix="/api/v1/retention-policies", tags=["Retention"])
+    app.include_router(alerts.router, prefix="/api/v1/alert-rules", tags=["Alerts"])
 
     @app.get("/")
     async def read_root():
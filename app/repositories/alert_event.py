@@ -0,0 +1,43 @@
+from typing import List, Optional
+import uuid
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.core.pagination import READING_KEY
+from app.db.models import AlertEvent, AlertRule, Device, Project, Sensor
+from app.repositories.base import BaseRepository
+
+class AlertEventRepository(BaseRepository[AlertEvent]):
+    cursor_key = READING_KEY
+    cursor_descending = True
+
+    def __init__(self, db: Session):
+        super().__init__(AlertEvent, db)
+
+    def insert_many(self, transitions: List[dict]) -> None:
+        """Grava as transições de estado com um INSERT multi-linha. Sem commit."""
+        if transitions:
+            self.db.execute(insert(self.model), transitions)
+
+    def get_by_rule(self, rule_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                    skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[AlertEvent]:
+        """Transições da regra, da mais recente para a mais antiga."""
+        query = self.db.query(self.model).filter(self.model.rule_id == rule_id)
+        if start_time:
+            query = query.filter(self.model.timestamp >= start_time)
+        if end_time:
+            query = query.filter(self.model.timestamp < end_time)
+        return self.paginate(query, skip, limit, cursor)
+
+    def get_by_user(self, user_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                    skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[AlertEvent]:
+        """Transições das regras dos sensores dos projetos do usuário, da mais recente para a mais antiga."""
+        user_rules = select(AlertRule.id).join(Sensor, Sensor.id == AlertRule.sensor_id) \
+            .join(Device, Device.id == Sensor.device_id).join(Project, Project.id == Device.project_id) \
+            .where(Project.user_id == user_id)
+        query = self.db.query(self.model).filter(self.model.rule_id.in_(user_rules))
+        if start_time:
+            query = query.filter(self.model.timestamp >= start_time)
+        if end_time:
+            query = query.filter(self.model.timestamp < end_time)
+        return self.paginate(query, skip, limit, cursor)
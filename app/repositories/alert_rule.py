@@ -0,0 +1,75 @@
+from typing import Iterable, List, Optional
+import uuid
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.orm import Session
+from app.core.alerts import PENDING_TRANSITIONS, RuleState, alert_rule_index
+from app.db.models import AlertRule, Device, Project, Sensor
+from app.repositories.alert_event import AlertEventRepository
+from app.repositories.base import BaseRepository
+
+def _to_float(value) -> float | None:
+    return float(value) if value is not None else None
+
+class AlertRuleRepository(BaseRepository[AlertRule]):
+    def __init__(self, db: Session):
+        super().__init__(AlertRule, db)
+
+    def get_by_sensor(self, sensor_id: uuid.UUID) -> List[AlertRule]:
+        return self.db.query(self.model).filter(self.model.sensor_id == sensor_id).order_by(self.model.created_at).all()
+
+    def owner_join(self, query):
+        return query.join(Sensor, Sensor.id == self.model.sensor_id) \
+            .join(Device, Device.id == Sensor.device_id).join(Project, Project.id == Device.project_id)
+
+    def get_rules_by_user(self, user_id: uuid.UUID, state: Optional[str] = None, skip: int = 0, limit: int = 100,
+                          cursor: Optional[str] = None) -> List[AlertRule]:
+        """Regras dos sensores dos projetos do usuário, opcionalmente só as em um estado (ex.: 'high')."""
+        query = self.scope_to_user(self.db.query(self.model), user_id)
+        if state:
+            query = query.filter(self.model.state == state)
+        return self.paginate(query, skip, limit, cursor)
+
+    def load_rule_states(self) -> List[RuleState]:
+        """Regras habilitadas, com o estado persistido, para o índice em memória."""
+        rows = self.db.execute(
+            select(
+                self.model.id, self.model.sensor_id, self.model.lower, self.model.upper,
+                self.model.hysteresis, self.model.state, self.model.state_changed_at,
+            ).where(self.model.enabled.is_(True))
+        ).all()
+        return [
+            RuleState(row.id, row.sensor_id, _to_float(row.lower), _to_float(row.upper), float(row.hysteresis), row.state, row.state_changed_at)
+            for row in rows
+        ]
+
+    def evaluate_readings(self, readings: Iterable) -> int:
+        """
+        Avalia as leituras recém-gravadas contra as regras em memória e persiste as transições
+        (eventos e estado atual das regras) na mesma transação das leituras. Sem commit.
+        Retorna a quantidade de transições.
+        """
+        if alert_rule_index.is_stale:
+            alert_rule_index.load(self.load_rule_states())
+        transitions = alert_rule_index.evaluate(readings)
+        if not transitions:
+            return 0
+
+        self.db.info[PENDING_TRANSITIONS] = True
+        AlertEventRepository(self.db).insert_many(transitions)
+        # Estado final de cada regra; a condição em state_changed_at impede que um worker com o
+        # índice desatualizado sobrescreva uma transição mais recente gravada por outro
+        final_states = {t["rule_id"]: t for t in transitions}
+        table = self.model.__table__
+        self.db.execute(
+            update(table)
+            .where(
+                table.c.id == bindparam("rule_id"),
+                or_(table.c.state_changed_at.is_(None), table.c.state_changed_at <= bindparam("changed_at")),
+            )
+            .values(state=bindparam("new_state"), state_changed_at=bindparam("changed_at")),
+            [
+                {"rule_id": rule_id, "new_state": t["state"], "changed_at": t["timestamp"]}
+                for rule_id, t in sorted(final_states.items())
+            ],
+        )
+        return len(transitions)
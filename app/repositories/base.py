@@ -1,22 +1,68 @@
-from typing import Generic, TypeVar, Type, List, Optional
+from typing import Generic, TypeVar, Type, List, Optional, Sequence
 import uuid
+from app.core.config import settings
+from app.core.pagination import ENTITY_KEY, keyset
+from app.db import search
 from app.db.base import Base
+from app.db.models import Project
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 # Define um tipo genérico para o modelo SQLAlchemy
 ModelType = TypeVar("ModelType", bound=Base)
 
 class BaseRepository(Generic[ModelType]):
+    # Chave de ordenação das listagens (ver app/core/pagination.py)
+    cursor_key: tuple[str, ...] = ENTITY_KEY
+    cursor_descending = False
+    # Colunas do documento da busca textual; precisa ter o índice de trigramas em models.py
+    search_fields: tuple[str, ...] = ()
+
     def __init__(self, model: Type[ModelType], db: Session):
         self.model = model
         self.db = db
 
-    def get_by_id(self, item_id: uuid.UUID) -> Optional[ModelType]:
-        return self.db.query(self.model).filter(self.model.id == item_id).first()
+    def get_by_id(self, item_id: uuid.UUID, options: Sequence = ()) -> Optional[ModelType]:
+        """`options`: perfil de carregamento dos relacionamentos (ver app/db/loading.py)."""
+        return self.db.query(self.model).options(*options).filter(self.model.id == item_id).first()
+
+    def get_by_ids(self, item_ids: Sequence[uuid.UUID], options: Sequence = ()) -> List[ModelType]:
+        """As linhas existentes da lista, em uma única consulta (sem ordem garantida)."""
+        if not item_ids:
+            return []
+        return self.db.query(self.model).options(*options).filter(self.model.id.in_(item_ids)).all()
+
+    def owner_join(self, query):
+        """
+        Junta a query até projects, de onde vem o dono (Project.user_id). Cada repositório de
+        entidade com dono define o caminho.
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no owner")
+
+    def scope_to_user(self, query, user_id: uuid.UUID):
+        """Restringe a query às linhas dos projetos do usuário, no mesmo statement."""
+        return self.owner_join(query).filter(Project.user_id == user_id)
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[ModelType]:
-        return self.db.query(self.model).offset(skip).limit(limit).all()
+    def get_by_id_for_user(self, item_id: uuid.UUID, user_id: uuid.UUID, options: Sequence = ()) -> Optional[ModelType]:
+        """A linha, se existir e for do usuário: busca e autorização em uma única consulta."""
+        query = self.scope_to_user(self.db.query(self.model).options(*options), user_id)
+        return query.filter(self.model.id == item_id).first()
+
+    def get_with_owner(self, item_id: uuid.UUID, options: Sequence = ()) -> Optional[Row]:
+        """
+        (linha, user_id do dono) em uma única consulta, ou None se a linha não existe: permite
+        responder 404 ou 403 sem carregar a cadeia de relacionamentos até o projeto.
+        """
+        query = self.owner_join(self.db.query(self.model, Project.user_id).options(*options))
+        return query.filter(self.model.id == item_id).first()
+
+    def paginate(self, query, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[ModelType]:
+        """Ordena pela chave de cursor_key, continua depois do cursor (se houver) e aplica skip/limit."""
+        columns = [getattr(self.model, name) for name in self.cursor_key]
+        return keyset(query, columns, cursor, self.cursor_descending).offset(skip).limit(limit).all()
+
+    def get_all(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[ModelType]:
+        return self.paginate(self.db.query(self.model), skip, limit, cursor)
 
     def create(self, obj_in: dict) -> ModelType:
         db_obj = self.model(**obj_in)
@@ -36,13 +82,21 @@ class BaseRepository(Generic[ModelType]):
         self.db.delete(db_obj)
         self.db.commit()
 
-    def search_by_text(self, query: str, fields: List[str], skip: int = 0, limit: int = 100) -> List[ModelType]:
-        filters = []
-        for field in fields:
-            if hasattr(self.model, field):
-                filters.append(func.lower(getattr(self.model, field)).like(f"%{query.lower()}%"))
-        
-        if not filters:
-            return [] 
-
-        return self.db.query(self.model).filter(func.or_(*filters)).offset(skip).limit(limit).all()
\ No newline at end of file
+    def search_by_text(self, query: str, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                       scope=None) -> List[ModelType]:
+        """
+        Busca nas colunas de search_fields (ver app/db/search.py), da melhor correspondência
+        para a pior. `scope` é a query de partida (ex.: só as linhas do usuário), por padrão a
+        tabela inteira. Cada resultado recebe o atributo search_rank, chave do cursor (SEARCH_KEY).
+        """
+        if not self.search_fields or not query.strip():
+            return []
+        document = search.document(*(getattr(self.model, name) for name in self.search_fields))
+        rank = search.rank(document, query)
+        scope = scope if scope is not None else self.db.query(self.model)
+        search.set_similarity_threshold(self.db, settings.SEARCH_SIMILARITY_THRESHOLD)
+        matches = scope.add_columns(rank).filter(search.matches(document, query))
+        rows = keyset(matches, [rank, self.model.id], cursor, descending=True).offset(skip).limit(limit).all()
+        for item, item_rank in rows:
+            item.search_rank = item_rank
+        return [item for item, _ in rows]
@@ -1,14 +1,25 @@
 # app/repositories/command.py
 from sqlalchemy.orm import Session
-from app.db.models import Command
+from app.core.pagination import COMMAND_KEY
+from app.db.models import Command, Device, Project
 from app.repositories.base import BaseRepository
 from typing import List, Optional
 import uuid
 
 class CommandRepository(BaseRepository[Command]):
+    cursor_key = COMMAND_KEY
+
     def __init__(self, db: Session):
         super().__init__(Command, db)
 
+    def owner_join(self, query):
+        return query.join(Device, Device.id == self.model.device_id) \
+            .join(Project, Project.id == Device.project_id)
+
+    def get_commands_for_device(self, device_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                                cursor: Optional[str] = None) -> List[Command]:
+        return self.paginate(self.db.query(self.model).filter(self.model.device_id == device_id), skip, limit, cursor)
+
     def get_pending_commands_for_device(self, device_id: uuid.UUID, limit: int = 10) -> List[Command]:
         """Obtém comandos pendentes para um dispositivo específico."""
         return self.db.query(self.model).filter(
@@ -1,15 +1,45 @@
-from typing import List
+from typing import List, Optional
 import uuid
+from sqlalchemy import select
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from app.db.models import Device
+from app.core.cache import device_resolution_cache
+from app.db.models import Device, Project
 from app.repositories.base import BaseRepository
 
 class DeviceRepository(BaseRepository[Device]):
+    search_fields = ("name", "description", "serial_number")
+
     def __init__(self, db: Session):
         super().__init__(Device, db)
 
-    def get_devices_by_project(self, project_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Device]:
-        return self.db.query(self.model).filter(self.model.project_id == project_id).offset(skip).limit(limit).all()
+    def owner_join(self, query):
+        return query.join(Project, Project.id == self.model.project_id)
+
+    def get_devices_by_project(self, project_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                               cursor: Optional[str] = None) -> List[Device]:
+        return self.paginate(self.db.query(self.model).filter(self.model.project_id == project_id), skip, limit, cursor)
+
+    def search_devices_by_user(self, user_id: uuid.UUID, query: str, skip: int = 0, limit: int = 100,
+                               cursor: Optional[str] = None) -> List[Device]:
+        return self.search_by_text(query, skip=skip, limit=limit, cursor=cursor, scope=self.scope_to_user(self.db.query(self.model), user_id))
 
     def get_by_serial_number(self, serial_number: str) -> Device | None:
-        return self.db.query(self.model).filter(self.model.serial_number == serial_number).first()
\ No newline at end of file
+        return self.db.query(self.model).filter(self.model.serial_number == serial_number).first()
+
+    def resolve_serial_number(self, serial_number: str) -> Row | None:
+        """
+        Resolve um número de série para (id, owner_user_id) em uma única consulta,
+        sem carregar o objeto Device nem percorrer device.project de forma lazy.
+        O resultado fica no device_resolution_cache até ser invalidado pelo DeviceService.
+        """
+        device = device_resolution_cache.get(serial_number)
+        if device is None:
+            device = self.db.execute(
+                select(self.model.id, Project.user_id.label("owner_user_id"))
+                .join(Project, Project.id == self.model.project_id)
+                .where(self.model.serial_number == serial_number)
+            ).first()
+            if device is not None:
+                device_resolution_cache.set(serial_number, device)
+        return device
@@ -1,12 +1,58 @@
-from typing import List
+from typing import List, Optional
 import uuid
+from sqlalchemy import text
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
+from app.db import loading
 from app.db.models import Project
 from app.repositories.base import BaseRepository
 
+# Uma linha que muda sempre que algo exibido no snapshot do projeto muda: o próprio projeto,
+# dispositivos e sensores (quantidade e updated_at), tags do projeto e dos dispositivos e a
+# leitura mais recente de cada sensor (marcas d'água). Lê só índices e tabelas pequenas.
+SNAPSHOT_VERSION = text("""
+    SELECT p.user_id, p.updated_at,
+        (SELECT count(*) || ':' || COALESCE(max(d.updated_at)::text, '')
+         FROM devices d WHERE d.project_id = p.id) AS devices,
+        (SELECT count(*) || ':' || COALESCE(max(s.updated_at)::text, '')
+         FROM sensors s JOIN devices d ON d.id = s.device_id WHERE d.project_id = p.id) AS sensors,
+        (SELECT md5(COALESCE(string_agg(x.owner_id::text || x.tag_id::text || t.name, ',' ORDER BY x.owner_id, x.tag_id), ''))
+         FROM (
+             SELECT project_id AS owner_id, tag_id FROM project_tags WHERE project_id = p.id
+             UNION ALL
+             SELECT dt.device_id, dt.tag_id FROM device_tags dt JOIN devices d ON d.id = dt.device_id WHERE d.project_id = p.id
+         ) x JOIN tags t ON t.id = x.tag_id) AS tags,
+        (SELECT COALESCE(sum(extract(epoch FROM w.latest_timestamp)), 0) || ':' || COALESCE(sum(w.revision), 0)
+         FROM sensor_data_watermarks w JOIN sensors s ON s.id = w.sensor_id JOIN devices d ON d.id = s.device_id
+         WHERE d.project_id = p.id) AS readings
+    FROM projects p
+    WHERE p.id = :project_id
+""")
+
 class ProjectRepository(BaseRepository[Project]):
+    search_fields = ("name", "description")
+
     def __init__(self, db: Session):
         super().__init__(Project, db)
 
-    def get_projects_by_user(self, user_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Project]:
-        return self.db.query(self.model).filter(self.model.user_id == user_id).offset(skip).limit(limit).all()
\ No newline at end of file
+    def owner_join(self, query):
+        return query
+
+    def get_projects_by_user(self, user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                             cursor: Optional[str] = None) -> List[Project]:
+        return self.paginate(self.scope_to_user(self.db.query(self.model), user_id), skip, limit, cursor)
+
+    def search_projects_by_user(self, user_id: uuid.UUID, query: str, skip: int = 0, limit: int = 100,
+                                cursor: Optional[str] = None) -> List[Project]:
+        return self.search_by_text(query, skip=skip, limit=limit, cursor=cursor, scope=self.scope_to_user(self.db.query(self.model), user_id))
+
+    def get_snapshot_version(self, project_id: uuid.UUID) -> Optional[Row]:
+        """(user_id, e os componentes da versão) do projeto, ou None se ele não existe."""
+        return self.db.execute(SNAPSHOT_VERSION, {"project_id": project_id}).first()
+
+    def get_with_tree(self, project_id: uuid.UUID) -> Optional[Project]:
+        """
+        Projeto com tags, dispositivos, sensores e tags dos dispositivos carregados por
+        selectinload: cinco consultas no total, qualquer que seja o tamanho do projeto.
+        """
+        return self.get_by_id(project_id, options=loading.PROJECT_TREE)
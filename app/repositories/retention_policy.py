@@ -0,0 +1,58 @@
+from typing import List, Optional, Sequence
+import uuid
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session, aliased
+from app.db.models import Device, Project, RetentionPolicy, Sensor
+from app.repositories.base import BaseRepository
+
+class RetentionPolicyRepository(BaseRepository[RetentionPolicy]):
+    def __init__(self, db: Session):
+        super().__init__(RetentionPolicy, db)
+
+    def get_by_project(self, project_id: uuid.UUID) -> Optional[RetentionPolicy]:
+        return self.db.query(self.model).filter(self.model.project_id == project_id).first()
+
+    def get_by_sensor(self, sensor_id: uuid.UUID) -> Optional[RetentionPolicy]:
+        return self.db.query(self.model).filter(self.model.sensor_id == sensor_id).first()
+
+    def scope_to_user(self, query, user_id: uuid.UUID):
+        """Políticas dos projetos do usuário e dos sensores desses projetos."""
+        user_sensors = select(Sensor.id).join(Device, Device.id == Sensor.device_id) \
+            .join(Project, Project.id == Device.project_id).where(Project.user_id == user_id)
+        user_projects = select(Project.id).where(Project.user_id == user_id)
+        return query.filter(or_(self.model.project_id.in_(user_projects), self.model.sensor_id.in_(user_sensors)))
+
+    def get_with_owner(self, item_id: uuid.UUID, options: Sequence = ()) -> Optional[Row]:
+        """(política, user_id do dono) em uma consulta; o dono vem do projeto ou do sensor da política."""
+        project_owner = select(Project.user_id).where(Project.id == self.model.project_id).scalar_subquery()
+        sensor_owner = select(Project.user_id).join(Device, Device.project_id == Project.id) \
+            .join(Sensor, Sensor.device_id == Device.id).where(Sensor.id == self.model.sensor_id).scalar_subquery()
+        query = self.db.query(self.model, func.coalesce(project_owner, sensor_owner)).options(*options)
+        return query.filter(self.model.id == item_id).first()
+
+    def get_policies_by_user(self, user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                             cursor: Optional[str] = None) -> List[RetentionPolicy]:
+        return self.paginate(self.scope_to_user(self.db.query(self.model), user_id), skip, limit, cursor)
+
+    def get_effective_policies(self) -> List[Row]:
+        """
+        Retorna (sensor_id, raw_retention_days, rollup_retention_days) de cada sensor que
+        tem uma política aplicável: a do próprio sensor ou, na falta dela, a do projeto.
+        """
+        sensor_policy = aliased(RetentionPolicy)
+        project_policy = aliased(RetentionPolicy)
+        has_sensor_policy = sensor_policy.id.isnot(None)
+        return self.db.execute(
+            select(
+                Sensor.id.label("sensor_id"),
+                case((has_sensor_policy, sensor_policy.raw_retention_days), else_=project_policy.raw_retention_days)
+                    .label("raw_retention_days"),
+                case((has_sensor_policy, sensor_policy.rollup_retention_days), else_=project_policy.rollup_retention_days)
+                    .label("rollup_retention_days"),
+            )
+            .join(Device, Device.id == Sensor.device_id)
+            .outerjoin(sensor_policy, sensor_policy.sensor_id == Sensor.id)
+            .outerjoin(project_policy, project_policy.project_id == Device.project_id)
+            .where(or_(has_sensor_policy, project_policy.id.isnot(None)))
+        ).all()
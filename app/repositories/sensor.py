@@ -1,15 +1,65 @@
 from typing import List, Optional
 import uuid
+from sqlalchemy import Select, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
-from app.db.models import Sensor
+from app.core.cache import sensor_resolution_cache
+from app.db.models import Device, Project, Sensor, device_tags, project_tags
 from app.repositories.base import BaseRepository
 
 class SensorRepository(BaseRepository[Sensor]):
     def __init__(self, db: Session):
         super().__init__(Sensor, db)
 
-    def get_sensors_by_device(self, device_id: uuid.UUID, skip: int = 0, limit: int = 100) -> List[Sensor]:
-        return self.db.query(self.model).filter(self.model.device_id == device_id).offset(skip).limit(limit).all()
+    def owner_join(self, query):
+        return query.join(Device, Device.id == self.model.device_id) \
+            .join(Project, Project.id == Device.project_id)
+
+    def get_sensors_by_device(self, device_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                              cursor: Optional[str] = None) -> List[Sensor]:
+        return self.paginate(self.db.query(self.model).filter(self.model.device_id == device_id), skip, limit, cursor)
+
+    def get_by_ids_for_user(self, sensor_ids: List[uuid.UUID], user_id: uuid.UUID) -> List[Sensor]:
+        """Retorna, em uma única consulta, os sensores da lista que pertencem a projetos do usuário."""
+        return self.scope_to_user(self.db.query(self.model), user_id).filter(self.model.id.in_(sensor_ids)).all()
+
+    def select_by_project(self, project_id: uuid.UUID) -> Select:
+        """SELECT (id, device_id, name) dos sensores de todos os dispositivos do projeto, para uso como subconsulta."""
+        return select(self.model.id, self.model.device_id, self.model.name).join(Device).where(
+            Device.project_id == project_id
+        )
+
+    def select_by_tag_for_user(self, tag_id: uuid.UUID, user_id: uuid.UUID) -> Select:
+        """
+        SELECT (id, device_id, name) dos sensores dos dispositivos do usuário marcados com a tag
+        diretamente (device_tags) ou pelo projeto (project_tags), para uso como subconsulta.
+        """
+        tagged_devices = select(device_tags.c.device_id).where(device_tags.c.tag_id == tag_id)
+        tagged_projects = select(project_tags.c.project_id).where(project_tags.c.tag_id == tag_id)
+        return select(self.model.id, self.model.device_id, self.model.name).join(Device).join(Project).where(
+            Project.user_id == user_id,
+            or_(Device.id.in_(tagged_devices), Device.project_id.in_(tagged_projects))
+        )
+
+    def select_by_device(self, device_id: uuid.UUID) -> Select:
+        """SELECT (id, device_id, name) dos sensores do dispositivo, para uso como subconsulta."""
+        return select(self.model.id, self.model.device_id, self.model.name).where(self.model.device_id == device_id)
+
+    def get_limits_in_scope(self, scope: Select) -> List:
+        """(id, name, min_value, max_value) dos sensores de um SELECT de select_by_*, sem objetos ORM."""
+        scope = scope.subquery()
+        return self.db.execute(
+            select(self.model.id, self.model.name, self.model.min_value, self.model.max_value)
+            .where(self.model.id.in_(select(scope.c.id)))
+            .order_by(self.model.id)
+        ).all()
+
+    def count_scope(self, scope: Select) -> tuple[int, int, int]:
+        """(sensores, dispositivos, nomes de sensor distintos) de um SELECT de select_by_*."""
+        scope = scope.subquery()
+        return tuple(self.db.execute(
+            select(func.count(), func.count(scope.c.device_id.distinct()), func.count(scope.c.name.distinct()))
+        ).one())
 
     def get_by_name_and_device(self, name: str, device_id: uuid.UUID) -> Optional[Sensor]:
         """
@@ -20,3 +70,50 @@ class SensorRepository(BaseRepository[Sensor]):
             self.model.name == name,
             self.model.device_id == device_id
         ).first()
+
+    def get_ids_by_names_and_device(self, names: List[str], device_id: uuid.UUID) -> dict[str, uuid.UUID]:
+        """
+        Resolve vários nomes de sensor de um dispositivo em uma única consulta.
+        Retorna um dicionário nome -> ID apenas para os sensores encontrados.
+        Nomes presentes no sensor_resolution_cache não vão ao banco.
+        """
+        sensor_ids = {}
+        missing = []
+        for name in names:
+            sensor_id = sensor_resolution_cache.get((device_id, name))
+            if sensor_id is None:
+                missing.append(name)
+            else:
+                sensor_ids[name] = sensor_id
+        if not missing:
+            return sensor_ids
+
+        rows = self.db.execute(
+            select(self.model.name, self.model.id).where(
+                self.model.device_id == device_id,
+                self.model.name.in_(missing)
+            )
+        ).all()
+        for row in rows:
+            sensor_resolution_cache.set((device_id, row.name), row.id)
+            sensor_ids[row.name] = row.id
+        return sensor_ids
+
+    def create_many(self, objs_in: List[dict]) -> dict[str, uuid.UUID]:
+        """
+        Cria vários sensores com um único INSERT multi-linha.
+        Nomes que já existem no dispositivo (criados por outra transação entre a busca e o
+        INSERT) são ignorados por ON CONFLICT (device_id, name) DO NOTHING.
+        Não faz commit: a transação fica a cargo do chamador.
+        Retorna um dicionário nome -> ID dos sensores efetivamente criados.
+        """
+        if not objs_in:
+            return {}
+        # Não popula o cache aqui: a transação ainda pode ser revertida pelo chamador
+        rows = self.db.execute(
+            insert(self.model)
+            .on_conflict_do_nothing(index_elements=[self.model.device_id, self.model.name])
+            .returning(self.model.name, self.model.id),
+            objs_in
+        ).all()
+        return {row.name: row.id for row in rows}
@@ -1,18 +1,260 @@
 from typing import List, Optional
+import os
 import uuid
+import numpy as np
+from sqlalchemy import BigInteger, Float, Select, any_, bindparam, cast, func, select, text, true
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from app.db.models import SensorData
+from app.db.models import Device, Project, Sensor, SensorData, SensorDataWatermark
+from app.core import archive
+from app.core.config import settings
+from app.core.pagination import READING_KEY, decode_cursor, keyset
+from app.repositories.alert_rule import AlertRuleRepository
 from app.repositories.base import BaseRepository
+from app.repositories.sensor_data_archive import SensorDataArchiveRepository
+from app.repositories.sensor_data_rollup import SensorDataRollupRepository
 from datetime import datetime
 
+# Final comum dos comandos que removem leituras (CTE "deleted" com a coluna size):
+# retorna (linhas removidas, bytes das tuplas)
+DELETED_ROWS_SUMMARY = "SELECT count(*), COALESCE(sum(size), 0) FROM deleted"
+
 class SensorDataRepository(BaseRepository[SensorData]):
+    cursor_key = READING_KEY
+    cursor_descending = True
+
     def __init__(self, db: Session):
         super().__init__(SensorData, db)
 
-    def get_data_by_sensor(self, sensor_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None, skip: int = 0, limit: int = 100) -> List[SensorData]:
+    def create(self, obj_in: dict) -> SensorData:
+        db_obj = self.model(**obj_in)
+        self.db.add(db_obj)
+        self.db.flush()
+        SensorDataRollupRepository(self.db).add_readings([db_obj])
+        AlertRuleRepository(self.db).evaluate_readings([db_obj])
+        self.db.commit()
+        self.db.refresh(db_obj)
+        return db_obj
+
+    def owner_join(self, query):
+        return query.join(Sensor, Sensor.id == self.model.sensor_id).join(Device, Device.id == Sensor.device_id) \
+            .join(Project, Project.id == Device.project_id)
+
+    def delete(self, db_obj: SensorData) -> None:
+        sensor_id, timestamp, value = db_obj.sensor_id, db_obj.timestamp, db_obj.value
+        self.db.delete(db_obj)
+        self.db.flush()
+        SensorDataRollupRepository(self.db).remove_reading(sensor_id, timestamp, value)
+        self.db.commit()
+
+    def get_data_by_sensor(self, sensor_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                           skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[SensorData]:
         query = self.db.query(self.model).filter(self.model.sensor_id == sensor_id)
         if start_time:
             query = query.filter(self.model.timestamp >= start_time)
         if end_time:
             query = query.filter(self.model.timestamp <= end_time)
-        return query.order_by(self.model.timestamp.desc()).offset(skip).limit(limit).all()
\ No newline at end of file
+        columns = [self.model.timestamp, self.model.id]
+        query = keyset(query, columns, cursor, descending=True)
+
+        # Com cursor, as leituras da página são anteriores a ele: o timestamp do cursor
+        # também limita o intervalo dos arquivos
+        after = decode_cursor(cursor, columns) if cursor else None
+        if after and (end_time is None or after[0] < end_time):
+            end_time = after[0]
+
+        archives = SensorDataArchiveRepository(self.db).get_overlapping(sensor_id, start_time, end_time)
+        if not archives:
+            return query.offset(skip).limit(limit).all()
+
+        # O intervalo cruza o tier frio: junta as `needed` leituras mais recentes do banco
+        # com as dos arquivos, do mais recente para o mais antigo, parando quando os
+        # arquivos restantes já não podem conter leituras entre as `needed` primeiras.
+        needed = skip + limit
+        rows = query.limit(needed).all()
+        for item in archives:
+            if len(rows) >= needed and rows[needed - 1].timestamp > item.range_end:
+                break
+            # Uma leitura a mais: a do timestamp do cursor pode ser descartada abaixo
+            archived = archive.read_archive(
+                os.path.join(settings.ARCHIVE_DIR, item.path), start_time, end_time, newest=needed + 1
+            )
+            rows.extend(
+                self.model(id=data_id, sensor_id=sensor_id, value=value, timestamp=timestamp)
+                for data_id, timestamp, value in archived
+                if after is None or (timestamp, data_id) < tuple(after)
+            )
+            rows.sort(key=lambda row: (row.timestamp, row.id), reverse=True)
+            del rows[needed:]
+        return rows[skip:needed]
+
+    def get_latest_in_scope(self, scope: Select, limit: int) -> List[Row]:
+        """
+        As `limit` leituras mais recentes de cada sensor de um SELECT de SensorRepository.select_by_*,
+        em uma única consulta, como (sensor_id, device_id, sensor_name, unit_of_measurement, id,
+        value, timestamp) ordenadas por dispositivo, sensor e timestamp decrescente. Com limit=1 a
+        leitura vem da marca d'água, sem ler sensor_data; senão, de um LEFT JOIN LATERAL com
+        ORDER BY timestamp DESC LIMIT por sensor, que percorre o índice (sensor_id, timestamp)
+        das partições mais recentes. Sensores sem leituras vêm uma vez, com id, value e timestamp nulos.
+        """
+        scope = scope.subquery()
+        sensors = scope.join(Sensor, Sensor.id == scope.c.id)
+        columns = (scope.c.id.label("sensor_id"), scope.c.device_id, scope.c.name.label("sensor_name"), Sensor.unit_of_measurement)
+        if limit == 1:
+            watermark = SensorDataWatermark
+            stmt = select(
+                *columns,
+                watermark.latest_id.label("id"),
+                watermark.latest_value.label("value"),
+                watermark.latest_timestamp.label("timestamp"),
+            ).select_from(
+                sensors.outerjoin(watermark, (watermark.sensor_id == scope.c.id) & watermark.latest_id.isnot(None))
+            )
+            timestamp = watermark.latest_timestamp
+        else:
+            recent = select(self.model.id, self.model.value, self.model.timestamp) \
+                .where(self.model.sensor_id == scope.c.id) \
+                .order_by(self.model.timestamp.desc()) \
+                .limit(limit) \
+                .lateral("recent")
+            stmt = select(*columns, recent.c.id, recent.c.value, recent.c.timestamp).select_from(sensors.outerjoin(recent, true()))
+            timestamp = recent.c.timestamp
+        stmt = stmt.order_by(scope.c.device_id, scope.c.name, scope.c.id, timestamp.desc())
+        return self.db.execute(stmt).all()
+
+    def get_series(self, sensor_id: uuid.UUID, start_time: datetime, end_time: datetime, chunk_size: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Leituras do sensor em [start_time, end_time), inclusive as arquivadas, como arrays
+        numpy em ordem de timestamp: epoch em microssegundos (int64) e valor (float64).
+        As linhas do banco chegam por um cursor do lado do servidor em blocos de chunk_size
+        e cada bloco é convertido direto em arrays, sem objetos ORM.
+        """
+        result = self.db.execute(
+            select(
+                cast(func.extract("epoch", self.model.timestamp) * 1000000, BigInteger),
+                cast(self.model.value, Float),
+            )
+            .where(self.model.sensor_id == sensor_id, self.model.timestamp >= start_time, self.model.timestamp < end_time)
+            .order_by(self.model.timestamp),
+            execution_options={"yield_per": chunk_size},
+        )
+        timestamps, values = [], []
+        for chunk in result.partitions():
+            # Epochs em microssegundos cabem sem perda em float64 (são menores que 2**53)
+            block = np.array(chunk, dtype=np.float64).reshape(-1, 2)
+            timestamps.append(block[:, 0].astype(np.int64))
+            values.append(block[:, 1])
+
+        archives = SensorDataArchiveRepository(self.db).get_overlapping(sensor_id, start_time, end_time)
+        for item in archives:
+            archived_timestamps, archived_values = archive.read_archive_series(
+                os.path.join(settings.ARCHIVE_DIR, item.path), start_time, end_time
+            )
+            timestamps.append(archived_timestamps)
+            values.append(archived_values)
+
+        if not timestamps:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        timestamps = np.concatenate(timestamps)
+        values = np.concatenate(values)
+        if archives:
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, values = timestamps[order], values[order]
+        return timestamps, values
+
+    def get_window_arrays(self, sensor_ids: List[uuid.UUID], start_time: datetime, end_time: datetime, chunk_size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Leituras de vários sensores em [start_time, end_time) como arrays numpy ordenados por
+        (sensor, timestamp): posição do sensor em sensor_ids, epoch em microssegundos e valor.
+        A posição é calculada no banco (array_position), então nenhuma linha vira UUID ou
+        objeto ORM. Leituras do tier frio não são incluídas.
+        """
+        ids = bindparam("sensor_ids", sensor_ids, type_=ARRAY(UUID(as_uuid=True)))
+        position = func.array_position(ids, self.model.sensor_id) - 1
+        result = self.db.execute(
+            select(
+                position,
+                cast(func.extract("epoch", self.model.timestamp) * 1000000, BigInteger),
+                cast(self.model.value, Float),
+            )
+            .where(self.model.sensor_id == any_(ids), self.model.timestamp >= start_time, self.model.timestamp < end_time)
+            .order_by(position, self.model.timestamp),
+            execution_options={"yield_per": chunk_size},
+        )
+        blocks = [np.array(chunk, dtype=np.float64).reshape(-1, 3) for chunk in result.partitions()]
+        block = np.concatenate(blocks) if blocks else np.empty((0, 3))
+        # Posições e epochs em microssegundos cabem sem perda em float64
+        return block[:, 0].astype(np.int64), block[:, 1].astype(np.int64), block[:, 2]
+
+    def bulk_insert(self, rows: List[dict]) -> List[Row]:
+        """
+        Insere várias leituras com INSERT multi-linha (insertmanyvalues do SQLAlchemy),
+        sem criar objetos ORM e sem commit: a transação fica a cargo do chamador.
+        Leituras já existentes para o mesmo (sensor_id, timestamp) são ignoradas
+        (ON CONFLICT DO NOTHING), o que torna reenvios de gateways idempotentes.
+        Retorna apenas as linhas realmente inseridas (id, sensor_id, value, timestamp),
+        que também são acumuladas nos rollups e avaliadas pelas regras de alerta na
+        mesma transação.
+        """
+        if not rows:
+            return []
+        stmt = insert(self.model).on_conflict_do_nothing(
+            index_elements=[self.model.sensor_id, self.model.timestamp]
+        ).returning(
+            self.model.id,
+            self.model.sensor_id,
+            self.model.value,
+            self.model.timestamp
+        )
+        inserted = self.db.execute(stmt, rows).all()
+        SensorDataRollupRepository(self.db).add_readings(inserted)
+        AlertRuleRepository(self.db).evaluate_readings(inserted)
+        return inserted
+
+    def expire_batch(self, sensor_id: uuid.UUID, cutoff: datetime, batch_size: int) -> tuple[int, int]:
+        """
+        Remove até batch_size leituras do sensor anteriores a cutoff, as mais antigas
+        primeiro. Os rollups não mudam: eles já contêm essas leituras desde a ingestão.
+        Sem commit. Retorna (linhas removidas, bytes das tuplas).
+        """
+        row = self.db.execute(text("""
+            WITH batch AS (
+                SELECT id, timestamp FROM sensor_data
+                WHERE sensor_id = :sensor_id AND timestamp < :cutoff
+                ORDER BY timestamp
+                LIMIT :batch_size
+            ), deleted AS (
+                DELETE FROM sensor_data d USING batch b
+                WHERE d.sensor_id = :sensor_id AND d.id = b.id AND d.timestamp = b.timestamp
+                RETURNING d.sensor_id, d.timestamp, d.value, pg_column_size(d.*) AS size
+            )
+        """ + DELETED_ROWS_SUMMARY), {"sensor_id": sensor_id, "cutoff": cutoff, "batch_size": batch_size}).one()
+        return row[0], int(row[1])
+
+    def iter_range(self, sensor_id: uuid.UUID, start_time: datetime, end_time: datetime, chunk_size: int):
+        """
+        Percorre as leituras do sensor em [start_time, end_time), em ordem de timestamp,
+        em blocos de chunk_size linhas lidos por um cursor do lado do servidor.
+        """
+        result = self.db.execute(
+            select(self.model.id, self.model.timestamp, self.model.value)
+            .where(self.model.sensor_id == sensor_id, self.model.timestamp >= start_time, self.model.timestamp < end_time)
+            .order_by(self.model.timestamp),
+            execution_options={"yield_per": chunk_size},
+        )
+        return result.partitions()
+
+    def delete_range(self, sensor_id: uuid.UUID, start_time: datetime, end_time: datetime) -> tuple[int, int]:
+        """
+        Remove as leituras do sensor em [start_time, end_time), sem alterar os rollups.
+        Sem commit. Retorna (linhas removidas, bytes das tuplas).
+        """
+        row = self.db.execute(text("""
+            WITH deleted AS (
+                DELETE FROM sensor_data d
+                WHERE d.sensor_id = :sensor_id AND d.timestamp >= :start_time AND d.timestamp < :end_time
+                RETURNING d.sensor_id, d.timestamp, d.value, pg_column_size(d.*) AS size
+            )
+        """ + DELETED_ROWS_SUMMARY), {"sensor_id": sensor_id, "start_time": start_time, "end_time": end_time}).one()
+        return row[0], int(row[1])
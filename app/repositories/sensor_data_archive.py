@@ -0,0 +1,41 @@
+from typing import List, Optional
+import uuid
+from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from app.db.models import Sensor, SensorData, SensorDataArchive
+from app.repositories.base import BaseRepository
+
+class SensorDataArchiveRepository(BaseRepository[SensorDataArchive]):
+    def __init__(self, db: Session):
+        super().__init__(SensorDataArchive, db)
+
+    def get_overlapping(self, sensor_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[SensorDataArchive]:
+        """Arquivos do sensor com leituras no intervalo, do mais recente para o mais antigo."""
+        query = self.db.query(self.model).filter(self.model.sensor_id == sensor_id)
+        if start_time:
+            query = query.filter(self.model.range_end >= start_time)
+        if end_time:
+            query = query.filter(self.model.range_start <= end_time)
+        return query.order_by(self.model.range_end.desc()).all()
+
+    def get_before(self, sensor_id: uuid.UUID, cutoff: datetime) -> List[SensorDataArchive]:
+        """Arquivos do sensor cujas leituras são todas anteriores a cutoff."""
+        return self.db.query(self.model).filter(self.model.sensor_id == sensor_id, self.model.range_end < cutoff).all()
+
+    def get_archivable_ranges(self, cutoff: datetime, limit: int) -> List[Row]:
+        """(sensor_id, month) de cada mês fechado, anterior a cutoff, que ainda tem leituras em sensor_data."""
+        month = func.date_trunc("month", SensorData.timestamp)
+        return self.db.execute(
+            select(SensorData.sensor_id, month.label("month"))
+            .where(SensorData.timestamp < cutoff)
+            .group_by(SensorData.sensor_id, month)
+            .order_by(month)
+            .limit(limit)
+        ).all()
+
+    def get_existing_sensor_ids(self, sensor_ids: List[uuid.UUID]) -> set[uuid.UUID]:
+        if not sensor_ids:
+            return set()
+        return set(self.db.execute(select(Sensor.id).where(Sensor.id.in_(sensor_ids))).scalars())
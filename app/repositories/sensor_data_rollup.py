@@ -0,0 +1,125 @@
+from typing import List, Sequence
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session
+from app.db.models import SensorDataRollupDaily, SensorDataRollupHourly, SensorDataRollupMinute
+from app.repositories.sensor_data_watermark import SensorDataWatermarkRepository
+
+# Do mais fino para o mais grosso
+ROLLUP_TIERS = (SensorDataRollupMinute, SensorDataRollupHourly, SensorDataRollupDaily)
+
+def _upsert_tier(model) -> str:
+    # ORDER BY: lotes concorrentes travam as linhas de rollup sempre na mesma ordem (sem deadlock)
+    return f"""
+        INSERT INTO {model.__tablename__} AS r (sensor_id, bucket, sample_count, value_sum, value_min, value_max)
+        SELECT sensor_id, date_trunc('{model.granularity}', timestamp), count(*), sum(value), min(value), max(value)
+        FROM readings
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (sensor_id, bucket) DO UPDATE SET
+            sample_count = r.sample_count + EXCLUDED.sample_count,
+            value_sum = r.value_sum + EXCLUDED.value_sum,
+            value_min = LEAST(r.value_min, EXCLUDED.value_min),
+            value_max = GREATEST(r.value_max, EXCLUDED.value_max)
+    """
+
+# Início do dia atual (UTC): leituras anteriores caem em períodos já fechados
+CLOSED_BEFORE = "date_trunc('day', now() AT TIME ZONE 'UTC')"
+
+# Marca d'água do sensor com a leitura mais recente; a revisão só muda quando a escrita
+# altera um período já fechado. No SET, w.* ainda são os valores anteriores à atualização.
+UPSERT_WATERMARKS = f"""
+    INSERT INTO sensor_data_watermarks AS w (sensor_id, earliest_timestamp, latest_timestamp, latest_id, latest_value, revision)
+    SELECT sensor_id, min(timestamp), max(timestamp),
+           (array_agg(id ORDER BY timestamp DESC))[1], (array_agg(value ORDER BY timestamp DESC))[1],
+           CASE WHEN min(timestamp) < {CLOSED_BEFORE} THEN 1 ELSE 0 END
+    FROM readings
+    GROUP BY 1
+    ORDER BY 1
+    ON CONFLICT (sensor_id) DO UPDATE SET
+        earliest_timestamp = LEAST(w.earliest_timestamp, EXCLUDED.earliest_timestamp),
+        latest_timestamp = GREATEST(w.latest_timestamp, EXCLUDED.latest_timestamp),
+        latest_id = CASE WHEN EXCLUDED.latest_timestamp >= w.latest_timestamp THEN EXCLUDED.latest_id ELSE w.latest_id END,
+        latest_value = CASE WHEN EXCLUDED.latest_timestamp >= w.latest_timestamp THEN EXCLUDED.latest_value ELSE w.latest_value END,
+        revision = w.revision + EXCLUDED.revision
+"""
+
+# Se a leitura removida era a mais recente do sensor, a anterior passa a ser a mais recente
+RESET_LATEST = text("""
+    UPDATE sensor_data_watermarks w
+    SET latest_id = l.id, latest_value = l.value, latest_timestamp = COALESCE(l.timestamp, w.latest_timestamp)
+    FROM (SELECT CAST(:sensor_id AS uuid) AS sensor_id) s
+    LEFT JOIN LATERAL (
+        SELECT id, value, timestamp FROM sensor_data d
+        WHERE d.sensor_id = s.sensor_id
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) l ON true
+    WHERE w.sensor_id = s.sensor_id AND w.latest_timestamp = :timestamp
+""")
+
+# Um único comando atualiza os três níveis e as marcas d'água a partir dos arrays de leituras recém-inseridas
+ADD_READINGS = text(
+    "WITH readings AS ("
+    " SELECT * FROM unnest(CAST(:ids AS uuid[]), CAST(:sensor_ids AS uuid[]), CAST(:timestamps AS timestamp[]), CAST(:values AS numeric[]))"
+    " AS t(id, sensor_id, timestamp, value)"
+    "), "
+    + ", ".join(f"{model.granularity} AS ({_upsert_tier(model)})" for model in ROLLUP_TIERS)
+    + f", watermarks AS ({UPSERT_WATERMARKS})"
+    + " SELECT count(*) FROM readings"
+)
+
+class SensorDataRollupRepository:
+    """
+    Rollups por minuto, hora e dia (contagem, soma, mínimo e máximo) de cada sensor.
+    São atualizados na mesma transação que insere ou remove as leituras, então cobrem
+    todo o histórico, inclusive o que a retenção ou o arquivamento já tiraram de sensor_data.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add_readings(self, readings: Sequence) -> None:
+        """
+        Acumula leituras (com id, sensor_id, timestamp e value) nos três níveis e avança as
+        marcas d'água e a leitura mais recente dos sensores. Sem commit.
+        """
+        if not readings:
+            return
+        self.db.execute(ADD_READINGS, {
+            "ids": [r.id for r in readings],
+            "sensor_ids": [r.sensor_id for r in readings],
+            "timestamps": [r.timestamp for r in readings],
+            "values": [r.value for r in readings],
+        })
+
+    def remove_reading(self, sensor_id: uuid.UUID, timestamp: datetime, value: Decimal) -> None:
+        """
+        Desconta uma leitura removida pela API. Contagem e soma (e, portanto, a média)
+        continuam exatas; mínimo e máximo não são recalculados e podem ainda refletir a
+        leitura removida. Buckets que ficam vazios são apagados e a revisão do sensor muda,
+        invalidando os agregados em cache. Deve ser chamado depois de remover a leitura de
+        sensor_data, para que a leitura mais recente do sensor seja recalculada sem ela.
+        Sem commit.
+        """
+        for model in ROLLUP_TIERS:
+            params = {"sensor_id": sensor_id, "timestamp": timestamp, "value": value}
+            bucket = f"date_trunc('{model.granularity}', CAST(:timestamp AS timestamp))"
+            self.db.execute(text(
+                f"UPDATE {model.__tablename__} SET sample_count = sample_count - 1, value_sum = value_sum - :value "
+                f"WHERE sensor_id = :sensor_id AND bucket = {bucket}"
+            ), params)
+            self.db.execute(text(
+                f"DELETE FROM {model.__tablename__} WHERE sensor_id = :sensor_id AND bucket = {bucket} AND sample_count <= 0"
+            ), params)
+        SensorDataWatermarkRepository(self.db).bump_revision([sensor_id])
+        self.db.execute(RESET_LATEST, {"sensor_id": sensor_id, "timestamp": timestamp})
+
+    def delete_before(self, models: List, sensor_id: uuid.UUID, cutoff: datetime) -> int:
+        """Remove os buckets do sensor anteriores a cutoff nos níveis informados. Sem commit."""
+        deleted = 0
+        for model in models:
+            result = self.db.execute(delete(model).where(model.sensor_id == sensor_id, model.bucket < cutoff))
+            deleted += result.rowcount
+        return deleted
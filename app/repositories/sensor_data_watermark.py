@@ -0,0 +1,29 @@
+from typing import List
+import uuid
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.db.models import SensorDataWatermark
+from app.repositories.base import BaseRepository
+
+class SensorDataWatermarkRepository(BaseRepository[SensorDataWatermark]):
+    """
+    Marcas d'água por sensor (leitura mais antiga, mais recente e revisão). São escritas
+    pelo SensorDataRollupRepository na mesma transação das leituras.
+    """
+    def __init__(self, db: Session):
+        super().__init__(SensorDataWatermark, db)
+
+    def get_by_sensor_ids(self, sensor_ids: List[uuid.UUID]) -> dict[uuid.UUID, SensorDataWatermark]:
+        if not sensor_ids:
+            return {}
+        rows = self.db.query(self.model).filter(self.model.sensor_id.in_(sensor_ids)).all()
+        return {row.sensor_id: row for row in rows}
+
+    def bump_revision(self, sensor_ids: List[uuid.UUID]) -> None:
+        """Marca que dados já agregados dos sensores mudaram (invalida o cache). Sem commit."""
+        self.db.execute(
+            update(self.model)
+            .where(self.model.sensor_id.in_(sensor_ids))
+            .values(revision=self.model.revision + 1)
+            .execution_options(synchronize_session=False)
+        )
@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
+from app.core.pagination import TAG_KEY
 from app.db.models import Tag
 from app.repositories.base import BaseRepository
 
 class TagRepository(BaseRepository[Tag]):
+    cursor_key = TAG_KEY
+    search_fields = ("name",)
+
     def __init__(self, db: Session):
         super().__init__(Tag, db)
 
@@ -0,0 +1,50 @@
+from pydantic import BaseModel
+from datetime import datetime
+from decimal import Decimal
+import uuid
+
+# Base para criação/leitura
+class AlertRuleBase(BaseModel):
+    name: str
+    lower: Decimal | None = None # Sem limite inferior se None
+    upper: Decimal | None = None # Sem limite superior se None
+    hysteresis: Decimal = Decimal(0) # Margem para sair do alarme, evita alternar a cada leitura perto do limite
+    enabled: bool = True
+
+# Schema para criação: sem lower e upper, valem o min_value e o max_value do sensor
+class AlertRuleCreate(AlertRuleBase):
+    sensor_id: uuid.UUID
+
+# Schema para atualização de regra
+class AlertRuleUpdate(BaseModel):
+    name: str | None = None
+    lower: Decimal | None = None
+    upper: Decimal | None = None
+    hysteresis: Decimal | None = None
+    enabled: bool | None = None
+
+# Schema para retorno de regra
+class AlertRuleOut(AlertRuleBase):
+    id: uuid.UUID
+    sensor_id: uuid.UUID
+    state: str # 'ok', 'high' ou 'low'
+    state_changed_at: datetime | None = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Transição de estado de uma regra
+class AlertEventOut(BaseModel):
+    id: uuid.UUID
+    rule_id: uuid.UUID
+    sensor_id: uuid.UUID
+    previous_state: str
+    state: str
+    value: Decimal
+    timestamp: datetime
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from datetime import datetime
+import uuid
+
+# Base para criação/leitura
+class RetentionPolicyBase(BaseModel):
+    raw_retention_days: int
+    rollup_retention_days: int | None = None # Rollups por hora e por dia; None: mantidos para sempre
+
+# Schema para criação: informe project_id ou sensor_id (a política do sensor prevalece sobre a do projeto)
+class RetentionPolicyCreate(RetentionPolicyBase):
+    project_id: uuid.UUID | None = None
+    sensor_id: uuid.UUID | None = None
+
+# Schema para atualização de política
+class RetentionPolicyUpdate(BaseModel):
+    raw_retention_days: int | None = None
+    rollup_retention_days: int | None = None
+
+# Schema para retorno de política
+class RetentionPolicyOut(RetentionPolicyBase):
+    id: uuid.UUID
+    project_id: uuid.UUID | None = None
+    sensor_id: uuid.UUID | None = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -38,6 +38,7 @@ class SensorOut(SensorBase):
         
 class SensorWithRecentData(BaseModel):
     sensor_id: uuid.UUID
+    device_id: uuid.UUID
     sensor_name: str
     unit_of_measurement: str | None = None
     recent_data: List[SensorDataOut]
@@ -33,6 +33,16 @@ class IngestDataPayload(BaseModel):
     device_serial_number: str
     readings: list[SensorReading]
 
+# Resumo por dispositivo retornado pela ingestão em streaming (NDJSON).
+class DeviceIngestSummary(BaseModel):
+    device_serial_number: str
+    ingested: int = 0
+    # Modo write-behind: leituras enfileiradas, gravadas depois pela thread de fundo
+    accepted: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    errors: list[str] = []
+
 class SensorDailyAverage(BaseModel):
     sensor_id: uuid.UUID
     sensor_name: str
@@ -62,4 +72,96 @@ class SensorMonthlyAverage(BaseModel):
 
     class Config:
         from_attributes = True
-        
\ No newline at end of file
+
+# Um bucket de uma agregação: só as estatísticas pedidas são preenchidas
+class SensorDataAggregate(BaseModel):
+    sensor_id: uuid.UUID
+    bucket: datetime # Início do bucket
+    count: int | None = None
+    min: Decimal | None = None
+    max: Decimal | None = None
+    avg: Decimal | None = None
+    sum: Decimal | None = None
+    stddev: Decimal | None = None
+    first: Decimal | None = None
+    last: Decimal | None = None
+
+class SensorDataAggregation(BaseModel):
+    interval: str
+    start_time: datetime | None = None
+    end_time: datetime | None = None
+    statistics: list[str]
+    source: str # Tabela lida: sensor_data ou um dos níveis de rollup
+    buckets: list[SensorDataAggregate]
+
+# Um bucket de uma agregação de frota: só a chave do agrupamento escolhido é preenchida
+class FleetDataAggregate(BaseModel):
+    sensor_id: uuid.UUID | None = None
+    device_id: uuid.UUID | None = None
+    sensor_name: str | None = None
+    bucket: datetime
+    count: int | None = None
+    min: Decimal | None = None
+    max: Decimal | None = None
+    avg: Decimal | None = None
+    sum: Decimal | None = None
+    stddev: Decimal | None = None
+    first: Decimal | None = None
+    last: Decimal | None = None
+
+class FleetDataAggregation(BaseModel):
+    scope: str # "project" ou "tag"
+    scope_id: uuid.UUID
+    group_by: str # "sensor", "device" ou "sensor_name"
+    devices: int
+    sensors: int
+    interval: str
+    start_time: datetime
+    end_time: datetime
+    statistics: list[str]
+    source: str
+    buckets: list[FleetDataAggregate]
+
+class SensorDataPoint(BaseModel):
+    timestamp: datetime
+    value: float
+
+# Série reduzida para gráficos: "points" tem no máximo o número de pontos pedido
+class SensorDataSeries(BaseModel):
+    sensor_id: uuid.UUID
+    start_time: datetime
+    end_time: datetime
+    method: str # "lttb" ou "minmax"
+    total_points: int # Leituras no intervalo antes da redução
+    points: list[SensorDataPoint]
+
+class SensorAnomaly(BaseModel):
+    sensor_id: uuid.UUID
+    sensor_name: str
+    timestamp: datetime
+    value: float
+    kind: str # "range", "zscore" ou "rate"
+    score: float # Quanto passou do limite, |z| ou escore robusto da taxa de variação
+
+# Contagens por sensor; só sensores com ao menos uma anomalia aparecem
+class SensorAnomalySummary(BaseModel):
+    sensor_id: uuid.UUID
+    sensor_name: str
+    readings: int
+    range_violations: int
+    zscore_outliers: int
+    rate_spikes: int
+
+class AnomalyReport(BaseModel):
+    scope: str # "device" ou "project"
+    scope_id: uuid.UUID
+    start_time: datetime
+    end_time: datetime
+    window: int
+    z_threshold: float
+    rate_threshold: float
+    sensors_scanned: int
+    readings_scanned: int
+    total_anomalies: int
+    sensors: list[SensorAnomalySummary]
+    anomalies: list[SensorAnomaly] # As `limit` mais recentes
@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from datetime import datetime
+from decimal import Decimal
+import uuid
+
+from app.schemas.sensor_data import SensorDataOut
+from app.schemas.tag import TagOut
+
+# Snapshot de um projeto: a árvore inteira com a leitura mais recente de cada sensor
+class SensorSnapshot(BaseModel):
+    id: uuid.UUID
+    name: str
+    unit_of_measurement: str | None = None
+    min_value: Decimal | None = None
+    max_value: Decimal | None = None
+    latest: SensorDataOut | None = None # None se o sensor ainda não tem leituras
+
+class DeviceSnapshot(BaseModel):
+    id: uuid.UUID
+    name: str
+    description: str | None = None
+    serial_number: str
+    device_type: str
+    status: str | None = None
+    updated_at: datetime
+    tags: list[TagOut]
+    sensors: list[SensorSnapshot]
+
+class ProjectSnapshot(BaseModel):
+    id: uuid.UUID
+    name: str
+    description: str | None = None
+    user_id: uuid.UUID
+    created_at: datetime
+    updated_at: datetime
+    tags: list[TagOut]
+    devices: list[DeviceSnapshot]
@@ -0,0 +1,282 @@
+import math
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import Integer, Select, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.db.models import SensorData, SensorDataRollupDaily, SensorDataRollupHourly, SensorDataRollupMinute
+from app.repositories.project import ProjectRepository
+from app.repositories.sensor import SensorRepository
+from app.repositories.tag import TagRepository
+
+STATISTICS = ("count", "min", "max", "avg", "sum", "stddev", "first", "last")
+# Estatísticas que os rollups (contagem, soma, mínimo e máximo por bucket) conseguem responder
+ROLLUP_STATISTICS = {"count", "min", "max", "avg", "sum"}
+# Do mais grosso para o mais fino: o primeiro nível compatível com o pedido é o mais barato
+ROLLUP_TIERS = (SensorDataRollupDaily, SensorDataRollupHourly, SensorDataRollupMinute)
+GRANULARITY_SECONDS = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Agrupamentos da agregação de frota -> nome da coluna de chave na resposta
+GROUP_BY_COLUMNS = {"sensor": "sensor_id", "device": "device_id", "sensor_name": "sensor_name"}
+
+INTERVAL_PATTERN = re.compile(r"^(\d+)(s|m|h|d|w|mo)$")
+UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+# Origem dos buckets do date_bin: meia-noite de uma segunda-feira, então buckets de dias e de
+# semanas coincidem com date_trunc('day') e date_trunc('week')
+BUCKET_ORIGIN = datetime(2000, 1, 3)
+
+class BucketInterval:
+    """
+    Intervalo dos buckets, no formato <n><unidade>: s, m, h, d e w são intervalos fixos
+    (date_bin); mo são meses de calendário, com n divisor de 12 (1mo, 3mo = trimestres, ...).
+    """
+    def __init__(self, value: str):
+        match = INTERVAL_PATTERN.match(value or "")
+        if not match or int(match.group(1)) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid interval '{value}'. Use <n><unit> with unit s, m, h, d, w or mo (e.g. 5m, 1h, 1d, 1mo)."
+            )
+        self.text = value
+        self.count = int(match.group(1))
+        self.unit = match.group(2)
+        if self.unit == "mo" and 12 % self.count != 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Monthly intervals must divide a year (1mo, 2mo, 3mo, 4mo, 6mo or 12mo)."
+            )
+        self.seconds = self.count * UNIT_SECONDS[self.unit] if self.unit != "mo" else None
+
+    def bucket(self, column):
+        """Expressão SQL do início do bucket de cada valor de column."""
+        if self.unit == "mo":
+            month_offset = func.floor((func.extract("month", column) - 1) / self.count) * self.count
+            return func.date_trunc("year", column) + func.make_interval(0, cast(month_offset, Integer))
+        # Literais (só inteiros) em vez de parâmetros: a mesma expressão aparece no SELECT e no
+        # GROUP BY, e parâmetros distintos fariam o PostgreSQL tratá-las como expressões diferentes
+        return func.date_bin(
+            literal_column(f"INTERVAL '{self.seconds} seconds'"),
+            column,
+            literal_column(f"TIMESTAMP '{BUCKET_ORIGIN.isoformat(sep=' ')}'"),
+        )
+
+    def floor(self, value: datetime) -> datetime:
+        """Início do bucket que contém value (o mesmo que bucket() calcula no banco)."""
+        if self.unit == "mo":
+            return datetime(value.year, (value.month - 1) // self.count * self.count + 1, 1)
+        step = timedelta(seconds=self.seconds)
+        return BUCKET_ORIGIN + (value - BUCKET_ORIGIN) // step * step
+
+    def next(self, bucket: datetime) -> datetime:
+        """Início do bucket seguinte ao que começa em bucket."""
+        if self.unit == "mo":
+            index = bucket.year * 12 + bucket.month - 1 + self.count
+            return datetime(index // 12, index % 12 + 1, 1)
+        return bucket + timedelta(seconds=self.seconds)
+
+    def is_multiple_of(self, granularity_seconds: int) -> bool:
+        # Meses de calendário sempre começam à meia-noite
+        return self.seconds is None or self.seconds % granularity_seconds == 0
+
+    def estimate_buckets(self, start_time: datetime, end_time: datetime) -> int:
+        if self.seconds is None:
+            months = (end_time.year - start_time.year) * 12 + end_time.month - start_time.month + 1
+            return math.ceil(months / self.count)
+        return math.ceil((end_time - start_time).total_seconds() / self.seconds) + 1
+
+def _is_aligned(value: datetime, granularity_seconds: int) -> bool:
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    return value.microsecond == 0 and seconds % granularity_seconds == 0
+
+class AggregationService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.sensor_repo = SensorRepository(db)
+        self.project_repo = ProjectRepository(db)
+        self.tag_repo = TagRepository(db)
+
+    def aggregate_for_user(self, sensor_ids: List[uuid.UUID], current_user_id: uuid.UUID, interval: str,
+                           start_time: datetime, end_time: datetime, statistics: List[str]) -> dict:
+        """
+        Agrega as leituras dos sensores informados em buckets de `interval` no intervalo
+        [start_time, end_time). Todos os sensores devem pertencer a projetos do usuário.
+        """
+        sensor_ids = list(dict.fromkeys(sensor_ids))
+        if not sensor_ids:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide at least one 'sensor_id'.")
+        if len(self.sensor_repo.get_by_ids_for_user(sensor_ids, current_user_id)) != len(sensor_ids):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="One or more sensors not found or not authorized to access their data"
+            )
+        bucket_interval = self._checked_interval(interval, start_time, end_time, len(sensor_ids))
+        return self.aggregate(sensor_ids, bucket_interval, start_time, end_time, statistics)
+
+    def aggregate_project_for_user(self, project_id: uuid.UUID, current_user_id: uuid.UUID, group_by: str, interval: str,
+                                   start_time: datetime, end_time: datetime, statistics: List[str]) -> dict:
+        """Agrega as leituras de todos os sensores de todos os dispositivos de um projeto do usuário."""
+        project = self.project_repo.get_by_id_for_user(project_id, current_user_id)
+        if not project:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Project not found or not authorized to access its sensor data"
+            )
+        scope = self.sensor_repo.select_by_project(project_id)
+        return self._aggregate_scope("project", project_id, scope, group_by, interval, start_time, end_time, statistics)
+
+    def aggregate_tag_for_user(self, tag_id: uuid.UUID, current_user_id: uuid.UUID, group_by: str, interval: str,
+                               start_time: datetime, end_time: datetime, statistics: List[str]) -> dict:
+        """
+        Agrega as leituras dos sensores dos dispositivos do usuário marcados com a tag,
+        diretamente ou por pertencerem a um projeto marcado com ela.
+        """
+        if not self.tag_repo.get_by_id(tag_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+        scope = self.sensor_repo.select_by_tag_for_user(tag_id, current_user_id)
+        return self._aggregate_scope("tag", tag_id, scope, group_by, interval, start_time, end_time, statistics)
+
+    def _aggregate_scope(self, scope_type: str, scope_id: uuid.UUID, scope: Select, group_by: str, interval: str,
+                         start_time: datetime, end_time: datetime, statistics: List[str]) -> dict:
+        if group_by not in GROUP_BY_COLUMNS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid group_by '{group_by}'. Choose from {list(GROUP_BY_COLUMNS)}."
+            )
+        sensors, devices, names = self.sensor_repo.count_scope(scope)
+        groups = {"sensor": sensors, "device": devices, "sensor_name": names}[group_by]
+        bucket_interval = self._checked_interval(interval, start_time, end_time, groups)
+
+        if sensors:
+            result = self.aggregate_fleet(scope, group_by, bucket_interval, start_time, end_time, statistics)
+        else:
+            result = {
+                "interval": bucket_interval.text, "start_time": start_time, "end_time": end_time,
+                "statistics": statistics, "source": SensorData.__tablename__, "buckets": [],
+            }
+        return result | {"scope": scope_type, "scope_id": scope_id, "group_by": group_by, "devices": devices, "sensors": sensors}
+
+    @staticmethod
+    def _checked_interval(interval: str, start_time: datetime, end_time: datetime, series: int) -> BucketInterval:
+        """Valida o intervalo pedido e o limite de buckets (séries x buckets por série) da resposta."""
+        if start_time >= end_time:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_time must be before end_time.")
+        bucket_interval = BucketInterval(interval)
+        buckets = bucket_interval.estimate_buckets(start_time, end_time) * series
+        if buckets > settings.AGGREGATE_MAX_BUCKETS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The request would return up to {buckets} buckets (limit {settings.AGGREGATE_MAX_BUCKETS}). "
+                       "Use a larger interval, a shorter range or fewer sensors."
+            )
+        return bucket_interval
+
+    def aggregate(self, sensor_ids: List[uuid.UUID], interval: BucketInterval, start_time: Optional[datetime],
+                  end_time: Optional[datetime], statistics: List[str]) -> dict:
+        """
+        Calcula todas as estatísticas pedidas em uma única consulta agrupada por (sensor, bucket),
+        sem checagem de permissão. Quando as estatísticas, o intervalo e os limites permitem,
+        lê o nível de rollup mais grosso compatível em vez das leituras brutas. Os rollups cobrem
+        todo o histórico; as leituras brutas, só o que ainda está em sensor_data (sem os meses
+        arquivados ou já removidos pela retenção).
+        """
+        return self._aggregate(interval, start_time, end_time, statistics, sensor_ids=sensor_ids)
+
+    def aggregate_fleet(self, scope: Select, group_by: str, interval: BucketInterval, start_time: Optional[datetime],
+                        end_time: Optional[datetime], statistics: List[str]) -> dict:
+        """
+        Como aggregate, mas sobre todos os sensores de `scope` (um SELECT de id, device_id e
+        name), agrupando por sensor, por dispositivo ou por nome de sensor. O escopo entra como
+        subconsulta em um JOIN, então a frota inteira é agregada em um único comando.
+        """
+        return self._aggregate(interval, start_time, end_time, statistics, scope=scope.subquery("scope"), group_by=group_by)
+
+    def _aggregate(self, interval: BucketInterval, start_time: Optional[datetime], end_time: Optional[datetime],
+                   statistics: List[str], sensor_ids: Optional[List[uuid.UUID]] = None, scope=None,
+                   group_by: str = "sensor") -> dict:
+        statistics = list(dict.fromkeys(statistics))
+        unknown = [name for name in statistics if name not in STATISTICS]
+        if not statistics or unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid statistics {unknown}. Choose from {list(STATISTICS)}."
+            )
+
+        tier = self._rollup_tier(interval, start_time, end_time, statistics)
+        if tier is not None:
+            source = tier.__tablename__
+            time_column = tier.bucket
+            columns = {
+                "count": func.sum(tier.sample_count),
+                "min": func.min(tier.value_min),
+                "max": func.max(tier.value_max),
+                "avg": func.sum(tier.value_sum) / func.sum(tier.sample_count),
+                "sum": func.sum(tier.value_sum),
+            }
+            model = tier
+        else:
+            source = SensorData.__tablename__
+            time_column = SensorData.timestamp
+            value = SensorData.value
+            columns = {
+                "count": func.count(),
+                "min": func.min(value),
+                "max": func.max(value),
+                "avg": func.avg(value),
+                "sum": func.sum(value),
+                "stddev": func.stddev_samp(value),
+                "first": array_agg(aggregate_order_by(value, time_column.asc()))[1],
+                "last": array_agg(aggregate_order_by(value, time_column.desc()))[1],
+            }
+            model = SensorData
+
+        # Filtros diretos sobre a coluna de tempo permitem podar partições e usar a chave (sensor_id, bucket)
+        filters = []
+        if scope is None:
+            key = model.sensor_id
+            filters.append(model.sensor_id.in_(sensor_ids))
+        else:
+            key = {"sensor": model.sensor_id, "device": scope.c.device_id, "sensor_name": scope.c.name}[group_by]
+        if start_time:
+            filters.append(time_column >= start_time)
+        if end_time:
+            filters.append(time_column < end_time)
+        bucket = interval.bucket(time_column)
+        query = select(
+            key.label(GROUP_BY_COLUMNS[group_by]),
+            bucket.label("bucket"),
+            *(columns[name].label(name) for name in statistics)
+        ).select_from(model)
+        if scope is not None:
+            query = query.join(scope, scope.c.id == model.sensor_id)
+        query = query.where(*filters).group_by(key, bucket).order_by(key, bucket)
+
+        return {
+            "interval": interval.text,
+            "start_time": start_time,
+            "end_time": end_time,
+            "statistics": statistics,
+            "source": source,
+            "buckets": [dict(row._mapping) for row in self.db.execute(query)],
+        }
+
+    @staticmethod
+    def _rollup_tier(interval: BucketInterval, start_time: Optional[datetime], end_time: Optional[datetime],
+                     statistics: List[str]):
+        """
+        Nível de rollup mais grosso cujos buckets cabem inteiros nos buckets pedidos e se
+        alinham aos limites do intervalo, ou None se as leituras brutas forem necessárias
+        (estatísticas como stddev, first e last, ou limites fora de um minuto exato).
+        """
+        if not set(statistics) <= ROLLUP_STATISTICS:
+            return None
+        bounds = [bound for bound in (start_time, end_time) if bound is not None]
+        for tier in ROLLUP_TIERS:
+            granularity = GRANULARITY_SECONDS[tier.granularity]
+            if interval.is_multiple_of(granularity) and all(_is_aligned(b, granularity) for b in bounds):
+                return tier
+        return None
@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+from app.core.alerts import STATES, alert_rule_index
+from app.db.models import AlertEvent, AlertRule
+from app.repositories.alert_event import AlertEventRepository
+from app.repositories.alert_rule import AlertRuleRepository
+from app.repositories.sensor import SensorRepository
+from app.schemas.alert import AlertRuleCreate, AlertRuleUpdate
+
+# Campos que mudam o significado do estado atual: alterá-los reinicia a regra em 'ok'
+LIMIT_FIELDS = ("lower", "upper", "hysteresis")
+
+class AlertService:
+    def __init__(self, db: Session):
+        self.rule_repo = AlertRuleRepository(db)
+        self.event_repo = AlertEventRepository(db)
+        self.sensor_repo = SensorRepository(db)
+
+    @staticmethod
+    def _validate_limits(lower, upper, hysteresis):
+        if lower is None and upper is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Provide 'lower' and/or 'upper' (the sensor has no min_value/max_value)."
+            )
+        if lower is not None and upper is not None and lower >= upper:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="lower must be less than upper.")
+        if hysteresis is None or hysteresis < 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="hysteresis must be zero or greater.")
+
+    def get_rule(self, rule_id: uuid.UUID, current_user_id: uuid.UUID) -> AlertRule:
+        row = self.rule_repo.get_with_owner(rule_id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alert rule not found")
+        rule, owner_id = row
+        if owner_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this alert rule")
+        return rule
+
+    def get_rules_by_user(self, current_user_id: uuid.UUID, state: Optional[str] = None, skip: int = 0, limit: int = 100,
+                          cursor: Optional[str] = None) -> list[AlertRule]:
+        if state is not None and state not in STATES:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="state must be 'ok', 'high' or 'low'.")
+        return self.rule_repo.get_rules_by_user(current_user_id, state=state, skip=skip, limit=limit, cursor=cursor)
+
+    def create_rule(self, rule_in: AlertRuleCreate, current_user_id: uuid.UUID) -> AlertRule:
+        sensor = self.sensor_repo.get_by_id_for_user(rule_in.sensor_id, current_user_id)
+        if not sensor:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Sensor not found or not authorized")
+
+        rule_data = rule_in.model_dump()
+        if rule_data["lower"] is None and rule_data["upper"] is None:
+            rule_data["lower"], rule_data["upper"] = sensor.min_value, sensor.max_value
+        self._validate_limits(rule_data["lower"], rule_data["upper"], rule_data["hysteresis"])
+
+        rule = self.rule_repo.create(rule_data)
+        alert_rule_index.invalidate()
+        return rule
+
+    def update_rule(self, rule_id: uuid.UUID, rule_in: AlertRuleUpdate, current_user_id: uuid.UUID) -> AlertRule:
+        rule = self.get_rule(rule_id, current_user_id)
+        update_data = rule_in.model_dump(exclude_unset=True)
+        if update_data.get("name", rule.name) is None or update_data.get("enabled", rule.enabled) is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="name and enabled cannot be null.")
+        if any(field in update_data for field in LIMIT_FIELDS):
+            self._validate_limits(
+                update_data.get("lower", rule.lower), update_data.get("upper", rule.upper), update_data.get("hysteresis", rule.hysteresis)
+            )
+            update_data |= {"state": "ok", "state_changed_at": None}
+
+        rule = self.rule_repo.update(rule, update_data)
+        alert_rule_index.invalidate()
+        return rule
+
+    def delete_rule(self, rule_id: uuid.UUID, current_user_id: uuid.UUID):
+        rule = self.get_rule(rule_id, current_user_id)
+        self.rule_repo.delete(rule)
+        alert_rule_index.invalidate()
+
+    def get_rule_events(self, rule_id: uuid.UUID, current_user_id: uuid.UUID, start_time: Optional[datetime] = None,
+                        end_time: Optional[datetime] = None, skip: int = 0, limit: int = 100,
+                        cursor: Optional[str] = None) -> list[AlertEvent]:
+        self.get_rule(rule_id, current_user_id)
+        return self.event_repo.get_by_rule(rule_id, start_time, end_time, skip=skip, limit=limit, cursor=cursor)
+
+    def get_events_by_user(self, current_user_id: uuid.UUID, start_time: Optional[datetime] = None,
+                           end_time: Optional[datetime] = None, skip: int = 0, limit: int = 100,
+                           cursor: Optional[str] = None) -> list[AlertEvent]:
+        return self.event_repo.get_by_user(current_user_id, start_time, end_time, skip=skip, limit=limit, cursor=cursor)
@@ -0,0 +1,155 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+
+from app.core import anomalies
+from app.core.config import settings
+from app.repositories.device import DeviceRepository
+from app.repositories.project import ProjectRepository
+from app.repositories.sensor import SensorRepository
+from app.repositories.sensor_data import SensorDataRepository
+
+class AnomalyService:
+    """
+    Varre as leituras dos sensores de um dispositivo ou de um projeto em busca de anomalias:
+    valores fora de [min_value, max_value] do sensor, z-scores altos em relação às leituras
+    anteriores e picos na taxa de variação (veja app/core/anomalies.py). Os sensores são
+    processados em lotes de ANOMALY_SENSOR_BATCH_SIZE, uma consulta e um cálculo vetorizado por lote.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+        self.sensor_repo = SensorRepository(db)
+        self.sensor_data_repo = SensorDataRepository(db)
+        self.device_repo = DeviceRepository(db)
+        self.project_repo = ProjectRepository(db)
+
+    def detect_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, start_time: Optional[datetime],
+                          end_time: Optional[datetime], window: int, z_threshold: float, rate_threshold: float, limit: int) -> dict:
+        device = self.device_repo.get_by_id_for_user(device_id, current_user_id)
+        if not device:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Device not found or not authorized to access its sensor data"
+            )
+        scope = self.sensor_repo.select_by_device(device_id)
+        return self._detect("device", device_id, scope, start_time, end_time, window, z_threshold, rate_threshold, limit)
+
+    def detect_for_project(self, project_id: uuid.UUID, current_user_id: uuid.UUID, start_time: Optional[datetime],
+                           end_time: Optional[datetime], window: int, z_threshold: float, rate_threshold: float, limit: int) -> dict:
+        project = self.project_repo.get_by_id_for_user(project_id, current_user_id)
+        if not project:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Project not found or not authorized to access its sensor data"
+            )
+        scope = self.sensor_repo.select_by_project(project_id)
+        return self._detect("project", project_id, scope, start_time, end_time, window, z_threshold, rate_threshold, limit)
+
+    def _detect(self, scope_type: str, scope_id: uuid.UUID, scope: Select, start_time: Optional[datetime],
+                end_time: Optional[datetime], window: int, z_threshold: float, rate_threshold: float, limit: int) -> dict:
+        # Sem intervalo informado, analisa as últimas 24 horas
+        end_time = end_time or datetime.utcnow()
+        start_time = start_time or end_time - timedelta(hours=24)
+        if start_time >= end_time:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_time must be before end_time.")
+        if end_time - start_time > timedelta(days=settings.ANOMALY_MAX_RANGE_DAYS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The range must span at most {settings.ANOMALY_MAX_RANGE_DAYS} days."
+            )
+        if limit > settings.ANOMALY_MAX_RESULTS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"limit must be at most {settings.ANOMALY_MAX_RESULTS}.")
+
+        sensors = self.sensor_repo.get_limits_in_scope(scope)
+        summaries, found = [], []
+        readings_scanned = 0
+        batch_size = settings.ANOMALY_SENSOR_BATCH_SIZE
+        for offset in range(0, len(sensors), batch_size):
+            batch = sensors[offset:offset + batch_size]
+            batch_summaries, batch_anomalies, batch_readings = self._detect_batch(
+                batch, start_time, end_time, window, z_threshold, rate_threshold, limit
+            )
+            summaries.extend(batch_summaries)
+            found.extend(batch_anomalies)
+            readings_scanned += batch_readings
+
+        total = sum(s["range_violations"] + s["zscore_outliers"] + s["rate_spikes"] for s in summaries)
+        found.sort(key=lambda a: a["timestamp"], reverse=True)
+        return {
+            "scope": scope_type,
+            "scope_id": scope_id,
+            "start_time": start_time,
+            "end_time": end_time,
+            "window": window,
+            "z_threshold": z_threshold,
+            "rate_threshold": rate_threshold,
+            "sensors_scanned": len(sensors),
+            "readings_scanned": readings_scanned,
+            "total_anomalies": total,
+            "sensors": summaries,
+            "anomalies": found[:limit],
+        }
+
+    def _detect_batch(self, sensors: list, start_time: datetime, end_time: datetime, window: int,
+                      z_threshold: float, rate_threshold: float, limit: int) -> tuple[list, list, int]:
+        """Resumo por sensor e as `limit` anomalias mais recentes de um lote de sensores."""
+        n = len(sensors)
+        index, timestamps, values = self.sensor_data_repo.get_window_arrays(
+            [s.id for s in sensors], start_time, end_time, settings.ANOMALY_FETCH_SIZE
+        )
+        lower = np.array([np.nan if s.min_value is None else float(s.min_value) for s in sensors])
+        upper = np.array([np.nan if s.max_value is None else float(s.max_value) for s in sensors])
+
+        # Escore de cada tipo: quanto o valor passou do limite, |z| e o escore robusto da taxa
+        with np.errstate(invalid="ignore"):
+            range_scores = np.fmax(lower[index] - values, values - upper[index])
+        zscores = np.abs(anomalies.rolling_zscores(index, values, window))
+        rate_scores = anomalies.rate_of_change_scores(index, timestamps, values, n)
+        flags = {
+            "range": anomalies.range_violations(index, values, lower, upper),
+            "zscore": zscores > z_threshold,
+            "rate": rate_scores > rate_threshold,
+        }
+        scores = {"range": range_scores, "zscore": zscores, "rate": rate_scores}
+
+        readings = np.bincount(index, minlength=n)
+        counts = {kind: np.bincount(index[flag], minlength=n) for kind, flag in flags.items()}
+        summaries = [
+            {
+                "sensor_id": sensors[i].id,
+                "sensor_name": sensors[i].name,
+                "readings": int(readings[i]),
+                "range_violations": int(counts["range"][i]),
+                "zscore_outliers": int(counts["zscore"][i]),
+                "rate_spikes": int(counts["rate"][i]),
+            }
+            for i in np.flatnonzero(counts["range"] + counts["zscore"] + counts["rate"])
+        ]
+
+        # Só as `limit` mais recentes do lote podem estar entre as `limit` mais recentes do total
+        positions = np.concatenate([np.flatnonzero(flag) for flag in flags.values()])
+        kinds = np.concatenate([np.full(int(flag.sum()), kind) for kind, flag in flags.items()])
+        point_scores = np.concatenate([scores[kind][flags[kind]] for kind in flags])
+        recent = np.argsort(-timestamps[positions], kind="stable")[:limit]
+        found = [
+            {
+                "sensor_id": sensors[index[p]].id,
+                "sensor_name": sensors[index[p]].name,
+                "timestamp": ts,
+                "value": value,
+                "kind": kind,
+                "score": score,
+            }
+            for p, ts, value, kind, score in zip(
+                positions[recent].tolist(),
+                timestamps[positions[recent]].astype("datetime64[us]").tolist(),
+                values[positions[recent]].tolist(),
+                kinds[recent].tolist(),
+                point_scores[recent].tolist(),
+            )
+        ]
+        return summaries, found, len(index)
@@ -0,0 +1,137 @@
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core import archive
+from app.core.config import settings
+from app.core.jobs import PeriodicJob
+from app.db.ids import new_id
+from app.db.models import SensorDataArchive
+from app.db.partitions import add_months, month_start
+from app.db.locks import try_advisory_lock
+from app.db.session import SessionLocal
+from app.repositories.sensor_data import SensorDataRepository
+from app.repositories.sensor_data_archive import SensorDataArchiveRepository
+
+# Chave do advisory lock: apenas um worker arquiva por vez
+ARCHIVE_LOCK_KEY = 0x5E4503
+
+logger = logging.getLogger(__name__)
+
+def archive_month(db: Session, sensor_id: uuid.UUID, month: datetime) -> SensorDataArchive | None:
+    """
+    Move as leituras de um sensor em um mês fechado para um arquivo Arrow IPC.
+    A transação roda em REPEATABLE READ: o DELETE enxerga o mesmo snapshot da leitura
+    que gerou o arquivo, então remove exatamente as linhas arquivadas (uma leitura
+    atrasada inserida no meio do processo fica no banco e vai para o próximo arquivo).
+    Os rollups não mudam: já contêm as leituras arquivadas desde a ingestão.
+    """
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    sensor_data_repo = SensorDataRepository(db)
+    start_time = month_start(month)
+    end_time = add_months(start_time, 1)
+    archive_id = new_id()
+    relative_path = os.path.join(str(sensor_id), f"{start_time:%Y-%m}", f"{archive_id}.arrow")
+    path = os.path.join(settings.ARCHIVE_DIR, relative_path)
+
+    first_ts = last_ts = None
+    def chunks():
+        nonlocal first_ts, last_ts
+        for chunk in sensor_data_repo.iter_range(sensor_id, start_time, end_time, settings.ARCHIVE_FETCH_SIZE):
+            first_ts = first_ts or chunk[0].timestamp
+            last_ts = chunk[-1].timestamp
+            yield chunk
+
+    try:
+        written = archive.write_archive(path, chunks(), {"sensor_id": str(sensor_id)})
+        if written == 0:
+            archive.remove_archive(path)
+            db.rollback()
+            return None
+        deleted, _ = sensor_data_repo.delete_range(sensor_id, start_time, end_time)
+        if deleted != written:
+            raise RuntimeError(f"Archived {written} readings but deleted {deleted}")
+        manifest = SensorDataArchive(
+            id=archive_id,
+            sensor_id=sensor_id,
+            range_start=first_ts,
+            range_end=last_ts,
+            row_count=written,
+            size_bytes=os.path.getsize(path),
+            path=relative_path,
+        )
+        db.add(manifest)
+        db.commit()
+        return manifest
+    except BaseException:
+        db.rollback()
+        archive.remove_archive(path)
+        raise
+
+def delete_archives(db: Session, manifests: list[SensorDataArchive]) -> int:
+    """Remove arquivos do tier frio e seus registros no manifesto. Retorna os bytes liberados."""
+    freed = 0
+    for manifest in manifests:
+        path, size_bytes = manifest.path, manifest.size_bytes
+        db.delete(manifest)
+        db.commit()
+        archive.remove_archive(os.path.join(settings.ARCHIVE_DIR, path))
+        freed += size_bytes
+    return freed
+
+def prune_orphan_archives(db: Session) -> int:
+    """Remove os diretórios de sensores que já não existem (removidos em cascata com o dispositivo, projeto ou usuário)."""
+    if not os.path.isdir(settings.ARCHIVE_DIR):
+        return 0
+    sensor_ids = {}
+    for name in os.listdir(settings.ARCHIVE_DIR):
+        try:
+            sensor_ids[uuid.UUID(name)] = name
+        except ValueError:
+            continue
+    existing = SensorDataArchiveRepository(db).get_existing_sensor_ids(list(sensor_ids))
+    db.commit()
+    orphans = [name for sensor_id, name in sensor_ids.items() if sensor_id not in existing]
+    for name in orphans:
+        shutil.rmtree(os.path.join(settings.ARCHIVE_DIR, name), ignore_errors=True)
+    return len(orphans)
+
+def archive_sensor_data(session_factory=SessionLocal) -> dict:
+    """
+    Arquiva os meses fechados mais antigos que ARCHIVE_AFTER_DAYS, um (sensor, mês) por
+    transação e no máximo ARCHIVE_MAX_RANGES_PER_RUN por execução.
+    """
+    report = {"ranges": 0, "rows_archived": 0, "bytes_written": 0, "orphans_removed": 0, "errors": 0}
+    if settings.ARCHIVE_AFTER_DAYS <= 0:
+        report["skipped"] = "archiving is disabled"
+        return report
+
+    cutoff = month_start(datetime.utcnow() - timedelta(days=settings.ARCHIVE_AFTER_DAYS))
+    db = session_factory()
+    try:
+        with try_advisory_lock(db.get_bind(), ARCHIVE_LOCK_KEY) as acquired:
+            if not acquired:
+                report["skipped"] = "another worker is archiving"
+                return report
+            ranges = SensorDataArchiveRepository(db).get_archivable_ranges(cutoff, settings.ARCHIVE_MAX_RANGES_PER_RUN)
+            db.commit()
+            for item in ranges:
+                try:
+                    manifest = archive_month(db, item.sensor_id, item.month)
+                except (SQLAlchemyError, OSError, RuntimeError):
+                    report["errors"] += 1
+                    logger.exception("Erro ao arquivar o sensor %s (%s)", item.sensor_id, f"{item.month:%Y-%m}")
+                    continue
+                if manifest is not None:
+                    report["ranges"] += 1
+                    report["rows_archived"] += manifest.row_count
+                    report["bytes_written"] += manifest.size_bytes
+            report["orphans_removed"] = prune_orphan_archives(db)
+    finally:
+        db.close()
+    return report
+
+archive_job = PeriodicJob("sensor-data-archive", settings.ARCHIVE_INTERVAL_SECONDS, archive_sensor_data)
@@ -1,5 +1,6 @@
 # app/services/command_service.py
 import uuid
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.db.models import Command, Device
 from app.schemas.command import CommandCreate, CommandUpdate
@@ -18,50 +19,56 @@ class CommandService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Command not found")
         return command
 
+    def get_command_for_user(self, command_id: uuid.UUID, current_user_id: uuid.UUID,
+                             detail: str = "Not authorized to access this command") -> Command:
+        """Comando do usuário, em uma consulta: 404 se não existe, 403 (com `detail`) se é de outro usuário."""
+        row = self.command_repo.get_with_owner(command_id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Command not found")
+        command, owner_id = row
+        if owner_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return command
+
     def get_all_commands(self, skip: int = 0, limit: int = 100) -> list[Command]:
         return self.command_repo.get_all(skip=skip, limit=limit)
 
-    def get_commands_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100) -> list[Command]:
+    def get_commands_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                                cursor: Optional[str] = None) -> list[Command]:
         # Primeiro, verifica se o usuário tem permissão para acessar o dispositivo
-        device = self.device_repo.get_by_id(device_id)
-        if not device or device.project.user_id != current_user_id:
+        device = self.device_repo.get_by_id_for_user(device_id, current_user_id)
+        if not device:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Device not found or not authorized to access its commands")
         
-        return self.command_repo.db.query(Command).filter(Command.device_id == device_id).offset(skip).limit(limit).all()
+        return self.command_repo.get_commands_for_device(device_id, skip=skip, limit=limit, cursor=cursor)
 
 
     def create_command(self, command_in: CommandCreate, current_user_id: uuid.UUID) -> Command:
-        device = self.device_repo.get_by_id(command_in.device_id)
-        if not device or device.project.user_id != current_user_id:
+        device = self.device_repo.get_by_id_for_user(command_in.device_id, current_user_id)
+        if not device:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Device not found or not authorized to issue commands to it")
         
         new_command = self.command_repo.create(command_in.model_dump())
         return new_command
 
-    def update_command(self, command_id: uuid.UUID, command_in: CommandUpdate, current_user_id: uuid.UUID) -> Command:
-        command = self.get_command(command_id)
-        # Verifica se o usuário logado tem permissão para atualizar o comando
-        device = self.device_repo.get_by_id(command.device_id)
-        if not device.project.user_id:
-            print(device.project.user_id, current_user_id)
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this command")
+    def update_command(self, command_id: uuid.UUID, command_in: CommandUpdate, current_user_id: Optional[uuid.UUID]) -> Command:
+        # Sem usuário (current_user_id=None) é o gateway atualizando o status do comando
+        if current_user_id is None:
+            command = self.get_command(command_id)
+        else:
+            command = self.get_command_for_user(command_id, current_user_id, "Not authorized to update this command")
 
         updated_command = self.command_repo.update(command, command_in.model_dump(exclude_unset=True))
         return updated_command
 
     def delete_command(self, command_id: uuid.UUID, current_user_id: uuid.UUID):
-        command = self.get_command(command_id)
-        device = self.device_repo.get_by_id(command.device_id)
-        if not device or device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this command")
-        
-        with self.command_repo.db.begin_nested(): # Transação ACID
-            self.command_repo.delete(command)
-            self.command_repo.db.commit()
+        command = self.get_command_for_user(command_id, current_user_id, "Not authorized to delete this command")
+
+        self.command_repo.delete(command)
 
     # Este método será acessado por um gateway (como a RPi)
     def get_pending_commands_for_device_serial(self, device_serial_number: str) -> list[Command]:
-        device = self.device_repo.get_by_serial_number(device_serial_number)
+        device = self.device_repo.resolve_serial_number(device_serial_number)
         if not device:
             # Não é um erro 404, apenas significa que não há dispositivo com este serial,
             # ou não há comandos para ele.
@@ -1,17 +1,20 @@
 import uuid
+from typing import Optional, Sequence
 from sqlalchemy.orm import Session
 from app.db.models import Device, Project, Tag
 from app.schemas.device import DeviceCreate, DeviceUpdate
 from app.repositories.device import DeviceRepository
 from app.repositories.project import ProjectRepository
-from app.repositories.tag import TagRepository
+from app.core.cache import invalidate_device_resolution
+from app.db import loading
+from app.services.tag_service import TagService
 from fastapi import HTTPException, status
 
 class DeviceService:
     def __init__(self, db: Session):
         self.device_repo = DeviceRepository(db)
         self.project_repo = ProjectRepository(db)
-        self.tag_repo = TagRepository(db)
+        self.tag_service = TagService(db)
 
     def get_device(self, device_id: uuid.UUID) -> Device:
         device = self.device_repo.get_by_id(device_id)
@@ -19,21 +22,37 @@ class DeviceService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Device not found")
         return device
 
+    def get_device_for_user(self, device_id: uuid.UUID, current_user_id: uuid.UUID,
+                            detail: str = "Not authorized to access this device", options: Sequence = ()) -> Device:
+        """
+        Dispositivo do usuário, em uma consulta: 404 se não existe, 403 (com `detail`) se é de
+        outro usuário. `options`: perfil de carregamento (ver app/db/loading.py).
+        """
+        row = self.device_repo.get_with_owner(device_id, options=options)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Device not found")
+        device, owner_id = row
+        if owner_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return device
+
     def get_all_devices(self, skip: int = 0, limit: int = 100) -> list[Device]:
         return self.device_repo.get_all(skip=skip, limit=limit)
 
-    def get_devices_by_project(self, project_id: uuid.UUID, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100) -> list[Device]:
-        project = self.project_repo.get_by_id(project_id)
-        if not project or project.user_id != current_user_id:
+    def get_devices_by_project(self, project_id: uuid.UUID, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                               cursor: Optional[str] = None) -> list[Device]:
+        project = self.project_repo.get_by_id_for_user(project_id, current_user_id)
+        if not project:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Project not found or not authorized to access it")
-        return self.device_repo.get_devices_by_project(project_id, skip=skip, limit=limit)
+        return self.device_repo.get_devices_by_project(project_id, skip=skip, limit=limit, cursor=cursor)
 
-    def search_devices(self, query: str, skip: int = 0, limit: int = 100) -> list[Device]:
-        return self.device_repo.search_by_text(query, ['name', 'description', 'serial_number'], skip=skip, limit=limit)
+    def search_devices(self, query: str, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                       cursor: Optional[str] = None) -> list[Device]:
+        return self.device_repo.search_devices_by_user(current_user_id, query, skip=skip, limit=limit, cursor=cursor)
 
     def create_device(self, device_in: DeviceCreate, current_user_id: uuid.UUID, tag_ids: list[uuid.UUID] = []) -> Device:
-        project = self.project_repo.get_by_id(device_in.project_id)
-        if not project or project.user_id != current_user_id:
+        project = self.project_repo.get_by_id_for_user(device_in.project_id, current_user_id)
+        if not project:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Project not found or not authorized to add devices to it")
 
         if self.device_repo.get_by_serial_number(device_in.serial_number):
@@ -41,38 +60,35 @@ class DeviceService:
 
         new_device = self.device_repo.create(device_in.model_dump())
 
-        for tag_id in tag_ids:
-            tag = self.tag_repo.get_by_id(tag_id)
-            if not tag:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tag with ID {tag_id} not found.")
+        for tag in self.tag_service.get_tags(tag_ids):
             new_device.tags.append(tag)
 
         return new_device
 
     def update_device(self, device_id: uuid.UUID, device_in: DeviceUpdate, current_user_id: uuid.UUID) -> Device:
-        device = self.get_device(device_id)
-        if device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this device")
+        device = self.get_device_for_user(device_id, current_user_id, "Not authorized to update this device")
 
+        # O número de série antigo pode deixar de existir ou mudar de dono
+        invalidate_device_resolution(device.serial_number)
         updated_device = self.device_repo.update(device, device_in.model_dump(exclude_unset=True))
         return updated_device
 
     def delete_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID):
-        device = self.get_device(device_id)
-        if device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this device")
+        device = self.get_device_for_user(device_id, current_user_id, "Not authorized to delete this device")
 
+        invalidate_device_resolution(device.serial_number, device.id)
         self.device_repo.delete(device)
 
+    def get_device_tags(self, device_id: uuid.UUID, current_user_id: uuid.UUID) -> list[Tag]:
+        device = self.get_device_for_user(device_id, current_user_id, "Not authorized to access this device's tags",
+                                          options=loading.DEVICE_TAGS)
+        return device.tags
+
     def add_tags_to_device(self, device_id: uuid.UUID, tag_ids: list[uuid.UUID], current_user_id: uuid.UUID) -> Device:
-        device = self.get_device(device_id)
-        if device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to modify this device")
+        device = self.get_device_for_user(device_id, current_user_id, "Not authorized to modify this device",
+                                          options=loading.DEVICE_TAGS)
 
-        for tag_id in tag_ids:
-            tag = self.tag_repo.get_by_id(tag_id)
-            if not tag:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tag with ID {tag_id} not found.")
+        for tag in self.tag_service.get_tags(tag_ids):
             if tag not in device.tags:
                 device.tags.append(tag)
         updated_device = self.device_repo.update(device, {})
@@ -80,9 +96,8 @@ class DeviceService:
 
 
     def remove_tags_from_device(self, device_id: uuid.UUID, tag_ids: list[uuid.UUID], current_user_id: uuid.UUID) -> Device:
-        device = self.get_device(device_id)
-        if device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to modify this device")
+        device = self.get_device_for_user(device_id, current_user_id, "Not authorized to modify this device",
+                                          options=loading.DEVICE_TAGS)
 
         for tag_id in tag_ids:
             tag_to_remove = next((t for t in device.tags if t.id == tag_id), None)
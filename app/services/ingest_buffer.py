@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import deque
+from sqlalchemy.exc import SQLAlchemyError
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.sensor_data import SensorDataRepository
+
+logger = logging.getLogger(__name__)
+
+class IngestBuffer:
+    """
+    Buffer de escrita assíncrona (write-behind) para leituras de sensores.
+    As rotas de ingestão enfileiram linhas já validadas em uma fila limitada em memória
+    e uma thread de fundo as grava em lotes no SensorData, ao atingir flush_batch_size
+    linhas ou a cada flush_interval segundos, o que ocorrer primeiro.
+    """
+    def __init__(self, max_size: int, flush_batch_size: int, flush_interval: float, session_factory=SessionLocal):
+        self.max_size = max_size
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+        self.session_factory = session_factory
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self._total_flush_seconds = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="ingest-buffer-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """Para a thread de flush depois de esvaziar a fila."""
+        if not self.is_running:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def put_many(self, rows: list[dict]) -> bool:
+        """
+        Enfileira todas as linhas ou nenhuma. Retorna False (e contabiliza as linhas como
+        descartadas) se a fila não tiver espaço para o lote inteiro.
+        """
+        with self._condition:
+            if self._stopping or len(self._queue) + len(rows) > self.max_size:
+                self.dropped += len(rows)
+                return False
+            self._queue.extend(rows)
+            self.enqueued += len(rows)
+            if len(self._queue) >= self.flush_batch_size:
+                self._condition.notify()
+        return True
+
+    def metrics(self) -> dict:
+        with self._condition:
+            queue_depth = len(self._queue)
+        return {
+            "running": self.is_running,
+            "queue_depth": queue_depth,
+            "max_size": self.max_size,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "avg_flush_seconds": self._total_flush_seconds / self.flush_count if self.flush_count else 0.0,
+        }
+
+    def _take_batch(self) -> list[dict]:
+        with self._condition:
+            if len(self._queue) < self.flush_batch_size and not self._stopping:
+                self._condition.wait(self.flush_interval)
+            size = min(len(self._queue), self.flush_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+            with self._condition:
+                if self._stopping and not self._queue:
+                    return
+
+    def _flush(self, rows: list[dict]):
+        started = time.perf_counter()
+        if not self._insert(rows):
+            # Uma linha inválida (ex.: sensor removido depois de enfileirado) derruba o lote
+            # inteiro; regrava por sensor para perder apenas as linhas do sensor afetado.
+            by_sensor = {}
+            for row in rows:
+                by_sensor.setdefault(row["sensor_id"], []).append(row)
+            for sensor_rows in by_sensor.values():
+                if not self._insert(sensor_rows):
+                    self.dropped += len(sensor_rows)
+                    logger.error("%d leituras do sensor %s descartadas pelo buffer de ingestão",
+                                 len(sensor_rows), sensor_rows[0]["sensor_id"])
+
+        elapsed = time.perf_counter() - started
+        self.flush_count += 1
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self._total_flush_seconds += elapsed
+
+    def _insert(self, rows: list[dict]) -> bool:
+        db = self.session_factory()
+        try:
+            inserted = SensorDataRepository(db).bulk_insert(rows)
+            db.commit()
+            self.flushed += len(inserted)
+            self.duplicates += len(rows) - len(inserted)
+            return True
+        except SQLAlchemyError:
+            db.rollback()
+            self.flush_errors += 1
+            logger.exception("Erro ao gravar lote de %d leituras do buffer de ingestão", len(rows))
+            return False
+        finally:
+            db.close()
+
+ingest_buffer = IngestBuffer(
+    max_size=settings.INGEST_BUFFER_MAX_SIZE,
+    flush_batch_size=settings.INGEST_FLUSH_BATCH_SIZE,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL_SECONDS,
+)
@@ -0,0 +1,222 @@
+import logging
+import uuid
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core.binary_format import TIMESTAMP_MS_MAX, TIMESTAMP_MS_MIN, BinaryPayload
+from app.db.models import Sensor
+from app.schemas.sensor_data import SensorReading
+from app.repositories.device import DeviceRepository
+from app.repositories.sensor import SensorRepository
+from app.repositories.sensor_data import SensorDataRepository
+from app.services.ingest_buffer import ingest_buffer
+from fastapi import HTTPException, status
+
+SENSOR_NAME_MAX_LENGTH = Sensor.__table__.c.name.type.length
+UNIT_MAX_LENGTH = Sensor.__table__.c.unit_of_measurement.type.length
+
+logger = logging.getLogger(__name__)
+
+class IngestService:
+    """
+    Motor de ingestão em lote: resolve todos os sensores de um payload com uma consulta,
+    cria os que faltam com um único INSERT e grava todas as leituras com um INSERT
+    multi-linha, tudo em uma única transação.
+    """
+    def __init__(self, db: Session):
+        self.db = db
+        self.device_repo = DeviceRepository(db)
+        self.sensor_repo = SensorRepository(db)
+        self.sensor_data_repo = SensorDataRepository(db)
+
+    def resolve_device(self, serial_number: str) -> Row:
+        device = self.device_repo.resolve_serial_number(serial_number)
+        if not device:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Device with serial number '{serial_number}' not found."
+            )
+        return device
+
+    def resolve_sensors(self, device_id: uuid.UUID, sensors: dict[str, str | None]) -> tuple[dict[str, uuid.UUID], dict[str, str]]:
+        """
+        Recebe nome -> unidade de medida dos sensores citados no payload.
+        Retorna (nome -> sensor_id, nome -> erro). Sensores inexistentes são criados
+        dinamicamente em um único INSERT; nomes inválidos são reportados como erro.
+        """
+        sensor_ids = self.sensor_repo.get_ids_by_names_and_device(list(sensors), device_id)
+
+        name_errors = {}
+        to_create = []
+        for name, unit in sensors.items():
+            if name in sensor_ids:
+                continue
+            if not name or len(name) > SENSOR_NAME_MAX_LENGTH:
+                name_errors[name] = f"Sensor name must have between 1 and {SENSOR_NAME_MAX_LENGTH} characters."
+            elif unit and len(unit) > UNIT_MAX_LENGTH:
+                name_errors[name] = f"Unit of measurement must have at most {UNIT_MAX_LENGTH} characters."
+            else:
+                to_create.append({"name": name, "unit_of_measurement": unit, "device_id": device_id})
+
+        created = self.sensor_repo.create_many(to_create)
+        for name, sensor_id in created.items():
+            logger.info("Sensor '%s' criado (ID: %s) para o dispositivo '%s'.", name, sensor_id, device_id)
+        sensor_ids.update(created)
+        # Os que ficaram de fora foram criados por uma ingestão simultânea: lidos de novo
+        lost = [obj["name"] for obj in to_create if obj["name"] not in created]
+        if lost:
+            sensor_ids.update(self.sensor_repo.get_ids_by_names_and_device(lost, device_id))
+        return sensor_ids, name_errors
+
+    def prepare_rows(self, device: Row, serial_number: str, readings: list[SensorReading]) -> tuple[list[dict], list[str]]:
+        """
+        Resolve (e cria, se preciso) os sensores e monta as linhas de SensorData a gravar.
+        Retorna (linhas, erros por leitura). Não faz commit.
+        """
+        sensors = {}
+        for reading in readings:
+            sensors.setdefault(reading.sensor_name_or_id, reading.unit_of_measurement)
+        sensor_ids, name_errors = self.resolve_sensors(device.id, sensors)
+
+        errors = []
+        rows = []
+        # Leituras sem timestamp recebem o horário de recebimento do lote; o deslocamento
+        # em microssegundos evita que duas delas colidam na chave (sensor_id, timestamp).
+        received_at = datetime.utcnow()
+        for offset, reading in enumerate(readings):
+            name = reading.sensor_name_or_id
+            if name in name_errors:
+                errors.append(f"Leitura '{name}' (Disp: {serial_number}): {name_errors[name]}")
+                continue
+            rows.append({
+                "sensor_id": sensor_ids[name],
+                "value": reading.value,
+                "timestamp": reading.timestamp if reading.timestamp else received_at + timedelta(microseconds=offset),
+            })
+        return rows, errors
+
+    def prepare_binary_rows(self, device: Row, payload: BinaryPayload) -> tuple[list[dict], list[str]]:
+        """
+        Versão de prepare_rows para o formato binário: as leituras chegam como um array
+        estruturado do NumPy e são validadas e convertidas de forma vetorizada, sem
+        construir um SensorReading por leitura.
+        """
+        serial_number = payload.device_serial_number
+        names = payload.sensor_names
+        sensor_ids, name_errors = self.resolve_sensors(device.id, dict.fromkeys(names))
+
+        readings = payload.readings
+        sensor_index = readings["sensor_index"]
+        values = readings["value"]
+        # Tabela índice -> sensor_id; a última posição (None) recebe os índices inválidos
+        id_table = np.array([sensor_ids.get(name) for name in names] + [None], dtype=object)
+        safe_index = np.where(sensor_index < len(names), sensor_index, len(names))
+        resolved = id_table[safe_index]
+
+        timestamp_ms = readings["timestamp_ms"]
+        # Fora do intervalo a conversão para datetime64 estoura ou não vira datetime
+        timestamp_ok = (timestamp_ms >= TIMESTAMP_MS_MIN) & (timestamp_ms < TIMESTAMP_MS_MAX)
+        valid = np.isfinite(values) & np.not_equal(resolved, None) & timestamp_ok
+        errors = []
+        for i in np.flatnonzero(~valid).tolist():
+            index = int(sensor_index[i])
+            if index >= len(names):
+                reason = f"Sensor index {index} out of range."
+            elif not np.isfinite(values[i]):
+                reason = "Value must be a finite number."
+            elif not timestamp_ok[i]:
+                reason = "Timestamp out of range."
+            else:
+                reason = name_errors[names[index]]
+            errors.append(f"Leitura #{i} (Disp: {serial_number}): {reason}")
+
+        timestamps = timestamp_ms[valid].astype("datetime64[ms]").astype("datetime64[us]").tolist()
+        rows = [
+            {"sensor_id": sensor_id, "value": value, "timestamp": timestamp}
+            for sensor_id, value, timestamp in zip(resolved[valid].tolist(), values[valid].tolist(), timestamps)
+        ]
+        return rows, errors
+
+    def write_rows(self, rows: list[dict]) -> tuple[list[Row], int]:
+        """
+        Grava as linhas preparadas com um INSERT multi-linha e faz commit.
+        Retorna (linhas inseridas, quantidade de duplicadas ignoradas).
+        """
+        inserted = self.sensor_data_repo.bulk_insert(rows)
+        self.db.commit()
+        return inserted, len(rows) - len(inserted)
+
+    def buffer_rows(self, rows: list[dict]):
+        """
+        Modo write-behind: confirma os sensores criados durante a preparação e enfileira
+        as linhas no ingest_buffer para gravação em lote pela thread de fundo.
+        """
+        self.db.commit()
+        if not ingest_buffer.put_many(rows):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Ingest buffer is full, retry later.",
+                headers={"Retry-After": "1"},
+            )
+
+    def ingest_readings(self, serial_number: str, readings: list[SensorReading]) -> tuple[list[Row], int, list[str]]:
+        """
+        Ingere as leituras de um dispositivo em uma única transação.
+        Retorna (linhas inseridas, duplicadas ignoradas, erros por leitura). Erros de
+        validação afetam apenas a leitura correspondente; uma falha do banco reverte o
+        lote inteiro. Leituras já gravadas (mesmo sensor e timestamp) contam como
+        duplicadas, então um gateway pode reenviar o lote com segurança.
+        """
+        device = self.resolve_device(serial_number)
+        return self.ingest_for_device(device, serial_number, readings)
+
+    def ingest_for_device(self, device: Row, serial_number: str, readings: list[SensorReading]) -> tuple[list[Row], int, list[str]]:
+        """Igual a ingest_readings, para um dispositivo já resolvido por resolve_device."""
+        try:
+            rows, errors = self.prepare_rows(device, serial_number, readings)
+            inserted, duplicates = self.write_rows(rows)
+            return inserted, duplicates, errors
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.exception("Erro ao gravar %d leituras do dispositivo '%s'", len(readings), serial_number)
+            errors = [
+                f"Leitura '{r.sensor_name_or_id}' (Disp: {serial_number}): Erro inesperado - {str(e)}"
+                for r in readings
+            ]
+            return [], 0, errors
+
+    def ingest_binary(self, payload: BinaryPayload) -> tuple[list[Row], int, list[str]]:
+        """Ingere um payload no formato binário compacto (ver app.core.binary_format)."""
+        device = self.resolve_device(payload.device_serial_number)
+        try:
+            rows, errors = self.prepare_binary_rows(device, payload)
+            inserted, duplicates = self.write_rows(rows)
+            return inserted, duplicates, errors
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.exception("Erro ao gravar %d leituras binárias do dispositivo '%s'", len(payload.readings),
+                             payload.device_serial_number)
+            return [], 0, [f"Disp: {payload.device_serial_number}: Erro inesperado ao gravar {len(payload.readings)} leituras - {str(e)}"]
+
+    def buffer_readings(self, serial_number: str, readings: list[SensorReading]) -> tuple[int, list[str]]:
+        """
+        Modo write-behind: valida o payload, resolve os sensores (criando os que faltam)
+        e enfileira as leituras. Retorna (leituras aceitas, erros por leitura).
+        """
+        device = self.resolve_device(serial_number)
+        return self.buffer_for_device(device, serial_number, readings)
+
+    def buffer_for_device(self, device: Row, serial_number: str, readings: list[SensorReading]) -> tuple[int, list[str]]:
+        """Igual a buffer_readings, para um dispositivo já resolvido por resolve_device."""
+        rows, errors = self.prepare_rows(device, serial_number, readings)
+        self.buffer_rows(rows)
+        return len(rows), errors
+
+    def buffer_binary(self, payload: BinaryPayload) -> tuple[int, list[str]]:
+        """Modo write-behind para o formato binário compacto."""
+        device = self.resolve_device(payload.device_serial_number)
+        rows, errors = self.prepare_binary_rows(device, payload)
+        self.buffer_rows(rows)
+        return len(rows), errors
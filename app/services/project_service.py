@@ -1,31 +1,100 @@
+import hashlib
 import uuid
+from typing import Optional, Sequence
 from sqlalchemy.orm import Session
 from app.db.models import Project, Tag
 from app.schemas.project import ProjectCreate, ProjectUpdate
+from app.schemas.snapshot import ProjectSnapshot
 from app.repositories.project import ProjectRepository
-from app.repositories.tag import TagRepository
+from app.repositories.sensor_data_watermark import SensorDataWatermarkRepository
+from app.core.cache import invalidate_device_resolution
+from app.db import loading
+from app.services.tag_service import TagService
 from fastapi import HTTPException, status
 
 
 class ProjectService:
     def __init__(self, db: Session):
         self.project_repo = ProjectRepository(db)
-        self.tag_repo = TagRepository(db)
+        self.tag_service = TagService(db)
+        self.watermark_repo = SensorDataWatermarkRepository(db)
 
-    def get_project(self, project_id: uuid.UUID) -> Project:
-        project = self.project_repo.get_by_id(project_id)
+    def get_project(self, project_id: uuid.UUID, options: Sequence = ()) -> Project:
+        project = self.project_repo.get_by_id(project_id, options=options)
         if not project:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
         return project
 
+    def get_snapshot_etag(self, project_id: uuid.UUID, current_user_id: uuid.UUID) -> str:
+        """
+        ETag do snapshot do projeto, calculado com uma consulta (veja SNAPSHOT_VERSION) e sem
+        carregar a árvore: se o cliente já tem esta versão, a resposta é um 304.
+        """
+        version = self.project_repo.get_snapshot_version(project_id)
+        if not version or version.user_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Project not found or not authorized to access it")
+        return '"' + hashlib.sha1(repr(tuple(version)).encode()).hexdigest() + '"'
+
+    def get_snapshot(self, project_id: uuid.UUID) -> ProjectSnapshot:
+        """
+        Projeto, tags, dispositivos (com status e tags) e sensores com a leitura mais recente,
+        com um número fixo de consultas: a árvore por selectinload e as leituras das marcas d'água.
+        """
+        project = self.project_repo.get_with_tree(project_id)
+        if not project:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+        sensor_ids = [sensor.id for device in project.devices for sensor in device.sensors]
+        watermarks = self.watermark_repo.get_by_sensor_ids(sensor_ids)
+
+        def latest(sensor_id: uuid.UUID):
+            watermark = watermarks.get(sensor_id)
+            if watermark is None or watermark.latest_id is None:
+                return None
+            return {"id": watermark.latest_id, "sensor_id": sensor_id, "value": watermark.latest_value, "timestamp": watermark.latest_timestamp}
+
+        return ProjectSnapshot(
+            id=project.id,
+            name=project.name,
+            description=project.description,
+            user_id=project.user_id,
+            created_at=project.created_at,
+            updated_at=project.updated_at,
+            tags=project.tags,
+            devices=[
+                {
+                    "id": device.id,
+                    "name": device.name,
+                    "description": device.description,
+                    "serial_number": device.serial_number,
+                    "device_type": device.device_type,
+                    "status": device.status,
+                    "updated_at": device.updated_at,
+                    "tags": device.tags,
+                    "sensors": [
+                        {
+                            "id": sensor.id,
+                            "name": sensor.name,
+                            "unit_of_measurement": sensor.unit_of_measurement,
+                            "min_value": sensor.min_value,
+                            "max_value": sensor.max_value,
+                            "latest": latest(sensor.id),
+                        }
+                        for sensor in sorted(device.sensors, key=lambda s: s.name)
+                    ],
+                }
+                for device in sorted(project.devices, key=lambda d: d.name)
+            ],
+        )
+
     def get_all_projects(self, skip: int = 0, limit: int = 100) -> list[Project]:
         return self.project_repo.get_all(skip=skip, limit=limit)
 
-    def get_projects_by_user(self, user_id: uuid.UUID, skip: int = 0, limit: int = 100) -> list[Project]:
-        return self.project_repo.get_projects_by_user(user_id, skip=skip, limit=limit)
+    def get_projects_by_user(self, user_id: uuid.UUID, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> list[Project]:
+        return self.project_repo.get_projects_by_user(user_id, skip=skip, limit=limit, cursor=cursor)
 
-    def search_projects(self, query: str, skip: int = 0, limit: int = 100) -> list[Project]:
-        return self.project_repo.search_by_text(query, ['name', 'description'], skip=skip, limit=limit)
+    def search_projects(self, query: str, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                        cursor: Optional[str] = None) -> list[Project]:
+        return self.project_repo.search_projects_by_user(current_user_id, query, skip=skip, limit=limit, cursor=cursor)
 
     def create_project(self, project_in: ProjectCreate, current_user_id: uuid.UUID, tag_ids: list[uuid.UUID] = []) -> Project:
         project_data = project_in.model_dump()
@@ -33,10 +102,7 @@ class ProjectService:
 
         new_project = self.project_repo.create(project_data)
 
-        for tag_id in tag_ids:
-            tag = self.tag_repo.get_by_id(tag_id)
-            if not tag:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tag with ID {tag_id} not found.")
+        for tag in self.tag_service.get_tags(tag_ids):
             new_project.tags.append(tag)
 
         return new_project
@@ -47,27 +113,30 @@ class ProjectService:
         if project.user_id != current_user_id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this project")
 
-        with self.project_repo.db.begin_nested():
-            updated_project = self.project_repo.update(project, project_in.model_dump(exclude_unset=True))
-            return updated_project
+        return self.project_repo.update(project, project_in.model_dump(exclude_unset=True))
 
     def delete_project(self, project_id: uuid.UUID, current_user_id: uuid.UUID):
         project = self.get_project(project_id)
         if project.user_id != current_user_id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this project")
 
-        with self.project_repo.db.begin_nested():
-            self.project_repo.delete(project)
+        # Os dispositivos do projeto são removidos em cascata
+        for device in project.devices:
+            invalidate_device_resolution(device.serial_number, device.id)
+        self.project_repo.delete(project)
+
+    def get_project_tags(self, project_id: uuid.UUID, current_user_id: uuid.UUID) -> list[Tag]:
+        project = self.get_project(project_id, options=loading.PROJECT_TAGS)
+        if project.user_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this project's tags")
+        return project.tags
 
     def add_tags_to_project(self, project_id: uuid.UUID, tag_ids: list[uuid.UUID], current_user_id: uuid.UUID) -> Project:
-        project = self.get_project(project_id)
+        project = self.get_project(project_id, options=loading.PROJECT_TAGS)
         if project.user_id != current_user_id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to modify this project")
 
-        for tag_id in tag_ids:
-            tag = self.tag_repo.get_by_id(tag_id)
-            if not tag:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tag with ID {tag_id} not found.")
+        for tag in self.tag_service.get_tags(tag_ids):
             if tag not in project.tags:
                 project.tags.append(tag)
         updated_project = self.project_repo.update(project, {})
@@ -75,7 +144,7 @@ class ProjectService:
 
 
     def remove_tags_from_project(self, project_id: uuid.UUID, tag_ids: list[uuid.UUID], current_user_id: uuid.UUID) -> Project:
-        project = self.get_project(project_id)
+        project = self.get_project(project_id, options=loading.PROJECT_TAGS)
         if project.user_id != current_user_id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to modify this project")
 
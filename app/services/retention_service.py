@@ -0,0 +1,148 @@
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.core.jobs import PeriodicJob
+from app.db.models import RetentionPolicy, SensorDataRollupDaily, SensorDataRollupHourly, SensorDataRollupMinute
+from app.db.locks import try_advisory_lock
+from app.db.session import SessionLocal
+from app.repositories.project import ProjectRepository
+from app.repositories.retention_policy import RetentionPolicyRepository
+from app.repositories.sensor import SensorRepository
+from app.repositories.sensor_data import SensorDataRepository
+from app.repositories.sensor_data_archive import SensorDataArchiveRepository
+from app.repositories.sensor_data_rollup import SensorDataRollupRepository
+from app.repositories.sensor_data_watermark import SensorDataWatermarkRepository
+from app.services.archive_service import delete_archives
+from app.schemas.retention import RetentionPolicyCreate, RetentionPolicyUpdate
+
+# Chave do advisory lock: apenas um worker aplica as políticas por vez
+RETENTION_LOCK_KEY = 0x5E4502
+
+logger = logging.getLogger(__name__)
+
+class RetentionService:
+    def __init__(self, db: Session):
+        self.policy_repo = RetentionPolicyRepository(db)
+        self.project_repo = ProjectRepository(db)
+        self.sensor_repo = SensorRepository(db)
+
+    @staticmethod
+    def _validate_days(raw_retention_days: int | None, rollup_retention_days: int | None):
+        if raw_retention_days is not None and raw_retention_days <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="raw_retention_days must be greater than zero.")
+        if rollup_retention_days is not None and rollup_retention_days <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="rollup_retention_days must be greater than zero.")
+
+    def get_policy(self, policy_id: uuid.UUID, current_user_id: uuid.UUID) -> RetentionPolicy:
+        row = self.policy_repo.get_with_owner(policy_id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Retention policy not found")
+        policy, owner_id = row
+        if owner_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this retention policy")
+        return policy
+
+    def get_policies_by_user(self, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                             cursor: Optional[str] = None) -> list[RetentionPolicy]:
+        return self.policy_repo.get_policies_by_user(current_user_id, skip=skip, limit=limit, cursor=cursor)
+
+    def create_policy(self, policy_in: RetentionPolicyCreate, current_user_id: uuid.UUID) -> RetentionPolicy:
+        if (policy_in.project_id is None) == (policy_in.sensor_id is None):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide exactly one of 'project_id' or 'sensor_id'.")
+        self._validate_days(policy_in.raw_retention_days, policy_in.rollup_retention_days)
+
+        if policy_in.project_id is not None:
+            project = self.project_repo.get_by_id_for_user(policy_in.project_id, current_user_id)
+            if not project:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Project not found or not authorized")
+            existing = self.policy_repo.get_by_project(policy_in.project_id)
+        else:
+            sensor = self.sensor_repo.get_by_id_for_user(policy_in.sensor_id, current_user_id)
+            if not sensor:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Sensor not found or not authorized")
+            existing = self.policy_repo.get_by_sensor(policy_in.sensor_id)
+        if existing:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A retention policy already exists for this scope.")
+
+        return self.policy_repo.create(policy_in.model_dump())
+
+    def update_policy(self, policy_id: uuid.UUID, policy_in: RetentionPolicyUpdate, current_user_id: uuid.UUID) -> RetentionPolicy:
+        policy = self.get_policy(policy_id, current_user_id)
+        update_data = policy_in.model_dump(exclude_unset=True)
+        if update_data.get("raw_retention_days", policy.raw_retention_days) is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="raw_retention_days cannot be null.")
+        self._validate_days(update_data.get("raw_retention_days"), update_data.get("rollup_retention_days"))
+        return self.policy_repo.update(policy, update_data)
+
+    def delete_policy(self, policy_id: uuid.UUID, current_user_id: uuid.UUID):
+        policy = self.get_policy(policy_id, current_user_id)
+        self.policy_repo.delete(policy)
+
+def apply_retention_policies(session_factory=SessionLocal) -> dict:
+    """
+    Aplica as políticas de retenção: para cada sensor com política, as leituras brutas
+    mais antigas que raw_retention_days são removidas em lotes de RETENTION_BATCH_SIZE,
+    cada um em sua própria transação curta e com lock_timeout, para não segurar locks
+    nem gerar um DELETE gigante. Os rollups já contêm essas leituras desde a ingestão.
+    No mesmo prazo saem os arquivos do tier frio e os rollups por minuto; os rollups por
+    hora e por dia saem após rollup_retention_days, se definido.
+    """
+    report = {"sensors": 0, "rows_deleted": 0, "bytes_reclaimed": 0, "archives_deleted": 0, "rollup_rows_deleted": 0, "errors": 0}
+    db = session_factory()
+    try:
+        with try_advisory_lock(db.get_bind(), RETENTION_LOCK_KEY) as acquired:
+            if not acquired:
+                report["skipped"] = "another worker is applying retention policies"
+                return report
+            policies = RetentionPolicyRepository(db).get_effective_policies()
+            db.commit()
+            sensor_data_repo = SensorDataRepository(db)
+            archive_repo = SensorDataArchiveRepository(db)
+            rollup_repo = SensorDataRollupRepository(db)
+            watermark_repo = SensorDataWatermarkRepository(db)
+            now = datetime.utcnow()
+            for policy in policies:
+                report["sensors"] += 1
+                try:
+                    raw_cutoff = now - timedelta(days=policy.raw_retention_days)
+                    while True:
+                        db.execute(text("SELECT set_config('lock_timeout', :timeout, true)"), {"timeout": settings.RETENTION_LOCK_TIMEOUT})
+                        rows, size = sensor_data_repo.expire_batch(policy.sensor_id, raw_cutoff, settings.RETENTION_BATCH_SIZE)
+                        db.commit()
+                        report["rows_deleted"] += rows
+                        report["bytes_reclaimed"] += size
+                        if rows < settings.RETENTION_BATCH_SIZE:
+                            break
+
+                    # Leituras já movidas para o tier frio seguem o mesmo prazo
+                    expired_archives = archive_repo.get_before(policy.sensor_id, raw_cutoff)
+                    report["bytes_reclaimed"] += delete_archives(db, expired_archives)
+                    report["archives_deleted"] += len(expired_archives)
+
+                    report["rollup_rows_deleted"] += rollup_repo.delete_before([SensorDataRollupMinute], policy.sensor_id, raw_cutoff)
+                    if policy.rollup_retention_days:
+                        rollup_cutoff = now - timedelta(days=policy.rollup_retention_days)
+                        deleted = rollup_repo.delete_before(
+                            [SensorDataRollupHourly, SensorDataRollupDaily], policy.sensor_id, rollup_cutoff
+                        )
+                        if deleted:
+                            # Médias diárias/semanais/mensais desses períodos mudam: invalida o cache
+                            watermark_repo.bump_revision([policy.sensor_id])
+                        report["rollup_rows_deleted"] += deleted
+                    db.commit()
+                except SQLAlchemyError:
+                    # Ex.: lock_timeout estourado; o sensor é retomado na próxima execução
+                    db.rollback()
+                    report["errors"] += 1
+                    logger.exception("Erro ao aplicar retenção no sensor %s", policy.sensor_id)
+    finally:
+        db.close()
+    return report
+
+retention_job = PeriodicJob("sensor-data-retention", settings.RETENTION_INTERVAL_SECONDS, apply_retention_policies)
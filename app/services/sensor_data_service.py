@@ -1,8 +1,12 @@
 import uuid
 from datetime import datetime
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from app.core import downsampling
+from app.core.config import settings
 from app.db.models import SensorData, Sensor
-from app.schemas.sensor_data import SensorDataCreate
+from app.schemas.sensor_data import SensorDataCreate, SensorDataSeries
 from app.repositories.sensor_data import SensorDataRepository
 from app.repositories.sensor import SensorRepository
 from fastapi import HTTPException, status
@@ -18,26 +22,74 @@ class SensorDataService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sensor data not found")
         return data
 
+    def get_sensor_data_for_user(self, data_id: uuid.UUID, current_user_id: uuid.UUID,
+                                 detail: str = "Not authorized to access this sensor data") -> SensorData:
+        """Leitura do usuário, em uma consulta: 404 se não existe, 403 (com `detail`) se é de outro usuário."""
+        row = self.sensor_data_repo.get_with_owner(data_id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sensor data not found")
+        data, owner_id = row
+        if owner_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return data
+
     def get_all_sensor_data(self, skip: int = 0, limit: int = 100) -> list[SensorData]:
         return self.sensor_data_repo.get_all(skip=skip, limit=limit)
 
-    def get_data_by_sensor(self, sensor_id: uuid.UUID, current_user_id: uuid.UUID, start_time: datetime = None, end_time: datetime = None, skip: int = 0, limit: int = 100) -> list[SensorData]:
-        sensor = self.sensor_repo.get_by_id(sensor_id)
-        if not sensor or sensor.device.project.user_id != current_user_id:
+    def get_data_by_sensor(self, sensor_id: uuid.UUID, current_user_id: uuid.UUID, start_time: datetime = None, end_time: datetime = None,
+                           skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> list[SensorData]:
+        sensor = self.sensor_repo.get_by_id_for_user(sensor_id, current_user_id)
+        if not sensor:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Sensor not found or not authorized to access its data")
-        return self.sensor_data_repo.get_data_by_sensor(sensor_id, start_time, end_time, skip=skip, limit=limit)
+        return self.sensor_data_repo.get_data_by_sensor(sensor_id, start_time, end_time, skip=skip, limit=limit, cursor=cursor)
+
+    def get_series(self, sensor_id: uuid.UUID, current_user_id: uuid.UUID, start_time: datetime, end_time: datetime, points: int, method: str) -> SensorDataSeries:
+        """
+        Série do sensor em [start_time, end_time) reduzida a no máximo `points` pontos, por
+        LTTB ou por mínimo/máximo de cada bucket de tempo (veja app/core/downsampling.py).
+        """
+        sensor = self.sensor_repo.get_by_id_for_user(sensor_id, current_user_id)
+        if not sensor:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Sensor not found or not authorized to access its data")
+        if start_time >= end_time:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_time must be before end_time.")
+        if method not in ("lttb", "minmax"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="method must be 'lttb' or 'minmax'.")
+        if points > settings.SERIES_MAX_POINTS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"points must be at most {settings.SERIES_MAX_POINTS}.")
+
+        timestamps, values = self.sensor_data_repo.get_series(sensor_id, start_time, end_time, settings.SERIES_FETCH_SIZE)
+        if method == "lttb":
+            keep = downsampling.lttb(timestamps, values, points)
+        else:
+            keep = downsampling.minmax(timestamps, values, points // 2)
+
+        return SensorDataSeries(
+            sensor_id=sensor_id,
+            start_time=start_time,
+            end_time=end_time,
+            method=method,
+            total_points=len(timestamps),
+            points=[
+                {"timestamp": ts, "value": value}
+                for ts, value in zip(timestamps[keep].astype("datetime64[us]").tolist(), values[keep].tolist())
+            ],
+        )
 
     def create_sensor_data(self, data_in: SensorDataCreate, current_user_id: uuid.UUID) -> SensorData:
-        sensor = self.sensor_repo.get_by_id(data_in.sensor_id)
-        if not sensor or sensor.device.project.user_id != current_user_id:
+        sensor = self.sensor_repo.get_by_id_for_user(data_in.sensor_id, current_user_id)
+        if not sensor:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Sensor not found or not authorized to add data to it")
         
-        new_data = self.sensor_data_repo.create(data_in.model_dump())
+        try:
+            # Sem timestamp, o default do banco (now()) é usado
+            new_data = self.sensor_data_repo.create(data_in.model_dump(exclude_none=True))
+        except IntegrityError:
+            self.sensor_data_repo.db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Sensor data for this sensor and timestamp already exists")
         return new_data
 
     def delete_sensor_data(self, data_id: uuid.UUID, current_user_id: uuid.UUID):
-        data = self.get_sensor_data(data_id)
-        if data.sensor.device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this sensor data")
+        data = self.get_sensor_data_for_user(data_id, current_user_id, "Not authorized to delete this sensor data")
         
         self.sensor_data_repo.delete(data)
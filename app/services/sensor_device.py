@@ -1,11 +1,18 @@
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Optional
 import uuid
-from sqlalchemy import desc, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.db.models import Sensor, Device, SensorData
+from app.db.models import Sensor, Device
 from app.schemas.sensor import SensorCreate, SensorUpdate, SensorWithRecentData
 from app.repositories.sensor import SensorRepository
 from app.repositories.device import DeviceRepository
+from app.repositories.project import ProjectRepository
+from app.repositories.sensor_data import SensorDataRepository
+from app.repositories.sensor_data_watermark import SensorDataWatermarkRepository
+from app.core.cache import aggregate_cache, sensor_resolution_cache
+from app.core.config import settings
+from app.services.aggregation_service import AggregationService, BucketInterval
 from fastapi import HTTPException, status
 
 from app.schemas.sensor_data import SensorDailyAverage, SensorDataOut, SensorMonthlyAverage, SensorWeeklyAverage
@@ -14,6 +21,9 @@ class SensorService:
     def __init__(self, db: Session):
         self.sensor_repo = SensorRepository(db)
         self.device_repo = DeviceRepository(db)
+        self.project_repo = ProjectRepository(db)
+        self.sensor_data_repo = SensorDataRepository(db)
+        self.watermark_repo = SensorDataWatermarkRepository(db)
 
     def get_sensor(self, sensor_id: uuid.UUID) -> Sensor:
         sensor = self.sensor_repo.get_by_id(sensor_id)
@@ -21,152 +31,188 @@ class SensorService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sensor not found")
         return sensor
 
+    def get_sensor_for_user(self, sensor_id: uuid.UUID, current_user_id: uuid.UUID,
+                            detail: str = "Not authorized to access this sensor") -> Sensor:
+        """Sensor do usuário, em uma consulta: 404 se não existe, 403 (com `detail`) se é de outro usuário."""
+        row = self.sensor_repo.get_with_owner(sensor_id)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Sensor not found")
+        sensor, owner_id = row
+        if owner_id != current_user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+        return sensor
+
     def get_all_sensors(self, skip: int = 0, limit: int = 100) -> list[Sensor]:
         return self.sensor_repo.get_all(skip=skip, limit=limit)
 
-    def get_sensors_by_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100) -> list[Sensor]:
-        device = self.device_repo.get_by_id(device_id)
-        if not device or device.project.user_id != current_user_id:
+    def get_sensors_by_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, skip: int = 0, limit: int = 100,
+                              cursor: Optional[str] = None) -> list[Sensor]:
+        device = self.device_repo.get_by_id_for_user(device_id, current_user_id)
+        if not device:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Device not found or not authorized to access its sensors")
-        return self.sensor_repo.get_sensors_by_device(device_id, skip=skip, limit=limit)
+        return self.sensor_repo.get_sensors_by_device(device_id, skip=skip, limit=limit, cursor=cursor)
 
     def create_sensor(self, sensor_in: SensorCreate, current_user_id: uuid.UUID) -> Sensor:
-        device = self.device_repo.get_by_id(sensor_in.device_id)
-        if not device or device.project.user_id != current_user_id:
+        device = self.device_repo.get_by_id_for_user(sensor_in.device_id, current_user_id)
+        if not device:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Device not found or not authorized to add sensors to it")
         
 
-        new_sensor = self.sensor_repo.create(sensor_in.model_dump())
+        try:
+            new_sensor = self.sensor_repo.create(sensor_in.model_dump())
+        except IntegrityError:
+            self.sensor_repo.db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Sensor with this name already exists on this device")
         return new_sensor
 
     def update_sensor(self, sensor_id: uuid.UUID, sensor_in: SensorUpdate, current_user_id: uuid.UUID) -> Sensor:
-        sensor = self.get_sensor(sensor_id)
-        if sensor.device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this sensor")
+        sensor = self.get_sensor_for_user(sensor_id, current_user_id, "Not authorized to update this sensor")
         
-        updated_sensor = self.sensor_repo.update(sensor, sensor_in.model_dump(exclude_unset=True))
+        sensor_resolution_cache.invalidate((sensor.device_id, sensor.name))
+        try:
+            updated_sensor = self.sensor_repo.update(sensor, sensor_in.model_dump(exclude_unset=True))
+        except IntegrityError:
+            self.sensor_repo.db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Sensor with this name already exists on this device")
         return updated_sensor
 
     def delete_sensor(self, sensor_id: uuid.UUID, current_user_id: uuid.UUID):
-        sensor = self.get_sensor(sensor_id)
-        if sensor.device.project.user_id != current_user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this sensor")
+        sensor = self.get_sensor_for_user(sensor_id, current_user_id, "Not authorized to delete this sensor")
         
+        sensor_resolution_cache.invalidate((sensor.device_id, sensor.name))
         self.sensor_repo.delete(sensor)
 
     def get_recent_sensor_data_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, limit: int = 1) -> List[SensorWithRecentData]:
         """
-        Retorna os N dados mais recentes de todos os sensores de um dispositivo específico.
+        Retorna os N dados mais recentes de todos os sensores de um dispositivo específico,
+        com uma única consulta (veja SensorDataRepository.get_latest_in_scope).
         """
-        device = self.device_repo.get_by_id(device_id)
-        if not device or device.project.user_id != current_user_id:
+        device = self.device_repo.get_by_id_for_user(device_id, current_user_id)
+        if not device:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Device not found or not authorized to access its sensor data.")
-        
-        sensors_with_data = []
-        sensors = self.sensor_repo.get_sensors_by_device(device_id)
-        
-        for sensor in sensors:
-            # Query para os N dados mais recentes
-            recent_data = self.sensor_repo.db.query(SensorData) \
-                .filter(SensorData.sensor_id == sensor.id) \
-                .order_by(desc(SensorData.timestamp)) \
-                .limit(limit) \
-                .all()
-            
-            # Mapear para SensorDataOut
-            recent_data_out = [SensorDataOut.model_validate(data) for data in recent_data]
-            
-            sensors_with_data.append(
-                SensorWithRecentData(
-                    sensor_id=sensor.id,
-                    sensor_name=sensor.name,
-                    unit_of_measurement=sensor.unit_of_measurement,
-                    recent_data=recent_data_out
+        return self._recent_sensor_data(self.sensor_repo.select_by_device(device_id), limit)
+
+    def get_recent_sensor_data_for_project(self, project_id: uuid.UUID, current_user_id: uuid.UUID, limit: int = 1) -> List[SensorWithRecentData]:
+        """Retorna os N dados mais recentes de todos os sensores de todos os dispositivos de um projeto."""
+        project = self.project_repo.get_by_id_for_user(project_id, current_user_id)
+        if not project:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Project not found or not authorized to access its sensor data")
+        return self._recent_sensor_data(self.sensor_repo.select_by_project(project_id), limit)
+
+    def _recent_sensor_data(self, scope, limit: int) -> List[SensorWithRecentData]:
+        # As linhas vêm ordenadas por sensor: agrupa sem criar objetos ORM
+        sensors_with_data = {}
+        for row in self.sensor_data_repo.get_latest_in_scope(scope, limit):
+            sensor = sensors_with_data.get(row.sensor_id)
+            if sensor is None:
+                sensor = sensors_with_data[row.sensor_id] = SensorWithRecentData(
+                    sensor_id=row.sensor_id,
+                    device_id=row.device_id,
+                    sensor_name=row.sensor_name,
+                    unit_of_measurement=row.unit_of_measurement,
+                    recent_data=[],
                 )
-            )
-        
-        return sensors_with_data
+            if row.id is not None:
+                sensor.recent_data.append(
+                    SensorDataOut(id=row.id, sensor_id=row.sensor_id, value=row.value, timestamp=row.timestamp)
+                )
+        return list(sensors_with_data.values())
 
     # --- NOVOS MÉTODOS DE SERVIÇO PARA MÉDIAS (Parte 2) ---
 
-    def get_daily_averages_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID) -> List[SensorDailyAverage]:
-        device = self.device_repo.get_by_id(device_id)
-        if not device or device.project.user_id != current_user_id:
+    def _device_averages(self, device_id: uuid.UUID, current_user_id: uuid.UUID, interval: str, start_time: Optional[datetime], end_time: Optional[datetime]) -> list[dict]:
+        """
+        Médias por sensor de um dispositivo em buckets de `interval` (1d, 1w ou 1mo), calculadas
+        pelo AggregationService. Buckets de períodos já fechados e inteiramente dentro do
+        intervalo pedido vêm do aggregate_cache enquanto as revisões dos sensores (marcas
+        d'água) não mudarem; só os demais (o bucket aberto e os parciais nas pontas) são
+        recalculados, em uma consulta por trecho contíguo.
+        """
+        device = self.device_repo.get_by_id_for_user(device_id, current_user_id)
+        if not device:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Device not found or not authorized to access its sensor data."
             )
 
-        results = self.sensor_repo.db.query(
-            Sensor.id.label("sensor_id"),
-            Sensor.name.label("sensor_name"),
-            Sensor.unit_of_measurement.label("unit_of_measurement"),
-            func.to_char(SensorData.timestamp, 'YYYY-MM-DD').label("date"),
-            func.avg(SensorData.value).label("average_value")
-        ).join(SensorData, Sensor.id == SensorData.sensor_id) \
-        .filter(Sensor.device_id == device_id) \
-        .group_by(
-            Sensor.id,
-            Sensor.name,
-            Sensor.unit_of_measurement,
-            func.to_char(SensorData.timestamp, 'YYYY-MM-DD')
-        ) \
-        .order_by(Sensor.id, func.to_char(SensorData.timestamp, 'YYYY-MM-DD')) \
-        .all()
-
-        return [SensorDailyAverage.model_validate(r) for r in results]
-
-    def get_weekly_averages_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID) -> List[SensorWeeklyAverage]:
-        device = self.device_repo.get_by_id(device_id)
-        if not device or device.project.user_id != current_user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Device not found or not authorized to access its sensor data."
+        sensors = {sensor.id: sensor for sensor in self.sensor_repo.get_sensors_by_device(device_id, limit=None)}
+        watermarks = self.watermark_repo.get_by_sensor_ids(list(sensors))
+        if not watermarks:
+            return []
+        # Muda quando um sensor é criado/removido ou quando dados de um período fechado mudam
+        signature = tuple(sorted(
+            (sensor_id, watermarks[sensor_id].revision if sensor_id in watermarks else None) for sensor_id in sensors
+        ))
+
+        bucket_interval = BucketInterval(interval)
+        earliest = min(mark.earliest_timestamp for mark in watermarks.values())
+        latest = max(mark.latest_timestamp for mark in watermarks.values()) + timedelta(microseconds=1)
+        lower = max(start_time, earliest) if start_time else earliest
+        upper = min(end_time, latest) if end_time else latest
+        closed_before = datetime.utcnow() - timedelta(seconds=settings.AGGREGATE_CACHE_CLOSE_GRACE_SECONDS)
+
+        averages = {} # bucket -> {sensor_id: média}
+        runs = [] # [início, fim, cacheável] dos trechos contíguos a calcular
+        bucket = bucket_interval.floor(lower)
+        while bucket < upper:
+            bucket_end = bucket_interval.next(bucket)
+            cacheable = (
+                (start_time is None or bucket >= start_time)
+                and (end_time is None or bucket_end <= end_time)
+                and bucket_end <= closed_before
             )
-
-        results = self.sensor_repo.db.query(
-            Sensor.id.label("sensor_id"),
-            Sensor.name.label("sensor_name"),
-            Sensor.unit_of_measurement.label("unit_of_measurement"),
-            func.to_char(func.date_trunc('week', SensorData.timestamp), 'YYYY-MM-DD').label("week_start_date"),
-            func.avg(SensorData.value).label("average_value")
-        ).join(SensorData, Sensor.id == SensorData.sensor_id) \
-        .filter(Sensor.device_id == device_id) \
-        .group_by(
-            Sensor.id,
-            Sensor.name,
-            Sensor.unit_of_measurement,
-            func.date_trunc('week', SensorData.timestamp)
-        ) \
-        .order_by(Sensor.id, func.date_trunc('week', SensorData.timestamp)) \
-        .all()
-
-        return [SensorWeeklyAverage.model_validate(r) for r in results]
-
-    def get_monthly_averages_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID) -> List[SensorMonthlyAverage]:
-        device = self.device_repo.get_by_id(device_id)
-        if not device or device.project.user_id != current_user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Device not found or not authorized to access its sensor data."
+            cached = aggregate_cache.get((device_id, interval, bucket)) if cacheable else None
+            if cached is not None and cached[0] == signature:
+                averages[bucket] = cached[1]
+            elif runs and runs[-1][1] == bucket and runs[-1][2] == cacheable:
+                runs[-1][1] = bucket_end
+            else:
+                runs.append([bucket, bucket_end, cacheable])
+            bucket = bucket_end
+
+        aggregation_service = AggregationService(self.sensor_repo.db)
+        for run_start, run_end, cacheable in runs:
+            # Trechos cacheáveis têm limites alinhados aos buckets, então leem o rollup mais grosso
+            result = aggregation_service.aggregate(
+                list(sensors),
+                bucket_interval,
+                max(run_start, start_time) if start_time else run_start,
+                min(run_end, end_time) if end_time else run_end,
+                ["avg"],
             )
-
-        results = self.sensor_repo.db.query(
-            Sensor.id.label("sensor_id"),
-            Sensor.name.label("sensor_name"),
-            Sensor.unit_of_measurement.label("unit_of_measurement"),
-            func.to_char(SensorData.timestamp, 'YYYY-MM').label("month"),
-            func.avg(SensorData.value).label("average_value")
-        ).join(SensorData, Sensor.id == SensorData.sensor_id) \
-        .filter(Sensor.device_id == device_id) \
-        .group_by(
-            Sensor.id,
-            Sensor.name,
-            Sensor.unit_of_measurement,
-            func.to_char(SensorData.timestamp, 'YYYY-MM')
-        ) \
-        .order_by(Sensor.id, func.to_char(SensorData.timestamp, 'YYYY-MM')) \
-        .all()
-
-        return [SensorMonthlyAverage.model_validate(r) for r in results]
-        
+            computed = {}
+            for row in result["buckets"]:
+                computed.setdefault(row["bucket"], {})[row["sensor_id"]] = row["avg"]
+            averages.update(computed)
+            if cacheable:
+                bucket = run_start
+                while bucket < run_end:
+                    # Buckets sem leituras também são guardados, para não voltarem ao banco
+                    aggregate_cache.set((device_id, interval, bucket), (signature, computed.get(bucket, {})))
+                    bucket = bucket_interval.next(bucket)
+
+        rows = [
+            {
+                "sensor_id": sensor_id,
+                "sensor_name": sensors[sensor_id].name,
+                "unit_of_measurement": sensors[sensor_id].unit_of_measurement,
+                "bucket": bucket,
+                "average_value": average,
+            }
+            for bucket, values in averages.items()
+            for sensor_id, average in values.items()
+        ]
+        rows.sort(key=lambda row: (row["sensor_id"], row["bucket"]))
+        return rows
+
+    def get_daily_averages_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[SensorDailyAverage]:
+        rows = self._device_averages(device_id, current_user_id, "1d", start_time, end_time)
+        return [SensorDailyAverage(date=r["bucket"].strftime("%Y-%m-%d"), **r) for r in rows]
+
+    def get_weekly_averages_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[SensorWeeklyAverage]:
+        rows = self._device_averages(device_id, current_user_id, "1w", start_time, end_time)
+        return [SensorWeeklyAverage(week_start_date=r["bucket"].strftime("%Y-%m-%d"), **r) for r in rows]
+
+    def get_monthly_averages_for_device(self, device_id: uuid.UUID, current_user_id: uuid.UUID, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[SensorMonthlyAverage]:
+        rows = self._device_averages(device_id, current_user_id, "1mo", start_time, end_time)
+        return [SensorMonthlyAverage(month=r["bucket"].strftime("%Y-%m"), **r) for r in rows]
@@ -1,4 +1,5 @@
 import uuid
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.db.models import Tag
 from app.schemas.tag import TagCreate, TagUpdate
@@ -15,11 +16,19 @@ class TagService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
         return tag
 
-    def get_all_tags(self, skip: int = 0, limit: int = 100) -> list[Tag]:
-        return self.tag_repo.get_all(skip=skip, limit=limit)
+    def get_tags(self, tag_ids: list[uuid.UUID]) -> list[Tag]:
+        """Tags da lista, na mesma ordem, buscadas em uma consulta; 404 na primeira que não existe."""
+        tags = {tag.id: tag for tag in self.tag_repo.get_by_ids(tag_ids)}
+        for tag_id in tag_ids:
+            if tag_id not in tags:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Tag with ID {tag_id} not found.")
+        return [tags[tag_id] for tag_id in tag_ids]
 
-    def search_tags(self, query: str, skip: int = 0, limit: int = 100) -> list[Tag]:
-        return self.tag_repo.search_by_text(query, ['name'], skip=skip, limit=limit)
+    def get_all_tags(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> list[Tag]:
+        return self.tag_repo.get_all(skip=skip, limit=limit, cursor=cursor)
+
+    def search_tags(self, query: str, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> list[Tag]:
+        return self.tag_repo.search_by_text(query, skip=skip, limit=limit, cursor=cursor)
 
     def create_tag(self, tag_in: TagCreate) -> Tag:
         if self.tag_repo.get_by_name(tag_in.name):
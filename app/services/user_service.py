@@ -1,9 +1,11 @@
 import uuid
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.db.models import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.repositories.user import UserRepository
 from app.core.security import get_password_hash, verify_password
+from app.core.cache import device_resolution_cache, sensor_resolution_cache
 from fastapi import HTTPException, status
 
 class UserService:
@@ -22,8 +24,8 @@ class UserService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
         return user
 
-    def get_all_users(self, skip: int = 0, limit: int = 100) -> list[User]:
-        return self.user_repo.get_all(skip=skip, limit=limit)
+    def get_all_users(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> list[User]:
+        return self.user_repo.get_all(skip=skip, limit=limit, cursor=cursor)
 
     def create_user(self, user_in: UserCreate) -> User:
         if self.user_repo.get_by_username(user_in.username):
@@ -46,6 +48,9 @@ class UserService:
 
     def delete_user(self, user_id: uuid.UUID):
         user = self.get_user(user_id)
+        # Projetos, dispositivos e sensores do usuário são removidos em cascata
+        device_resolution_cache.clear()
+        sensor_resolution_cache.clear()
         self.user_repo.delete(user)
 
     def authenticate_user(self, username: str, password: str) -> User | None:
@@ -0,0 +1,107 @@
+"""baseline schema
+
+Esquema original, antes criado por Base.metadata.create_all na inicialização da API.
+Tabelas já existentes são mantidas, então bancos criados pelo create_all passam a
+seguir o histórico de migrações sem precisar de "alembic stamp".
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 09:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def _timestamps():
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+    ]
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    def create_table(name, *columns):
+        if name not in existing:
+            op.create_table(name, *columns)
+
+    create_table(
+        "users",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("username", sa.String(50), nullable=False, unique=True),
+        sa.Column("email", sa.String(100), nullable=False, unique=True),
+        sa.Column("hashed_password", sa.String(255), nullable=False),
+        sa.Column("is_active", sa.Boolean()),
+        *_timestamps(),
+    )
+    create_table(
+        "projects",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        *_timestamps(),
+    )
+    create_table(
+        "tags",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(50), nullable=False, unique=True),
+    )
+    create_table(
+        "devices",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("serial_number", sa.String(100), nullable=False, unique=True),
+        sa.Column("device_type", sa.String(50), nullable=False),
+        sa.Column("status", sa.String(20)),
+        sa.Column("project_id", UUID(as_uuid=True), sa.ForeignKey("projects.id", ondelete="CASCADE"), nullable=False),
+        *_timestamps(),
+    )
+    create_table(
+        "project_tags",
+        sa.Column("project_id", UUID(as_uuid=True), sa.ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("tag_id", UUID(as_uuid=True), sa.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    )
+    create_table(
+        "device_tags",
+        sa.Column("device_id", UUID(as_uuid=True), sa.ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("tag_id", UUID(as_uuid=True), sa.ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    )
+    create_table(
+        "sensors",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("unit_of_measurement", sa.String(20)),
+        sa.Column("min_value", sa.Numeric()),
+        sa.Column("max_value", sa.Numeric()),
+        sa.Column("device_id", UUID(as_uuid=True), sa.ForeignKey("devices.id", ondelete="CASCADE"), nullable=False),
+        *_timestamps(),
+    )
+    create_table(
+        "sensor_data",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("value", sa.Numeric(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=False), server_default=sa.func.now()),
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False),
+    )
+    create_table(
+        "commands",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("device_id", UUID(as_uuid=True), sa.ForeignKey("devices.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("command_type", sa.String(50), nullable=False),
+        sa.Column("parameters", sa.Text(), nullable=True),
+        sa.Column("status", sa.String(20)),
+        sa.Column("issued_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+        sa.Column("completed_at", sa.DateTime(timezone=False), nullable=True),
+        sa.Column("response_message", sa.Text(), nullable=True),
+    )
+
+def downgrade():
+    for name in ("commands", "sensor_data", "sensors", "device_tags", "project_tags", "devices", "tags", "projects", "users"):
+        op.drop_table(name)
@@ -0,0 +1,83 @@
+"""sensor_data particionada por mês, com chave natural (sensor_id, timestamp)
+
+Converte a tabela sensor_data comum em uma tabela particionada por RANGE (timestamp):
+a tabela antiga é renomeada, a nova é criada com uma partição por mês existente nos
+dados (mais a partição default) e as leituras são copiadas. Leituras duplicadas para o
+mesmo (sensor_id, timestamp), possíveis antes da chave natural, são descartadas na
+cópia. As partições futuras ficam a cargo de app/db/partitions.py.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 09:10:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def _is_partitioned(bind) -> bool:
+    return bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'sensor_data'"
+    )).first() is not None
+
+def _next_month(month):
+    return month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+def upgrade():
+    bind = op.get_bind()
+    if _is_partitioned(bind):
+        return
+
+    op.rename_table("sensor_data", "sensor_data_legacy")
+    # Nomes de índice são únicos no schema: libera o nome da PK para a nova tabela
+    op.execute("ALTER TABLE sensor_data_legacy RENAME CONSTRAINT sensor_data_pkey TO sensor_data_legacy_pkey")
+
+    op.create_table(
+        "sensor_data",
+        sa.Column("id", UUID(as_uuid=True), nullable=False),
+        sa.Column("value", sa.Numeric(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=False), server_default=sa.func.now(), nullable=False),
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False),
+        sa.PrimaryKeyConstraint("id", "timestamp", name="sensor_data_pkey"),
+        sa.UniqueConstraint("sensor_id", "timestamp", name="uq_sensor_data_sensor_id_timestamp"),
+        postgresql_partition_by="RANGE (timestamp)",
+    )
+    op.execute("CREATE TABLE sensor_data_default PARTITION OF sensor_data DEFAULT")
+
+    months = bind.execute(sa.text(
+        "SELECT DISTINCT date_trunc('month', COALESCE(timestamp, now()))::date FROM sensor_data_legacy"
+    )).scalars().all()
+    for month in months:
+        op.execute(
+            f"CREATE TABLE sensor_data_{month.year:04d}_{month.month:02d} PARTITION OF sensor_data "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        )
+
+    op.execute(
+        "INSERT INTO sensor_data (id, value, timestamp, sensor_id) "
+        "SELECT id, value, COALESCE(timestamp, now()), sensor_id FROM sensor_data_legacy "
+        "ON CONFLICT DO NOTHING"
+    )
+    op.drop_table("sensor_data_legacy")
+
+def downgrade():
+    op.rename_table("sensor_data", "sensor_data_partitioned")
+    op.execute("ALTER TABLE sensor_data_partitioned RENAME CONSTRAINT sensor_data_pkey TO sensor_data_partitioned_pkey")
+    op.create_table(
+        "sensor_data",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("value", sa.Numeric(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=False), server_default=sa.func.now()),
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO sensor_data (id, value, timestamp, sensor_id) "
+        "SELECT id, value, timestamp, sensor_id FROM sensor_data_partitioned"
+    )
+    # Remove também todas as partições
+    op.execute("DROP TABLE sensor_data_partitioned CASCADE")
@@ -0,0 +1,45 @@
+"""índices das consultas principais
+
+- devices(project_id), sensors(device_id) e projects(user_id): listagens por pai e
+  junções de verificação de dono, que faziam varredura sequencial.
+- commands(device_id, status): fila de comandos pendentes consultada pelos gateways.
+- BRIN em sensor_data(timestamp): filtros por intervalo de tempo que não fixam um
+  sensor (médias por dispositivo, retenção). Como as leituras chegam praticamente em
+  ordem de tempo, o BRIN ocupa poucas páginas por partição.
+
+sensor_data(sensor_id, timestamp) já é coberto pelo índice da restrição única
+uq_sensor_data_sensor_id_timestamp, que atende get_data_by_sensor (inclusive o
+ORDER BY timestamp DESC, por varredura reversa), então não ganha um índice duplicado.
+
+Os índices das tabelas comuns são criados com CONCURRENTLY para não bloquear escritas;
+em tabelas particionadas o Postgres não aceita CONCURRENTLY.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 09:20:00
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+BTREE_INDEXES = [
+    ("ix_projects_user_id", "projects", ["user_id"]),
+    ("ix_devices_project_id", "devices", ["project_id"]),
+    ("ix_sensors_device_id", "sensors", ["device_id"]),
+    ("ix_commands_device_id_status", "commands", ["device_id", "status"]),
+]
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in BTREE_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+    op.create_index("ix_sensor_data_timestamp_brin", "sensor_data", ["timestamp"], postgresql_using="brin")
+
+def downgrade():
+    op.drop_index("ix_sensor_data_timestamp_brin", table_name="sensor_data")
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(BTREE_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
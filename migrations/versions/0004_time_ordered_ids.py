@@ -0,0 +1,54 @@
+"""chaves primárias ordenadas no tempo (UUIDv7) em sensor_data e commands
+
+A aplicação passa a gerar UUIDv7 (app/db/ids.py). Esta migração cria a função SQL
+uuid_generate_v7() e a usa como default no banco, para que inserções feitas fora da
+API (scripts, COPY) também gerem chaves ordenadas.
+
+As linhas existentes mantêm seus ids: continuam UUIDs válidos (o tipo da coluna não
+muda) e podem estar referenciados por clientes da API. As novas chaves são crescentes
+entre si, então se concentram em uma única região do índice em vez de espalhar-se por
+ele; em sensor_data, as partições de meses novos só recebem UUIDv7. Um REINDEX
+CONCURRENTLY opcional compacta as páginas que as chaves aleatórias já fragmentaram.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 10:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# gen_random_uuid() com os 48 primeiros bits trocados pelo epoch em milissegundos e a
+# versão ajustada de 4 (0100) para 7 (0111) ligando os bits 52 e 53
+UUID_GENERATE_V7 = """
+CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS uuid AS $$
+    SELECT encode(
+        set_bit(
+            set_bit(
+                overlay(
+                    uuid_send(gen_random_uuid())
+                    PLACING substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                    FROM 1 FOR 6
+                ),
+                52, 1
+            ),
+            53, 1
+        ),
+        'hex'
+    )::uuid
+$$ LANGUAGE sql VOLATILE
+"""
+
+def upgrade():
+    op.execute(UUID_GENERATE_V7)
+    for table in ("sensor_data", "commands"):
+        op.alter_column(table, "id", server_default=sa.text("uuid_generate_v7()"))
+
+def downgrade():
+    for table in ("sensor_data", "commands"):
+        op.alter_column(table, "id", server_default=None)
+    op.execute("DROP FUNCTION uuid_generate_v7()")
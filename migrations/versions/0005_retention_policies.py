@@ -0,0 +1,40 @@
+"""políticas de retenção e rollups horários de sensor_data
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 11:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "retention_policies",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("project_id", UUID(as_uuid=True), sa.ForeignKey("projects.id", ondelete="CASCADE"), unique=True, nullable=True),
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), unique=True, nullable=True),
+        sa.Column("raw_retention_days", sa.Integer(), nullable=False),
+        sa.Column("rollup_retention_days", sa.Integer(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+        sa.CheckConstraint("(project_id IS NULL) <> (sensor_id IS NULL)", name="ck_retention_policies_scope"),
+    )
+    op.create_table(
+        "sensor_data_rollup_1h",
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("bucket", sa.DateTime(timezone=False), primary_key=True),
+        sa.Column("sample_count", sa.BigInteger(), nullable=False),
+        sa.Column("value_sum", sa.Numeric(), nullable=False),
+        sa.Column("value_min", sa.Numeric(), nullable=False),
+        sa.Column("value_max", sa.Numeric(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("sensor_data_rollup_1h")
+    op.drop_table("retention_policies")
@@ -0,0 +1,31 @@
+"""manifesto do arquivo frio de sensor_data
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "sensor_data_archives",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("range_start", sa.DateTime(timezone=False), nullable=False),
+        sa.Column("range_end", sa.DateTime(timezone=False), nullable=False),
+        sa.Column("row_count", sa.BigInteger(), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("path", sa.String(255), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+    )
+    op.create_index("ix_sensor_data_archives_sensor_id_range_end", "sensor_data_archives", ["sensor_id", "range_end"])
+
+def downgrade():
+    op.drop_table("sensor_data_archives")
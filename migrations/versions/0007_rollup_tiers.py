@@ -0,0 +1,80 @@
+"""rollups por minuto, hora e dia mantidos pela ingestão
+
+Cria os níveis por minuto e por dia e preenche os três a partir de sensor_data.
+Até aqui sensor_data_rollup_1h só continha leituras já removidas pela retenção ou pelo
+arquivamento (disjuntas das que ainda estão em sensor_data), então as leituras atuais
+são somadas a ele; o nível diário é derivado do horário, que passa a cobrir todo o
+histórico. O nível por minuto só cobre as leituras ainda presentes em sensor_data.
+
+O preenchimento lê sensor_data inteira uma vez; em bases grandes, rode a migração em
+uma janela de manutenção, com a ingestão parada.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 09:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def _create_rollup_table(name):
+    op.create_table(
+        name,
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("bucket", sa.DateTime(timezone=False), nullable=False),
+        sa.Column("sample_count", sa.BigInteger(), nullable=False),
+        sa.Column("value_sum", sa.Numeric(), nullable=False),
+        sa.Column("value_min", sa.Numeric(), nullable=False),
+        sa.Column("value_max", sa.Numeric(), nullable=False),
+        sa.PrimaryKeyConstraint("sensor_id", "bucket"),
+    )
+
+def upgrade():
+    _create_rollup_table("sensor_data_rollup_1m")
+    _create_rollup_table("sensor_data_rollup_1d")
+
+    op.execute("""
+        INSERT INTO sensor_data_rollup_1m (sensor_id, bucket, sample_count, value_sum, value_min, value_max)
+        SELECT sensor_id, date_trunc('minute', timestamp), count(*), sum(value), min(value), max(value)
+        FROM sensor_data
+        GROUP BY 1, 2
+    """)
+    op.execute("""
+        INSERT INTO sensor_data_rollup_1h AS r (sensor_id, bucket, sample_count, value_sum, value_min, value_max)
+        SELECT sensor_id, date_trunc('hour', bucket), sum(sample_count), sum(value_sum), min(value_min), max(value_max)
+        FROM sensor_data_rollup_1m
+        GROUP BY 1, 2
+        ON CONFLICT (sensor_id, bucket) DO UPDATE SET
+            sample_count = r.sample_count + EXCLUDED.sample_count,
+            value_sum = r.value_sum + EXCLUDED.value_sum,
+            value_min = LEAST(r.value_min, EXCLUDED.value_min),
+            value_max = GREATEST(r.value_max, EXCLUDED.value_max)
+    """)
+    op.execute("""
+        INSERT INTO sensor_data_rollup_1d (sensor_id, bucket, sample_count, value_sum, value_min, value_max)
+        SELECT sensor_id, date_trunc('day', bucket), sum(sample_count), sum(value_sum), min(value_min), max(value_max)
+        FROM sensor_data_rollup_1h
+        GROUP BY 1, 2
+    """)
+
+def downgrade():
+    # Volta o nível horário a conter apenas as leituras que já saíram de sensor_data
+    # (mínimo e máximo dos buckets mistos não são recalculados)
+    op.execute("""
+        UPDATE sensor_data_rollup_1h r
+        SET sample_count = r.sample_count - m.sample_count, value_sum = r.value_sum - m.value_sum
+        FROM (
+            SELECT sensor_id, date_trunc('hour', timestamp) AS bucket, count(*) AS sample_count, sum(value) AS value_sum
+            FROM sensor_data
+            GROUP BY 1, 2
+        ) m
+        WHERE r.sensor_id = m.sensor_id AND r.bucket = m.bucket
+    """)
+    op.execute("DELETE FROM sensor_data_rollup_1h WHERE sample_count <= 0")
+    op.drop_table("sensor_data_rollup_1d")
+    op.drop_table("sensor_data_rollup_1m")
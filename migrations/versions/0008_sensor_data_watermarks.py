@@ -0,0 +1,38 @@
+"""marcas d'água por sensor para invalidar o cache de agregados
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 11:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "sensor_data_watermarks",
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("earliest_timestamp", sa.DateTime(timezone=False), nullable=False),
+        sa.Column("latest_timestamp", sa.DateTime(timezone=False), nullable=False),
+        sa.Column("revision", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+    )
+    # O rollup diário cobre todo o histórico (inclusive o arquivado); a leitura mais recente
+    # vem de sensor_data quando ainda está lá
+    op.execute("""
+        INSERT INTO sensor_data_watermarks (sensor_id, earliest_timestamp, latest_timestamp)
+        SELECT d.sensor_id, d.earliest,
+               COALESCE((SELECT max(timestamp) FROM sensor_data s WHERE s.sensor_id = d.sensor_id), d.latest)
+        FROM (
+            SELECT sensor_id, min(bucket) AS earliest, max(bucket) + interval '1 day' - interval '1 microsecond' AS latest
+            FROM sensor_data_rollup_1d
+            GROUP BY sensor_id
+        ) d
+    """)
+
+def downgrade():
+    op.drop_table("sensor_data_watermarks")
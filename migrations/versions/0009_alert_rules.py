@@ -0,0 +1,47 @@
+"""regras de alerta por limite e histórico de transições
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 15:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "alert_rules",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("lower", sa.Numeric(), nullable=True),
+        sa.Column("upper", sa.Numeric(), nullable=True),
+        sa.Column("hysteresis", sa.Numeric(), nullable=False, server_default=sa.text("0")),
+        sa.Column("enabled", sa.Boolean(), nullable=False, server_default=sa.text("true")),
+        sa.Column("state", sa.String(10), nullable=False, server_default=sa.text("'ok'")),
+        sa.Column("state_changed_at", sa.DateTime(timezone=False), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+    )
+    op.create_index("ix_alert_rules_sensor_id", "alert_rules", ["sensor_id"])
+    op.create_table(
+        "alert_events",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True, server_default=sa.text("uuid_generate_v7()")),
+        sa.Column("rule_id", UUID(as_uuid=True), sa.ForeignKey("alert_rules.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("sensor_id", UUID(as_uuid=True), sa.ForeignKey("sensors.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("previous_state", sa.String(10), nullable=False),
+        sa.Column("state", sa.String(10), nullable=False),
+        sa.Column("value", sa.Numeric(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(timezone=False), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=False), server_default=sa.func.now()),
+    )
+    op.create_index("ix_alert_events_rule_id_timestamp", "alert_events", ["rule_id", "timestamp"])
+
+def downgrade():
+    op.drop_table("alert_events")
+    op.drop_table("alert_rules")
@@ -0,0 +1,35 @@
+"""leitura mais recente de cada sensor nas marcas d'água
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 17:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("sensor_data_watermarks", sa.Column("latest_id", UUID(as_uuid=True), nullable=True))
+    op.add_column("sensor_data_watermarks", sa.Column("latest_value", sa.Numeric(), nullable=True))
+    # Leituras já arquivadas ficam sem latest_id/latest_value até a próxima ingestão do sensor
+    op.execute("""
+        UPDATE sensor_data_watermarks w
+        SET latest_id = l.id, latest_value = l.value
+        FROM sensor_data_watermarks s
+        CROSS JOIN LATERAL (
+            SELECT id, value, timestamp FROM sensor_data d
+            WHERE d.sensor_id = s.sensor_id
+            ORDER BY timestamp DESC
+            LIMIT 1
+        ) l
+        WHERE w.sensor_id = s.sensor_id AND l.timestamp = w.latest_timestamp
+    """)
+
+def downgrade():
+    op.drop_column("sensor_data_watermarks", "latest_value")
+    op.drop_column("sensor_data_watermarks", "latest_id")
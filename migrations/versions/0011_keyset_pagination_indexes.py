@@ -0,0 +1,40 @@
+"""índices da paginação por cursor (keyset)
+
+As listagens por pai ordenam por (created_at, id), ou (issued_at, id) nos comandos, e
+continuam a partir do cursor. Os índices só do pai viram índices compostos (pai, chave):
+a página sai da varredura do índice, na ordem, sem ordenar todas as linhas do pai. A
+coluna do pai continua na frente, então as junções de verificação de dono seguem
+atendidas. ix_commands_device_id_status fica para a fila de comandos pendentes.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 19:00:00
+"""
+from alembic import op
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+# (índice novo, índice substituído, tabela, colunas)
+KEYSET_INDEXES = [
+    ("ix_projects_user_id_created_at_id", "ix_projects_user_id", "projects", ["user_id", "created_at", "id"]),
+    ("ix_devices_project_id_created_at_id", "ix_devices_project_id", "devices", ["project_id", "created_at", "id"]),
+    ("ix_sensors_device_id_created_at_id", "ix_sensors_device_id", "sensors", ["device_id", "created_at", "id"]),
+    ("ix_commands_device_id_issued_at_id", None, "commands", ["device_id", "issued_at", "id"]),
+]
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, replaced, table, columns in KEYSET_INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+            if replaced:
+                op.drop_index(replaced, table_name=table, postgresql_concurrently=True)
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, replaced, table, columns in reversed(KEYSET_INDEXES):
+            if replaced:
+                op.create_index(replaced, table, columns[:1], postgresql_concurrently=True)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,38 @@
+"""busca textual com pg_trgm
+
+Índices GIN de trigramas sobre o documento de busca de projetos, dispositivos e tags (as
+colunas de busca concatenadas, ver app/db/search.py). Eles atendem ILIKE '%termo%' e o
+operador de similaridade <%, que antes faziam varredura sequencial com lower() LIKE. A
+expressão precisa ser idêntica à usada nas consultas.
+
+A extensão pg_trgm faz parte do contrib do PostgreSQL (inclusa nas imagens oficiais) e é
+"trusted": o dono do banco pode criá-la sem ser superusuário.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 20:00:00
+"""
+from alembic import op
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+SEARCH_INDEXES = [
+    ("ix_projects_search_trgm", "projects", "(coalesce(name, '') || ' ') || coalesce(description, '')"),
+    ("ix_devices_search_trgm", "devices",
+     "(((coalesce(name, '') || ' ') || coalesce(description, '')) || ' ') || coalesce(serial_number, '')"),
+    ("ix_tags_search_trgm", "tags", "coalesce(name, '')"),
+]
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for name, table, document in SEARCH_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin (({document}) gin_trgm_ops)")
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(SEARCH_INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
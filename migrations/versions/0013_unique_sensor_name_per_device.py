@@ -0,0 +1,40 @@
+"""nome de sensor único por dispositivo
+
+A ingestão cria os sensores que o payload cita e ainda não existem; sem unicidade em
+(device_id, name), duas ingestões simultâneas com o mesmo sensor novo criavam duas linhas,
+e as leituras seguintes se dividiam entre elas. A restrição permite à ingestão usar
+INSERT ... ON CONFLICT (device_id, name) DO NOTHING.
+
+Duplicatas já existentes são mantidas com todas as leituras: o sensor mais antigo de cada
+grupo fica com o nome, os demais são renomeados para "<nome>~<início do id>", para
+consolidação manual. O índice é criado com CONCURRENTLY e então vira a restrição.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17 21:00:00
+"""
+from alembic import op
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+CONSTRAINT = "uq_sensors_device_id_name"
+
+def upgrade():
+    op.execute("""
+        UPDATE sensors s
+        SET name = left(s.name, 91) || '~' || left(s.id::text, 8)
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY device_id, name ORDER BY created_at, id) AS position
+            FROM sensors
+        ) d
+        WHERE d.id = s.id AND d.position > 1
+    """)
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {CONSTRAINT} ON sensors (device_id, name)")
+        op.execute(f"ALTER TABLE sensors ADD CONSTRAINT {CONSTRAINT} UNIQUE USING INDEX {CONSTRAINT}")
+
+def downgrade():
+    op.drop_constraint(CONSTRAINT, "sensors", type_="unique")
@@ -0,0 +1,121 @@
+"""
+Regras de alerta com histerese (app/core/alerts.py): transições de RuleState.next_state e
+AlertRuleIndex.evaluate, leituras fora de ordem e a recarga do índice quando a transação
+que gerou transições é revertida.
+"""
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from app.core.alerts import AlertRuleIndex, RuleState, alert_rule_index
+from app.repositories.sensor_data import SensorDataRepository
+
+START = datetime(2026, 1, 1, 12, 0)
+
+def rule(sensor_id, lower=None, upper=None, hysteresis=0.0, state="ok", last_timestamp=None):
+    return RuleState(uuid.uuid4(), sensor_id, lower, upper, hysteresis, state, last_timestamp)
+
+def readings(sensor_id, *values, start=START):
+    return [SimpleNamespace(sensor_id=sensor_id, value=Decimal(str(v)), timestamp=start + timedelta(seconds=i))
+            for i, v in enumerate(values)]
+
+def states(transitions):
+    return [(t["previous_state"], t["state"]) for t in transitions]
+
+def test_next_state_keeps_alarm_inside_hysteresis_band():
+    state = rule(uuid.uuid4(), lower=0.0, upper=30.0, hysteresis=2.0)
+    sequence = []
+    for value in (25, 31, 29, 28.5, 27.9):
+        state.state = state.next_state(value)
+        sequence.append(state.state)
+    assert sequence == ["ok", "high", "high", "high", "ok"]
+
+def test_evaluate_reports_only_state_changes():
+    sensor_id = uuid.uuid4()
+    index = AlertRuleIndex(refresh_seconds=60)
+    index.load([rule(sensor_id, lower=0.0, upper=30.0, hysteresis=2.0)])
+
+    transitions = index.evaluate(readings(sensor_id, 25, 31, 35, 29, 27))
+
+    assert states(transitions) == [("ok", "high"), ("high", "ok")]
+    assert [t["value"] for t in transitions] == [Decimal("31"), Decimal("27")]
+    assert transitions[1]["timestamp"] == START + timedelta(seconds=4)
+
+def test_lower_bound_only():
+    sensor_id = uuid.uuid4()
+    index = AlertRuleIndex(refresh_seconds=60)
+    index.load([rule(sensor_id, lower=10.0, hysteresis=1.0)])
+
+    transitions = index.evaluate(readings(sensor_id, 1000, 9, 10.5, 11.5))
+
+    # Sem limite superior, valores altos nunca disparam
+    assert states(transitions) == [("ok", "low"), ("low", "ok")]
+    assert transitions[1]["value"] == Decimal("11.5")
+
+def test_reading_older_than_last_evaluated_is_skipped():
+    sensor_id = uuid.uuid4()
+    index = AlertRuleIndex(refresh_seconds=60)
+    index.load([rule(sensor_id, upper=30.0, last_timestamp=START)])
+
+    late = readings(sensor_id, 40, start=START - timedelta(minutes=5))
+    assert index.evaluate(late) == []
+
+    # Dentro do mesmo lote, a ordem é a de timestamp, não a de chegada
+    batch = readings(sensor_id, 20, 40, start=START + timedelta(minutes=1))
+    assert states(index.evaluate(batch[::-1])) == [("ok", "high")]
+
+@pytest.fixture
+def alert_sensor_id(seed, database):
+    """Sensor novo com uma regra 'upper 30'; o índice global começa e termina invalidado."""
+    with database.begin() as conn:
+        sensor_id = conn.execute(text(
+            "INSERT INTO sensors (id, name, device_id) VALUES (gen_random_uuid(), 'alert-probe', :d) RETURNING id"
+        ), {"d": seed.device_id}).scalar_one()
+        conn.execute(text(
+            "INSERT INTO alert_rules (id, sensor_id, name, upper) VALUES (gen_random_uuid(), :s, 'quente', 30)"
+        ), {"s": sensor_id})
+    alert_rule_index.invalidate()
+    yield sensor_id
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM sensors WHERE id = :id"), {"id": sensor_id})
+    alert_rule_index.invalidate()
+
+def test_rolled_back_ingest_reloads_persisted_state(db, alert_sensor_id):
+    repo = SensorDataRepository(db)
+    timestamp = datetime.utcnow().replace(microsecond=0)
+    row = {"sensor_id": alert_sensor_id, "value": Decimal("40"), "timestamp": timestamp}
+
+    repo.bulk_insert([dict(row, id=uuid.uuid4())])
+    assert not alert_rule_index.is_stale
+    db.rollback()
+    # A transição para 'high' não foi gravada: o índice é descartado
+    assert alert_rule_index.is_stale
+
+    persisted = db.execute(text("SELECT state, state_changed_at FROM alert_rules WHERE sensor_id = :s"),
+                           {"s": alert_sensor_id}).one()
+    assert tuple(persisted) == ("ok", None)
+
+    # Recarregado do banco, o índice volta a 'ok' e a mesma leitura gera a transição de novo
+    reloads = alert_rule_index.reloads
+    repo.bulk_insert([dict(row, id=uuid.uuid4())])
+    db.commit()
+    assert alert_rule_index.reloads == reloads + 1
+    persisted = db.execute(text("SELECT state, state_changed_at FROM alert_rules WHERE sensor_id = :s"),
+                           {"s": alert_sensor_id}).one()
+    assert tuple(persisted) == ("high", timestamp)
+    events = db.execute(text(
+        "SELECT count(*) FROM alert_events e JOIN alert_rules r ON r.id = e.rule_id WHERE r.sensor_id = :s"
+    ), {"s": alert_sensor_id}).scalar_one()
+    assert events == 1
+
+    # Após outra recarga, state_changed_at vira last_timestamp: uma leitura mais antiga não muda o estado
+    alert_rule_index.invalidate()
+    repo.bulk_insert([dict(row, id=uuid.uuid4(), value=Decimal("0"), timestamp=timestamp - timedelta(minutes=1))])
+    db.commit()
+    persisted = db.execute(text("SELECT state, state_changed_at FROM alert_rules WHERE sensor_id = :s"),
+                           {"s": alert_sensor_id}).one()
+    assert tuple(persisted) == ("high", timestamp)
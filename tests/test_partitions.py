@@ -0,0 +1,27 @@
+"""
+Partições de sensor_data: leituras de um mês passado sem partição caem na default; a
+manutenção cria a partição desse mês, move as leituras e a retenção passa a alcançá-las.
+Tudo roda em uma transação desfeita no final (o DDL do Postgres é transacional).
+"""
+from sqlalchemy import text
+
+from app.db.partitions import DEFAULT_PARTITION, add_months, ensure_partitions, expire_partitions, month_start, partition_name
+
+def test_past_month_in_default_partition_is_moved_and_expired(database, seed):
+    today = seed.month.date()
+    past = add_months(month_start(today), -3)
+    params = {"sensor": seed.sensor_id, "ts": past.replace(day=15)}
+    stored_in = "SELECT tableoid::regclass::text FROM sensor_data WHERE sensor_id = :sensor AND timestamp = :ts"
+    with database.connect() as conn, conn.begin() as transaction:
+        conn.execute(text(
+            "INSERT INTO sensor_data (id, sensor_id, value, timestamp) VALUES (gen_random_uuid(), :sensor, 1, :ts)"
+        ), params)
+        assert conn.execute(text(stored_in), params).scalar_one() == DEFAULT_PARTITION
+
+        created = ensure_partitions(conn, today, months_ahead=2)
+        assert created == [partition_name(past)]
+        assert conn.execute(text(stored_in), params).scalar_one() == partition_name(past)
+
+        assert expire_partitions(conn, today, retention_months=2, drop=True) == [partition_name(past)]
+        assert conn.execute(text(stored_in), params).first() is None
+        transaction.rollback()
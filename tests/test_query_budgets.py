@@ -0,0 +1,241 @@
+"""
+Orçamento de consultas por rota: com QUERY_BUDGET_STRICT a aplicação responde 500 quando
+uma rota executa mais statements SQL que o seu @query_budget (ver app/core/query_budget.py).
+Cada rota com orçamento é chamada aqui contra o banco populado pelo fixture `seed`; as rotas
+que alteram ou excluem dados usam entidades criadas só para este módulo.
+"""
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from starlette.routing import Match
+from sqlalchemy import text
+
+from app.core import binary_format
+from app.core.query_budget import budget_for
+
+@pytest.fixture(scope="module")
+def app(database):
+    from app.core.config import settings
+    from app.main import create_app
+
+    # Lidas em create_app(); sem o `with TestClient(...)` o lifespan (jobs) não roda
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "QUERY_BUDGET_STRICT", True)
+        mp.setattr(settings, "QUERY_COUNT_HEADER", True)
+        yield create_app()
+
+@pytest.fixture(scope="module")
+def client(app):
+    return TestClient(app)
+
+@pytest.fixture(scope="module")
+def ids(database, seed):
+    """
+    Ids usados nas URLs e corpos: os do seed para as leituras e, para as escritas, um projeto
+    do mesmo dono com dispositivo, sensor, tag, comando, política e regra, mais uma cópia
+    "spare" de cada entidade que alguma rota exclui.
+    """
+    from app.core.security import create_access_token
+
+    new = {name: uuid.uuid4() for name in (
+        "spare_user_id", "project_id", "spare_project_id", "device_id", "spare_device_id",
+        "sensor_id", "spare_sensor_id", "spare_data_id", "tag_id", "spare_tag_id", "command_id",
+        "spare_command_id", "policy_id", "spare_policy_id", "rule_id", "spare_rule_id",
+    )}
+    with database.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password, is_active) "
+            "VALUES (:spare_user_id, 'spare', 'spare@example.com', 'x', true)"
+        ), new)
+        conn.execute(text(
+            "INSERT INTO projects (id, name, user_id) "
+            "VALUES (:project_id, 'Orçamento', :owner_id), (:spare_project_id, 'Descartável', :owner_id)"
+        ), new | {"owner_id": seed.owner_id})
+        conn.execute(text(
+            "INSERT INTO devices (id, name, serial_number, device_type, status, project_id) VALUES "
+            "(:device_id, 'budget', 'BUDGET-0001', 'gateway', 'offline', :project_id), "
+            "(:spare_device_id, 'budget-spare', 'BUDGET-0002', 'gateway', 'offline', :project_id), "
+            "(gen_random_uuid(), 'budget-orphan', 'BUDGET-0004', 'gateway', 'offline', :spare_project_id)"
+        ), new)
+        conn.execute(text(
+            "INSERT INTO sensors (id, name, unit_of_measurement, device_id) VALUES "
+            "(:sensor_id, 'temperatura', 'C', :device_id), (:spare_sensor_id, 'umidade', '%', :device_id)"
+        ), new)
+        conn.execute(text(
+            "INSERT INTO sensor_data (id, sensor_id, value, timestamp) VALUES (:spare_data_id, :sensor_id, 20, now())"
+        ), new)
+        conn.execute(text(
+            "INSERT INTO tags (id, name) VALUES (:tag_id, 'budget'), (:spare_tag_id, 'budget-spare')"
+        ), new)
+        conn.execute(text(
+            "INSERT INTO commands (id, device_id, command_type, status) VALUES "
+            "(:command_id, :device_id, 'reboot', 'sent'), (:spare_command_id, :device_id, 'reboot', 'pending')"
+        ), new)
+        conn.execute(text(
+            "INSERT INTO retention_policies (id, project_id, sensor_id, raw_retention_days) VALUES "
+            "(:policy_id, :project_id, NULL, 365), (:spare_policy_id, NULL, :spare_sensor_id, 30)"
+        ), new)
+        conn.execute(text(
+            "INSERT INTO alert_rules (id, sensor_id, name, upper) VALUES "
+            "(:rule_id, :sensor_id, 'quente', 40), (:spare_rule_id, :spare_sensor_id, 'úmido', 90)"
+        ), new)
+        data_id = conn.execute(text(
+            "SELECT id FROM sensor_data WHERE sensor_id = :sensor_id LIMIT 1"
+        ), {"sensor_id": seed.sensor_id}).scalar_one()
+
+    return SimpleNamespace(
+        **{name: str(value) for name, value in new.items()},
+        owner_id=str(seed.owner_id),
+        seed_project_id=str(seed.project_id),
+        seed_device_id=str(seed.device_id),
+        seed_sensor_id=str(seed.sensor_id),
+        seed_command_id=str(seed.command_id),
+        seed_tag_id=str(seed.tag_ids[0]),
+        data_id=str(data_id),
+        start=seed.month.isoformat(),
+        end=seed.month.replace(day=2).isoformat(),
+        headers=seed.headers,
+        spare_headers={"Authorization": f"Bearer {create_access_token({'sub': str(new['spare_user_id'])})}"},
+    )
+
+def route(method: str, url: str, body=None, auth: str | None = "headers"):
+    """Um caso: URL com os campos de `ids` entre chaves, `body(ids)` com os kwargs da requisição."""
+    return pytest.param(method, url, body, auth, id=f"{method} {url}")
+
+# As ingestões incluem um sensor novo: o caminho mais caro, com a criação do sensor
+def binary_body(ids) -> dict:
+    now_ms = int(time.time() * 1000)
+    payload = binary_format.encode_payload("BUDGET-0001", ["temperatura", "chuva"], [0, 1, 0],
+                                           [now_ms, now_ms, now_ms + 1000], [21.5, 0.4, 21.7])
+    return {"content": payload, "headers": {"Content-Type": binary_format.CONTENT_TYPE}}
+
+def ingest_body(ids) -> dict:
+    return {"json": {"device_serial_number": "BUDGET-0001", "readings": [
+        {"sensor_name_or_id": "temperatura", "value": 21.5},
+        {"sensor_name_or_id": "vento", "value": 12},
+    ]}}
+
+AGGREGATE = "interval=1h&start_time={start}&end_time={end}&stats=avg&stats=max"
+
+# As exclusões ficam por último: as demais rotas ainda usam o que elas removem
+ROUTES = [
+    route("POST", "/api/v1/auth/register", lambda ids: {"json": {"username": "budget", "email": "budget@example.com", "password": "secret"}}, auth=None),
+    route("POST", "/api/v1/auth/token", lambda ids: {"data": {"username": "budget", "password": "secret"}}, auth=None),
+    route("GET", "/api/v1/users/"),
+    route("GET", "/api/v1/users/{owner_id}"),
+    route("PUT", "/api/v1/users/{owner_id}", lambda ids: {"json": {"is_active": True}}),
+
+    route("POST", "/api/v1/projects/", lambda ids: {"json": {"name": "Novo", "user_id": ids.owner_id}, "params": {"tag_ids": [ids.tag_id]}}),
+    route("GET", "/api/v1/projects/"),
+    route("GET", "/api/v1/projects/?query=estufa"),
+    route("GET", "/api/v1/projects/{seed_project_id}"),
+    route("PUT", "/api/v1/projects/{project_id}", lambda ids: {"json": {"description": "Atualizado"}}),
+    route("POST", "/api/v1/projects/{project_id}/tags", lambda ids: {"json": [ids.tag_id, ids.spare_tag_id]}),
+    route("DELETE", "/api/v1/projects/{project_id}/tags", lambda ids: {"json": [ids.spare_tag_id]}),
+    route("GET", "/api/v1/projects/{seed_project_id}/tags"),
+    route("GET", "/api/v1/projects/{seed_project_id}/snapshot"),
+    route("GET", "/api/v1/projects/{seed_project_id}/recent-sensor-data"),
+    route("GET", "/api/v1/projects/{seed_project_id}/recent-sensor-data?limit=5"),
+    route("GET", "/api/v1/projects/{seed_project_id}/sensor-data/aggregates?" + AGGREGATE),
+
+    route("POST", "/api/v1/devices/", lambda ids: {"json": {"name": "novo", "serial_number": "BUDGET-0003", "device_type": "gateway", "project_id": ids.project_id}, "params": {"tag_ids": [ids.tag_id]}}),
+    route("GET", "/api/v1/devices/?project_id={seed_project_id}"),
+    route("GET", "/api/v1/devices/?query=device"),
+    route("GET", "/api/v1/devices/{seed_device_id}"),
+    route("PUT", "/api/v1/devices/{device_id}", lambda ids: {"json": {"status": "online"}}),
+    route("POST", "/api/v1/devices/{device_id}/tags", lambda ids: {"json": [ids.tag_id, ids.spare_tag_id]}),
+    route("DELETE", "/api/v1/devices/{device_id}/tags", lambda ids: {"json": [ids.spare_tag_id]}),
+    route("GET", "/api/v1/devices/{seed_device_id}/tags"),
+    route("GET", "/api/v1/devices/{seed_device_id}/recent-sensor-data"),
+    route("GET", "/api/v1/devices/{seed_device_id}/recent-sensor-data?limit=5"),
+    route("GET", "/api/v1/devices/{seed_device_id}/sensor-data/averages/daily"),
+    route("GET", "/api/v1/devices/{seed_device_id}/sensor-data/averages/weekly"),
+    route("GET", "/api/v1/devices/{seed_device_id}/sensor-data/averages/monthly"),
+
+    route("POST", "/api/v1/sensors/", lambda ids: {"json": {"name": "pressão", "device_id": ids.device_id}}),
+    route("GET", "/api/v1/sensors/?device_id={seed_device_id}"),
+    route("GET", "/api/v1/sensors/{seed_sensor_id}"),
+    route("PUT", "/api/v1/sensors/{sensor_id}", lambda ids: {"json": {"max_value": 80}}),
+
+    route("POST", "/api/v1/sensor-data/", lambda ids: {"json": {"sensor_id": ids.sensor_id, "value": 22}}),
+    route("GET", "/api/v1/sensor-data/?sensor_id={seed_sensor_id}&start_time={start}&end_time={end}"),
+    route("GET", "/api/v1/sensor-data/aggregates?sensor_id={seed_sensor_id}&" + AGGREGATE),
+    route("GET", "/api/v1/sensor-data/series?sensor_id={seed_sensor_id}&start_time={start}&end_time={end}&points=100"),
+    route("GET", "/api/v1/sensor-data/{data_id}"),
+    route("POST", "/api/v1/sensor-data/ingest", ingest_body, auth=None),
+    route("POST", "/api/v1/sensor-data/ingest/binary", binary_body, auth=None),
+    route("GET", "/api/v1/sensor-data/ingest/metrics"),
+
+    route("POST", "/api/v1/tags/", lambda ids: {"json": {"name": "nova"}}),
+    route("GET", "/api/v1/tags/"),
+    route("GET", "/api/v1/tags/?query=tag"),
+    route("GET", "/api/v1/tags/{seed_tag_id}"),
+    route("PUT", "/api/v1/tags/{tag_id}", lambda ids: {"json": {"name": "budget-renamed"}}),
+    route("GET", "/api/v1/tags/{seed_tag_id}/sensor-data/aggregates?" + AGGREGATE),
+
+    route("POST", "/api/v1/commands/", lambda ids: {"json": {"command_type": "reboot", "device_id": ids.device_id}}),
+    route("GET", "/api/v1/commands/?device_id={seed_device_id}"),
+    route("GET", "/api/v1/commands/{seed_command_id}"),
+    route("POST", "/api/v1/commands/gateway-pull-commands?device_serial_number=BUDGET-0001", auth=None),
+    route("PUT", "/api/v1/commands/gateway-update-command/{command_id}", lambda ids: {"json": {"status": "completed"}}, auth=None),
+
+    route("POST", "/api/v1/retention-policies/", lambda ids: {"json": {"sensor_id": ids.sensor_id, "raw_retention_days": 90}}),
+    route("GET", "/api/v1/retention-policies/"),
+    route("GET", "/api/v1/retention-policies/status"),
+    route("GET", "/api/v1/retention-policies/{policy_id}"),
+    route("PUT", "/api/v1/retention-policies/{policy_id}", lambda ids: {"json": {"raw_retention_days": 180}}),
+
+    route("POST", "/api/v1/alert-rules/", lambda ids: {"json": {"sensor_id": ids.sensor_id, "name": "frio", "lower": 5}}),
+    route("GET", "/api/v1/alert-rules/"),
+    route("GET", "/api/v1/alert-rules/?state=high"),
+    route("GET", "/api/v1/alert-rules/status"),
+    route("GET", "/api/v1/alert-rules/events"),
+    route("GET", "/api/v1/alert-rules/{rule_id}"),
+    route("PUT", "/api/v1/alert-rules/{rule_id}", lambda ids: {"json": {"upper": 45}}),
+    route("GET", "/api/v1/alert-rules/{rule_id}/events"),
+
+    route("DELETE", "/api/v1/alert-rules/{spare_rule_id}"),
+    route("DELETE", "/api/v1/retention-policies/{spare_policy_id}"),
+    route("DELETE", "/api/v1/commands/{spare_command_id}"),
+    route("DELETE", "/api/v1/tags/{spare_tag_id}"),
+    route("DELETE", "/api/v1/sensor-data/{spare_data_id}"),
+    route("DELETE", "/api/v1/sensors/{spare_sensor_id}"),
+    route("DELETE", "/api/v1/devices/{spare_device_id}"),
+    route("DELETE", "/api/v1/projects/{spare_project_id}"),
+    route("DELETE", "/api/v1/users/{spare_user_id}", auth="spare_headers"),
+]
+
+def matched_route(app, method: str, path: str) -> APIRoute:
+    scope = {"type": "http", "method": method, "path": path}
+    return next(r for r in app.routes if isinstance(r, APIRoute) and r.matches(scope)[0] == Match.FULL)
+
+@pytest.mark.parametrize("method, url, body, auth", ROUTES)
+def test_route_within_query_budget(client, ids, method, url, body, auth):
+    kwargs = body(ids) if body else {}
+    if auth:
+        kwargs["headers"] = kwargs.get("headers", {}) | getattr(ids, auth)
+    response = client.request(method, url.format_map(vars(ids)), **kwargs)
+
+    # No modo estrito, passar do orçamento troca a resposta por um 500 com a contagem
+    assert response.status_code < 400, response.text
+    assert "X-Query-Budget" in response.headers, "rota sem @query_budget"
+    assert int(response.headers["X-Query-Count"]) <= int(response.headers["X-Query-Budget"])
+
+def test_every_budgeted_route_is_exercised(app):
+    exercised = {matched_route(app, method, url.split("?")[0]).endpoint for method, url, *_ in (p.values for p in ROUTES)}
+    missing = sorted(r.endpoint.__name__ for r in app.routes
+                     if isinstance(r, APIRoute) and budget_for(r.endpoint) is not None and r.endpoint not in exercised)
+    assert not missing, f"rotas com orçamento sem caso de teste: {missing}"
+
+def test_strict_mode_rejects_route_over_budget(app, client, ids, monkeypatch):
+    endpoint = matched_route(app, "GET", "/api/v1/projects/{project_id}/snapshot").endpoint
+    monkeypatch.setattr(endpoint, "query_budget", 1)
+    response = client.get(f"/api/v1/projects/{ids.seed_project_id}/snapshot", headers=ids.headers)
+
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("Query budget exceeded")
+    assert response.headers["X-Query-Budget"] == "1"
@@ -0,0 +1,76 @@
+"""
+Regressão de planos: as consultas principais precisam usar os índices criados pelas
+migrações (e não Seq Scan) no banco populado pelo fixture `seed`. O SQL verificado é o
+gerado pelos próprios repositórios, capturado durante a chamada e repetido com
+EXPLAIN (FORMAT JSON).
+"""
+import re
+from datetime import timedelta
+
+from sqlalchemy import event
+
+from app.repositories.command import CommandRepository
+from app.repositories.sensor import SensorRepository
+from app.repositories.sensor_data import SensorDataRepository
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+def captured_plans(db, table: str, run) -> list[dict]:
+    """Executa `run` e devolve os planos dos SELECTs emitidos que leem `table`."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    plans = []
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith("SELECT") and re.search(rf"\bFROM {table}\b", statement):
+            result = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plans.append(result.scalar()[0]["Plan"])
+    assert plans, f"nenhuma consulta em {table} foi executada"
+    return plans
+
+def scans(plan: dict) -> list[dict]:
+    """Nós de leitura de tabela/índice do plano, em profundidade."""
+    nodes = [plan] if "Relation Name" in plan or "Index Name" in plan else []
+    for child in plan.get("Plans", []):
+        nodes.extend(scans(child))
+    return nodes
+
+def assert_uses_index(plans: list[dict], table: str, index_names: set[str]):
+    for plan in plans:
+        nodes = scans(plan)
+        seq_scans = [n for n in nodes if n["Node Type"] == "Seq Scan" and n["Relation Name"].startswith(table)]
+        assert not seq_scans, f"Seq Scan em {[n['Relation Name'] for n in seq_scans]}"
+        used = {n["Index Name"] for n in nodes if n["Node Type"] in INDEX_SCANS}
+        assert used & index_names, f"esperado um de {index_names}, usados: {used}"
+
+def test_get_data_by_sensor_uses_sensor_timestamp_index(db, seed):
+    start = seed.month
+    end = seed.month + timedelta(days=1)
+    repo = SensorDataRepository(db)
+    plans = captured_plans(db, "sensor_data", lambda: repo.get_data_by_sensor(seed.sensor_id, start, end, limit=100))
+
+    # O intervalo cabe em um mês: só a partição do mês é lida, pelo índice (sensor_id, timestamp)
+    partition = f"sensor_data_{start:%Y_%m}"
+    relations = {n["Relation Name"] for plan in plans for n in scans(plan) if "Relation Name" in n}
+    assert relations == {partition}
+    assert_uses_index(plans, "sensor_data", {f"{partition}_sensor_id_timestamp_key"})
+
+def test_get_sensors_by_device_uses_device_index(db, seed):
+    repo = SensorRepository(db)
+    plans = captured_plans(db, "sensors", lambda: repo.get_sensors_by_device(seed.device_id))
+    # Com poucos sensores por dispositivo, o índice da restrição (device_id, name) também serve
+    assert_uses_index(plans, "sensors", {"ix_sensors_device_id_created_at_id", "uq_sensors_device_id_name"})
+
+def test_get_pending_commands_for_device_uses_status_index(db, seed):
+    repo = CommandRepository(db)
+    plans = captured_plans(db, "commands", lambda: repo.get_pending_commands_for_device(seed.device_id))
+    assert_uses_index(plans, "commands", {"ix_commands_device_id_status"})
@@ -0,0 +1,50 @@
+"""
+RequestDecompressionMiddleware: corpos compactados chegam descompactados à rota, e um
+corpo cortado no meio do stream é recusado com 400 em vez de virar um corpo mais curto.
+"""
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.middleware import RequestDecompressionMiddleware
+
+BODY = b'{"device_serial_number": "SEED-0001", "readings": []}\n' * 200
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.add_middleware(RequestDecompressionMiddleware, paths=["/upload"], max_size=len(BODY))
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+def compressors():
+    yield pytest.param("gzip", gzip.compress, id="gzip")
+    yield pytest.param("deflate", zlib.compress, id="deflate")
+    try:
+        import zstandard
+    except ImportError: # zstd é opcional, como na aplicação
+        return
+    yield pytest.param("zstd", zstandard.ZstdCompressor().compress, id="zstd")
+
+@pytest.mark.parametrize("encoding, compress", compressors())
+def test_compressed_body_is_decompressed(client, encoding, compress):
+    response = client.post("/upload", content=compress(BODY), headers={"Content-Encoding": encoding})
+    assert response.status_code == 200
+    assert response.json() == {"size": len(BODY)}
+
+@pytest.mark.parametrize("encoding, compress", compressors())
+def test_truncated_body_is_rejected(client, encoding, compress):
+    response = client.post("/upload", content=compress(BODY)[:-8], headers={"Content-Encoding": encoding})
+    assert response.status_code == 400
+    assert "truncated" in response.json()["detail"]
+
+def test_body_over_limit_is_rejected(client):
+    response = client.post("/upload", content=gzip.compress(BODY + b"x"), headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 413
@@ -0,0 +1,90 @@
+"""
+Rollups e marcas d'água mantidos por SensorDataRollupRepository: depois de inserir leituras,
+reenviar uma duplicata e remover leituras pela API, os três níveis batem com a agregação
+das leituras de sensor_data, e a leitura mais recente e a revisão acompanham as escritas.
+"""
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+
+from app.db.models import SensorData
+from app.repositories.sensor_data import SensorDataRepository
+from app.repositories.sensor_data_rollup import ROLLUP_TIERS
+
+@pytest.fixture
+def sensor_id(seed, database):
+    """Sensor sem leituras; removê-lo leva junto leituras, rollups e marca d'água (CASCADE)."""
+    with database.begin() as conn:
+        sensor_id = conn.execute(text(
+            "INSERT INTO sensors (id, name, device_id) VALUES (gen_random_uuid(), 'rollup-probe', :d) RETURNING id"
+        ), {"d": seed.device_id}).scalar_one()
+    yield sensor_id
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM sensors WHERE id = :id"), {"id": sensor_id})
+
+def rollups(db, model, sensor_id) -> dict:
+    rows = db.execute(text(
+        f"SELECT bucket, sample_count, value_sum FROM {model.__tablename__} WHERE sensor_id = :s"
+    ), {"s": sensor_id})
+    return {row.bucket: (row.sample_count, row.value_sum) for row in rows}
+
+def recomputed(db, model, sensor_id) -> dict:
+    rows = db.execute(text(
+        f"SELECT date_trunc('{model.granularity}', timestamp) AS bucket, count(*) AS sample_count, sum(value) AS value_sum "
+        "FROM sensor_data WHERE sensor_id = :s GROUP BY 1"
+    ), {"s": sensor_id})
+    return {row.bucket: (row.sample_count, row.value_sum) for row in rows}
+
+def watermark(db, sensor_id):
+    return db.execute(text(
+        "SELECT revision, latest_id, latest_value FROM sensor_data_watermarks WHERE sensor_id = :s"
+    ), {"s": sensor_id}).one()
+
+def latest(db, sensor_id):
+    return db.execute(text(
+        "SELECT id, value FROM sensor_data WHERE sensor_id = :s ORDER BY timestamp DESC LIMIT 1"
+    ), {"s": sensor_id}).one()
+
+def assert_matches_raw(db, sensor_id, revision):
+    for model in ROLLUP_TIERS:
+        assert rollups(db, model, sensor_id) == recomputed(db, model, sensor_id), model.granularity
+    current = watermark(db, sensor_id)
+    assert current.revision == revision
+    assert (current.latest_id, current.latest_value) == tuple(latest(db, sensor_id))
+
+def test_rollups_follow_inserts_duplicates_and_deletes(db, sensor_id):
+    repo = SensorDataRepository(db)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    closed_day = today - timedelta(days=2)
+
+    def reading(timestamp, value):
+        return {"id": uuid.uuid4(), "sensor_id": sensor_id, "timestamp": timestamp, "value": Decimal(value)}
+
+    first = [
+        reading(closed_day + timedelta(hours=10, seconds=5), "1.5"),
+        reading(closed_day + timedelta(hours=10, seconds=35), "2.5"),
+        reading(closed_day + timedelta(hours=11, minutes=20), "4"),
+        reading(today, "8"),
+    ]
+    assert len(repo.bulk_insert(first)) == 4
+    db.commit()
+    # Um período fechado mudou: revisão 1
+    assert_matches_raw(db, sensor_id, revision=1)
+
+    # Reenvio: a duplicata é ignorada e só a leitura nova (de hoje) entra nos rollups
+    resent = [reading(first[1]["timestamp"], "99"), reading(today + timedelta(seconds=1), "16")]
+    assert len(repo.bulk_insert(resent)) == 1
+    db.commit()
+    assert_matches_raw(db, sensor_id, revision=1)
+
+    # Remoção de uma leitura no meio de um bucket de minuto
+    repo.delete(db.query(SensorData).filter_by(id=first[0]["id"]).one())
+    assert_matches_raw(db, sensor_id, revision=2)
+
+    # Remoção da leitura mais recente: a anterior volta a ser a mais recente
+    repo.delete(db.query(SensorData).filter_by(id=resent[1]["id"]).one())
+    assert_matches_raw(db, sensor_id, revision=3)
+    assert watermark(db, sensor_id).latest_id == first[3]["id"]
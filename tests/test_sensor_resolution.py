@@ -0,0 +1,52 @@
+"""
+Unicidade de (device_id, name) nos sensores: a ingestão que perde a corrida para criar um
+sensor novo usa o sensor criado pela outra, e a API responde 409 a um nome repetido.
+"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from app.core.cache import sensor_resolution_cache
+from app.schemas.sensor import SensorCreate
+from app.services.ingest_service import IngestService
+from app.services.sensor_device import SensorService
+
+@pytest.fixture
+def device_id(seed, database):
+    with database.connect() as conn:
+        device_id = conn.execute(text("SELECT id FROM devices WHERE serial_number = 'SEED-0002'")).scalar_one()
+    yield device_id
+    with database.begin() as conn:
+        conn.execute(text("DELETE FROM sensors WHERE device_id = :d AND name LIKE 'race-%'"), {"d": device_id})
+    sensor_resolution_cache.clear()
+
+def test_ingest_that_loses_the_race_reuses_the_sensor(db, database, device_id):
+    with database.begin() as conn:
+        winner_id = conn.execute(text(
+            "INSERT INTO sensors (id, name, device_id) VALUES (gen_random_uuid(), 'race-temp', :d) RETURNING id"
+        ), {"d": device_id}).scalar_one()
+
+    service = IngestService(db)
+    lookup = service.sensor_repo.get_ids_by_names_and_device
+    calls = []
+
+    def stale_lookup(names, device):
+        # A primeira busca acontece antes do commit da ingestão concorrente
+        calls.append(names)
+        return {} if len(calls) == 1 else lookup(names, device)
+
+    service.sensor_repo.get_ids_by_names_and_device = stale_lookup
+    sensor_ids, errors = service.resolve_sensors(device_id, {"race-temp": "C", "race-hum": "%"})
+
+    assert errors == {}
+    assert sensor_ids["race-temp"] == winner_id
+    assert calls[1] == ["race-temp"]
+    count = db.execute(text("SELECT count(*) FROM sensors WHERE device_id = :d AND name LIKE 'race-%'"), {"d": device_id})
+    assert count.scalar_one() == 2
+
+def test_duplicate_sensor_name_is_rejected(db, seed, device_id):
+    service = SensorService(db)
+    service.create_sensor(SensorCreate(name="race-dup", device_id=device_id), seed.owner_id)
+    with pytest.raises(HTTPException) as exc:
+        service.create_sensor(SensorCreate(name="race-dup", device_id=device_id), seed.owner_id)
+    assert exc.value.status_code == 409